@@ -4,18 +4,15 @@ Route module for the API
 """
 
 
-import os
 from os import getenv
 from typing import Tuple
 
-from flask import Flask, abort, jsonify, request
+from flask import Flask, abort, g, jsonify, request
 from flask_cors import CORS, cross_origin
 
-from api.v1.auth.auth import Auth
-from api.v1.auth.basic_auth import BasicAuth
-from api.v1.auth.session_auth import SessionAuth
-from api.v1.auth.session_db_auth import SessionDBAuth
-from api.v1.auth.session_exp_auth import SessionExpAuth
+from api.v1.auth import registry
+from api.v1.auth.config import AuthConfig
+from api.v1.auth.paths import ExcludedPaths
 from api.v1.views import app_views
 
 app = Flask(__name__)
@@ -23,24 +20,24 @@ app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 # Create a variable auth initialized to None after the CORS definition
 auth = None
+# Paths served without authentication, compiled once: a trailing * excludes
+# every path starting with what precedes it
+excluded_paths = ExcludedPaths(['/api/v1/status/',
+                                '/api/v1/unauthorized/',
+                                '/api/v1/forbidden/',
+                                '/api/v1/auth_session/login/',
+                                '/api/v1/auth_token/login/'])
+# Settings read once from AUTH_TYPE, SESSION_NAME, SESSION_DURATION and
+# AUTH_SERVER_TIMING
+config = AuthConfig.from_env()
 
 
 # Update api/v1/app.py for using SessionAuth instance for the variable
 # auth depending of the value of the environment variable AUTH_TYPE, If
-# AUTH_TYPE is equal to session_auth:
-#   import SessionAuth from api.v1.auth.session_auth
-#   create an instance of SessionAuth and assign it to the variable auth
-auth_type = getenv('AUTH_TYPE', 'default')
-if auth_type == "session_auth":
-    auth = SessionAuth()
-elif auth_type == 'session_exp_auth':
-    auth = SessionExpAuth()
-elif auth_type == 'session_db_auth':
-    auth = SessionDBAuth()
-elif auth_type == "basic_auth":
-    auth = BasicAuth()
-else:
-    auth = Auth()
+# AUTH_TYPE is equal to session_auth, create an instance of SessionAuth and
+# assign it to the variable auth. The registry only imports the module of
+# the selected backend
+auth = registry.create(config)
 
 
 @app.errorhandler(404)
@@ -86,12 +83,7 @@ def handle_request():
     # If auth is None, do nothing
     if auth is None:
         return
-    # Create list of excluded paths
-    excluded_paths = ['/api/v1/status/',
-                      '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/',
-                      '/api/v1/auth_session/login/']
-    # if request.path is not part of the list above, do nothing
+    # if request.path is part of the excluded paths, do nothing
     # You must use the method require_auth from the auth instance
     if not auth.require_auth(request.path, excluded_paths):
         return
@@ -102,14 +94,28 @@ def handle_request():
     if auth_header is None and session_cookie is None:
         abort(401)
     # If auth.current_user(request) returns None, raise the error 403 - you
-    # must use abort
-    user = auth.current_user(request)
+    # must use abort. authenticate() keeps it for the rest of the request
+    user = auth.authenticate(request)
     if user is None:
         abort(403)
     # Assign the result of auth.current_user(request) to request.current_user
     request.current_user = user
 
 
+@app.after_request
+def server_timing(response):
+    """Report the time of each authentication phase in a Server-Timing
+    header (auth_header, auth_cookie, auth_user, in ms) when the
+    AUTH_SERVER_TIMING environment variable is set.
+    """
+    timings = g.get('auth_timings')
+    if config.server_timing and timings:
+        response.headers.add('Server-Timing', ', '.join(
+            'auth_{};dur={:.3f}'.format(phase, seconds * 1000)
+            for phase, seconds in timings.items()))
+    return response
+
+
 if __name__ == "__main__":
     host = getenv("API_HOST", "0.0.0.0")
     port = getenv("API_PORT", "5000")
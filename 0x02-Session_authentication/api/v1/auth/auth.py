@@ -2,17 +2,75 @@
 """
 Module for authentication
 """
-import os
-from typing import List, TypeVar
+from time import perf_counter
+from typing import Callable, List, TypeVar, Union
 
-from flask import request
+from flask import g, has_request_context, request as flask_request
+
+from .config import AuthConfig
+from .paths import ExcludedPaths
 
 
 class Auth():
     """Template for all authentication system implemented in this app.
+
+    While a request is handled, the Authorization header, the session
+    cookie and the authenticated user are computed once and kept in
+    flask.g: g.auth holds phase -> result and g.auth_timings phase ->
+    seconds it took, for the phases "header", "cookie" and "user".
+
+    `cost` ranks the backends by the price of checking a credential, for
+    ChainAuth which tries the cheapest first.
     """
 
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    cost = 0
+
+    def __init__(self, config: AuthConfig = None):
+        """Initialize the backend.
+
+        Args:
+            config (AuthConfig, optional): The settings. Defaults to
+                AuthConfig.from_env().
+        """
+        self.config = config or AuthConfig.from_env()
+
+    def _per_request(self, request, phase: str, compute: Callable):
+        """Return the result of a phase, computed once per request.
+
+        Args:
+            request (flask.request): The request the phase is about.
+            phase (str): Name of the phase in g.auth and g.auth_timings.
+            compute (Callable): Computes the result of the phase.
+
+        Returns:
+            The result of compute(), from g.auth when already computed. It
+            is not kept for other requests than the one being handled.
+        """
+        if request is not flask_request or not has_request_context():
+            return compute()
+        results = g.setdefault('auth', {})
+        if phase not in results:
+            start = perf_counter()
+            results[phase] = compute()
+            g.setdefault('auth_timings', {})[phase] = \
+                perf_counter() - start
+        return results[phase]
+
+    def authenticate(self, request=None) -> TypeVar('User'):
+        """Returns the User of a request, looked up once per request.
+
+        Args:
+            request (flask.request, optional): The request to authenticate.
+                Defaults to None.
+
+        Returns:
+            User: current_user(request), or None.
+        """
+        return self._per_request(request, 'user',
+                                 lambda: self.current_user(request))
+
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], ExcludedPaths]) -> bool:
         """This function takes a path and a list of excluded paths as arguments
         and returns a boolean value.
 
@@ -22,11 +80,13 @@ class Auth():
         You can assume excluded_paths contains string path always ending by
         a /. This method must be slash tolerant: path=/api/v1/status and
         path=/api/v1/status/ must be returned False if excluded_paths contains
-        /api/v1/status/.
+        /api/v1/status/. An excluded path ending by * excludes every path
+        starting with what precedes the *.
 
         Args:
             path (str): The path to check against the list of excluded paths.
-            excluded_paths (List[str]): The list of excluded paths.
+            excluded_paths (List[str] or ExcludedPaths): The excluded paths,
+                as a list or compiled once (see api.v1.auth.paths).
 
         Returns:
             bool: True if the path is not in the excluded paths list,
@@ -38,23 +98,10 @@ class Auth():
         # If excluded_paths is None or empty, return True
         if not excluded_paths:
             return True
-        # Remove the trailing slash from the path
-        path = path.rstrip("/")
-        # Check if path is in excluded_paths and return False if path is
-        # in excluded_paths
-        # Loop through excluded paths
-        for excluded_path in excluded_paths:
-            # Check if given path starts with excluded path, with * at the end
-            if excluded_path.endswith("*") and \
-                    path.startswith(excluded_path[:-1]):
-                # Return False if path starts with excluded path with * at end
-                return False
-            # Check if the given path is equal to the excluded path
-            elif path == excluded_path.rstrip("/"):
-                # Return False if the path is equal to the excluded path
-                return False
-        # If path is not in excluded_paths, return True
-        return True
+        # The app compiles its excluded paths once, other callers pass a list
+        if not isinstance(excluded_paths, ExcludedPaths):
+            excluded_paths = ExcludedPaths(excluded_paths)
+        return not excluded_paths.excludes(path)
 
     def authorization_header(self, request=None) -> str:
         """Gets the value of the Authorization header from the request
@@ -68,9 +115,25 @@ class Auth():
         # If request is None, return None
         # If request doesn’t contain the header key Authorization, return None
         if request is not None:
-            return request.headers.get('Authorization', None)
+            return self._per_request(
+                request, 'header',
+                lambda: request.headers.get('Authorization', None))
         return None
 
+    def has_credentials(self, request=None) -> bool:
+        """Tells if a request carries the credential this backend checks,
+        so it can be skipped without looking anything up.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            bool: True if there is an Authorization header or a session
+            cookie.
+        """
+        return self.authorization_header(request) is not None or \
+            self.session_cookie(request) is not None
+
     def current_user(self, request=None) -> TypeVar('User'):
         """This function takes a request object as an optional argument
         (defaults to None) and returns a value of type 'User'. The purpose
@@ -92,7 +155,8 @@ class Auth():
         """
         # If request is not None
         if request is not None:
-            # Get the name of the session cookie from SESSION_NAME env variable
-            cookie_name = os.getenv('SESSION_NAME')
+            # Get the name of the session cookie (SESSION_NAME env variable)
+            cookie_name = self.config.session_name
             # Return the value of the session cookie
-            return request.cookies.get(cookie_name)
+            return self._per_request(request, 'cookie',
+                                     lambda: request.cookies.get(cookie_name))
@@ -17,6 +17,9 @@ class BasicAuth(Auth):
         Auth (type): Class inherited from.
     """
 
+    # A password check runs bcrypt
+    cost = 100
+
     def extract_base64_authorization_header(
             self, authorization_header: str) -> str:
         """Extracts the Base64 part of the Authorization header.
@@ -133,6 +136,20 @@ class BasicAuth(Auth):
         # Return the user instance
         return user
 
+    def has_credentials(self, request=None) -> bool:
+        """Tells if the request has a Basic Authorization header.
+
+        Args:
+            request (:obj:Request, optional): The request object. Defaults
+            to None.
+
+        Returns:
+            bool: True if the Authorization header starts by Basic.
+        """
+        auth_header = self.authorization_header(request)
+        return isinstance(auth_header, str) and \
+            auth_header.startswith("Basic ")
+
     def current_user(self, request=None) -> TypeVar('User'):
         """Retrieves the User instance for a request.
 
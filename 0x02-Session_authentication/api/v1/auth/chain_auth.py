@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Module for chained authentication
+"""
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, TypeVar
+
+from .auth import Auth
+from .config import AuthConfig
+
+
+class BackendStats:
+    """Outcome counters and time spent by one backend of a chain."""
+
+    __slots__ = ('hits', 'misses', 'skips', 'seconds', 'max_seconds')
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_json(self) -> dict:
+        """Return the counters and the mean latency of a lookup."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'skips': self.skips,
+            'mean_latency': self.seconds / lookups if lookups else 0.0,
+            'max_latency': self.max_seconds,
+        }
+
+
+class ChainAuth(Auth):
+    """Authentication trying several backends, the cheapest first.
+
+    The backends are sorted by their `cost` (a session lookup before a
+    Basic password check). A backend is skipped without looking anything
+    up when the request lacks its credential (has_credentials), and the
+    first one returning a user wins: bcrypt only runs when no valid
+    session was presented.
+    """
+
+    def __init__(self, config: AuthConfig = None,
+                 backends: List[Auth] = None):
+        """Initialize the chain.
+
+        Args:
+            config (AuthConfig, optional): The settings; their `chain`
+                lists the backends when `backends` is not given.
+            backends (List[Auth], optional): The backends to chain.
+        """
+        from .registry import backend
+
+        super().__init__(config)
+        if backends is None:
+            backends = [backend(auth_type)(self.config)
+                        for auth_type in self.config.chain
+                        if auth_type != 'chain_auth']
+        # sorted() is stable: backends of equal cost keep their order
+        self.backends = sorted(backends, key=lambda b: b.cost)
+        self.cost = self.backends[0].cost if self.backends else 0
+        self._stats: Dict[str, BackendStats] = {
+            type(b).__name__: BackendStats() for b in self.backends}
+        self._stats_lock = Lock()
+
+    def has_credentials(self, request=None) -> bool:
+        """Tells if any backend of the chain finds its credential.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            bool: True if a backend has something to check.
+        """
+        return any(b.has_credentials(request) for b in self.backends)
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """Returns the user of the first backend recognizing the request.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            User: The User instance, or None if no backend found one.
+        """
+        for backend in self.backends:
+            stats = self._stats[type(backend).__name__]
+            if not backend.has_credentials(request):
+                with self._stats_lock:
+                    stats.skips += 1
+                continue
+            start = perf_counter()
+            user = backend.current_user(request)
+            elapsed = perf_counter() - start
+            with self._stats_lock:
+                if user is None:
+                    stats.misses += 1
+                else:
+                    stats.hits += 1
+                stats.seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+            if user is not None:
+                return user
+        return None
+
+    def _first_with(self, method: str) -> Auth:
+        """Return the first backend having a method, or None."""
+        for backend in self.backends:
+            if hasattr(backend, method):
+                return backend
+        return None
+
+    def create_session(self, user_id: str = None) -> str:
+        """Creates a session with the first session backend of the chain.
+
+        Args:
+            user_id (str, optional): The ID of the user. Defaults to None.
+
+        Returns:
+            str: The session ID, or None if no backend manages sessions.
+        """
+        backend = self._first_with('create_session')
+        return backend.create_session(user_id) if backend else None
+
+    def destroy_session(self, request=None) -> bool:
+        """Destroys the session of the request.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            bool: True if the session was destroyed, False otherwise.
+        """
+        backend = self._first_with('destroy_session')
+        return backend.destroy_session(request) if backend else False
+
+    def issue_token(self, user_id: str = None) -> str:
+        """Creates an API token with the first token backend of the chain.
+
+        Args:
+            user_id (str, optional): The ID of the user. Defaults to None.
+
+        Returns:
+            str: The token, or None if no backend manages tokens.
+        """
+        backend = self._first_with('issue_token')
+        return backend.issue_token(user_id) if backend else None
+
+    def destroy_token(self, request=None) -> bool:
+        """Revokes the API token of the request.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            bool: True if the token was revoked, False otherwise.
+        """
+        backend = self._first_with('destroy_token')
+        return backend.destroy_token(request) if backend else False
+
+    def stats(self) -> dict:
+        """Return the hits, misses, skips and latencies of each backend,
+        in the order they are tried."""
+        with self._stats_lock:
+            return {name: stats.to_json()
+                    for name, stats in self._stats.items()}
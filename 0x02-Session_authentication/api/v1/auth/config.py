@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Module for the authentication settings
+"""
+from os import getenv
+
+
+class AuthConfig:
+    """Authentication settings, read once from the environment.
+
+    Attributes:
+        auth_type (str): AUTH_TYPE, the backend (see api.v1.auth.registry).
+        session_name (str): SESSION_NAME, the name of the session cookie.
+        session_duration (int): SESSION_DURATION, the lifetime of a session
+            in seconds, 0 or less for sessions that never expire (signed
+            sessions then expire after a day, see signed_session_auth).
+        server_timing (bool): AUTH_SERVER_TIMING, report the time of the
+            authentication phases in a Server-Timing header.
+        chain (tuple): AUTH_CHAIN, comma separated backends tried by
+            chain_auth, session_auth,basic_auth by default.
+        token_duration (int): TOKEN_DURATION, the lifetime of an API token
+            in seconds, 0 or less for tokens that never expire.
+        session_keys (tuple): SESSION_KEYS, comma separated kid:secret
+            pairs signing the cookies of signed_session_auth, the first one
+            signing new sessions.
+        session_store (str): SESSION_STORE, where SessionAuth keeps its
+            sessions (see api.v1.auth.session_store): memory by default,
+            sqlite to share them between the processes of a host,
+            partitioned to spread them over store nodes.
+        session_max_entries (int): SESSION_MAX_ENTRIES, sessions kept at
+            most by the memory store (cached by the sqlite store), 0 or
+            less for no bound.
+        session_ttl (int): SESSION_TTL, seconds a SessionAuth session is
+            kept, 0 or less for no expiry (SessionExpAuth keeps its
+            sessions for SESSION_DURATION).
+        session_sweep_interval (float): SESSION_SWEEP_INTERVAL, seconds
+            between two purges of the expired sessions of the session
+            store, 0 or less to only drop them on lookup; 1 by default.
+        session_sqlite_path (str): SESSION_SQLITE_PATH, the database of
+            the sqlite session store, shared by the processes of a host.
+        session_nodes (tuple): SESSION_NODES, comma separated host:port
+            addresses of the nodes of the partitioned session store (see
+            api.v1.auth.session_node).
+        session_replicas (int): SESSION_REPLICAS, nodes keeping each
+            session of the partitioned store, 2 by default.
+        session_local_node (str): SESSION_LOCAL_NODE, the node read first
+            when it keeps the session, usually the one on this host.
+    """
+
+    __slots__ = ('auth_type', 'session_name', 'session_duration',
+                 'server_timing', 'chain', 'token_duration', 'session_keys',
+                 'session_store', 'session_max_entries', 'session_ttl',
+                 'session_sweep_interval', 'session_sqlite_path',
+                 'session_nodes', 'session_replicas', 'session_local_node')
+
+    def __init__(self, auth_type: str = 'default', session_name: str = None,
+                 session_duration: int = 0, server_timing: bool = False,
+                 chain: tuple = ('session_auth', 'basic_auth'),
+                 token_duration: int = 0, session_keys: tuple = (),
+                 session_store: str = 'memory',
+                 session_max_entries: int = 100000, session_ttl: int = 0,
+                 session_sweep_interval: float = 1.0,
+                 session_sqlite_path: str = '.db_sessions.sqlite3',
+                 session_nodes: tuple = (), session_replicas: int = 2,
+                 session_local_node: str = None):
+        """Initialize the settings."""
+        self.auth_type = auth_type
+        self.session_name = session_name
+        self.session_duration = session_duration
+        self.server_timing = server_timing
+        self.chain = tuple(chain)
+        self.token_duration = token_duration
+        self.session_keys = tuple(session_keys)
+        self.session_store = session_store
+        self.session_max_entries = session_max_entries
+        self.session_ttl = session_ttl
+        self.session_sweep_interval = session_sweep_interval
+        self.session_sqlite_path = session_sqlite_path
+        self.session_nodes = tuple(session_nodes)
+        self.session_replicas = session_replicas
+        self.session_local_node = session_local_node
+
+    @classmethod
+    def from_env(cls) -> 'AuthConfig':
+        """Build the settings from AUTH_TYPE, SESSION_NAME,
+        SESSION_DURATION, AUTH_SERVER_TIMING, AUTH_CHAIN, TOKEN_DURATION,
+        SESSION_KEYS, SESSION_STORE, SESSION_MAX_ENTRIES, SESSION_TTL,
+        SESSION_SWEEP_INTERVAL, SESSION_SQLITE_PATH, SESSION_NODES,
+        SESSION_REPLICAS and SESSION_LOCAL_NODE."""
+        chain = getenv('AUTH_CHAIN', 'session_auth,basic_auth')
+        keys = [pair.strip().split(':', 1)
+                for pair in getenv('SESSION_KEYS', '').split(',')
+                if ':' in pair]
+        return cls(
+            auth_type=getenv('AUTH_TYPE', 'default'),
+            session_name=getenv('SESSION_NAME'),
+            session_duration=int(getenv('SESSION_DURATION', 0)),
+            server_timing=bool(getenv('AUTH_SERVER_TIMING')),
+            chain=[name.strip() for name in chain.split(',') if name.strip()],
+            token_duration=int(getenv('TOKEN_DURATION', 0)),
+            session_keys=[(kid, secret) for kid, secret in keys
+                          if kid and secret],
+            session_store=getenv('SESSION_STORE', 'memory'),
+            session_max_entries=int(getenv('SESSION_MAX_ENTRIES', 100000)),
+            session_ttl=int(getenv('SESSION_TTL', 0)),
+            session_sweep_interval=float(getenv('SESSION_SWEEP_INTERVAL',
+                                                1.0)),
+            session_sqlite_path=getenv('SESSION_SQLITE_PATH',
+                                       '.db_sessions.sqlite3'),
+            session_nodes=[node.strip() for node in
+                           getenv('SESSION_NODES', '').split(',')
+                           if node.strip()],
+            session_replicas=int(getenv('SESSION_REPLICAS', 2)),
+            session_local_node=getenv('SESSION_LOCAL_NODE'))
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Module for the expiry of sessions: a timer wheel and its sweeper
+"""
+import logging
+from math import exp
+from threading import Event, Lock, Thread
+from time import monotonic, perf_counter
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """Hashed timer wheel of keys and the monotonic time they expire at.
+
+    Time is cut in ticks of `resolution` seconds and a key goes in the
+    slot of the tick it expires in, modulo `slots`. Scheduling and
+    cancelling are O(1); advancing visits only the slots of the ticks
+    elapsed since the last advance, so a key whose lifetime fits in one
+    turn of the wheel (slots * resolution) is looked at once.
+
+    The wheel is not thread safe: its owner serializes the calls.
+    """
+
+    def __init__(self, resolution: float = 1.0, slots: int = 512):
+        """Initialize an empty wheel.
+
+        Args:
+            resolution (float): Seconds per tick; keys are reported at
+                most one tick after they expire.
+            slots (int): Number of slots, one turn of the wheel is
+                slots * resolution seconds.
+        """
+        self.resolution = resolution
+        self.slots = slots
+        # slot -> {key: expiry}
+        self._slots: List[Dict[str, float]] = [{} for _ in range(slots)]
+        self._slot_of: Dict[str, int] = {}
+        # Last tick whose slot holds no expired key
+        self._cursor = self._tick(monotonic()) - 1
+
+    def _tick(self, when: float) -> int:
+        """Return the tick of a monotonic time."""
+        return int(when // self.resolution)
+
+    def schedule(self, key: str, expires_at: float):
+        """Schedule a key, replacing its previous expiry if any."""
+        self.cancel(key)
+        slot = self._tick(expires_at) % self.slots
+        self._slots[slot][key] = expires_at
+        self._slot_of[key] = slot
+
+    def cancel(self, key: str) -> bool:
+        """Unschedule a key, tell if it was scheduled."""
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def advance(self, now: float, limit: int = 0) -> List[str]:
+        """Unschedule and return the keys expired at `now`.
+
+        Args:
+            now (float): The monotonic time.
+            limit (int): Keys returned at most, 0 or less for no limit;
+                the others are returned by the next calls.
+
+        Returns:
+            List[str]: The expired keys.
+        """
+        expired = []
+        tick = self._tick(now)
+        # Keys of the current tick may not have expired yet: stop before
+        # it. One turn visits every slot, older ticks are the same slots.
+        for past in range(max(self._cursor + 1, tick - self.slots), tick):
+            slot = self._slots[past % self.slots]
+            for key, expires_at in list(slot.items()):
+                # Keys of a later turn stay
+                if expires_at > now:
+                    continue
+                if 0 < limit <= len(expired):
+                    return expired
+                del slot[key]
+                del self._slot_of[key]
+                expired.append(key)
+            self._cursor = past
+        return expired
+
+    def backlog(self, now: float) -> int:
+        """Number of keys expired at `now` but not returned by advance()
+        yet (keys of a later turn sharing their slots included)."""
+        tick = self._tick(now)
+        return sum(len(self._slots[past % self.slots]) for past in
+                   range(max(self._cursor + 1, tick - self.slots), tick))
+
+    def __len__(self) -> int:
+        """Number of keys scheduled."""
+        return len(self._slot_of)
+
+
+# Seconds the purge rate is averaged over
+RATE_WINDOW = 60.0
+
+
+class ExpirySweeper:
+    """Background thread purging expired entries every `interval` seconds.
+
+    `sweep(limit)` is called with at most `batch` entries to purge per
+    call, so a store lock is never held long; a sweep purging a full batch
+    is followed by another one at once. The thread starts on start(); a
+    failing sweep is logged and counted, and the next one runs on time.
+    """
+
+    def __init__(self, sweep: Callable[[int], tuple],
+                 interval: float = 1.0, batch: int = 10000):
+        """Initialize a sweeper.
+
+        Args:
+            sweep (Callable): Purges up to `limit` expired entries, returns
+                how many it purged and how many expired ones are left.
+            interval (float): Seconds between two sweeps.
+            batch (int): Entries purged at most per call of `sweep`.
+        """
+        self._sweep = sweep
+        self.interval = interval
+        self.batch = batch
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        self.sweeps = 0
+        self.swept = 0
+        self.backlog = 0
+        self.sweep_rate = 0.0
+        self.last_sweep_latency = 0.0
+        self.max_sweep_latency = 0.0
+        self.errors = 0
+        self._last_sweep_at = monotonic()
+
+    def start(self):
+        """Start the sweeper thread if it is not running."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._stop.is_set():
+                self._thread = Thread(target=self._run, daemon=True,
+                                      name='session-expiry-sweeper')
+                self._thread.start()
+
+    def _run(self):
+        """Sweeper thread loop."""
+        try:
+            while not self._stop.wait(self.interval):
+                while self.sweep() >= self.batch and \
+                        not self._stop.is_set():
+                    pass
+        finally:
+            # start() runs a new thread if this one died
+            with self._lock:
+                self._thread = None
+
+    def sweep(self) -> int:
+        """Purge one batch of expired entries now; return how many, 0 if
+        the sweep failed."""
+        start = perf_counter()
+        try:
+            purged, backlog = self._sweep(self.batch)
+        except Exception:
+            logger.exception('session expiry sweep failed')
+            with self._lock:
+                self.errors += 1
+            return 0
+        latency = perf_counter() - start
+        now = monotonic()
+        with self._lock:
+            self.sweeps += 1
+            self.swept += purged
+            self.backlog = backlog
+            # Moving average: a sweep weighs by the time it covers
+            elapsed = max(now - self._last_sweep_at, 1e-9)
+            weight = 1 - exp(-elapsed / RATE_WINDOW)
+            self.sweep_rate += weight * (purged / elapsed - self.sweep_rate)
+            self._last_sweep_at = now
+            self.last_sweep_latency = latency
+            self.max_sweep_latency = max(self.max_sweep_latency, latency)
+        return purged
+
+    def close(self):
+        """Stop the sweeper thread."""
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> dict:
+        """Return the sweeps, the entries purged, the purge rate (per
+        second, averaged over about RATE_WINDOW seconds), the backlog of
+        expired entries left, the sweep latency and the failed sweeps."""
+        with self._lock:
+            return {
+                'sweeps': self.sweeps,
+                'swept': self.swept,
+                'sweep_rate': self.sweep_rate,
+                'backlog': self.backlog,
+                'last_sweep_latency': self.last_sweep_latency,
+                'max_sweep_latency': self.max_sweep_latency,
+                'errors': self.errors,
+            }
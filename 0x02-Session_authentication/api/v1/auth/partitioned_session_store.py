@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""Module for the session store partitioned across store nodes
+"""
+from bisect import bisect
+from contextlib import contextmanager
+import hashlib
+import socket
+from threading import Condition, Lock, local
+from time import monotonic
+from typing import Dict, Iterator, List, Optional
+
+from .config import AuthConfig
+from .session_node import parse_address
+from .session_store import SessionStore, decode, encode
+
+# Locks taken by the writes of a rebalance, the keys hashed among them
+KEY_LOCKS = 64
+
+
+def _hash(key: str) -> int:
+    """Return the position of a key on the ring."""
+    return int.from_bytes(hashlib.blake2b(key.encode(),
+                                          digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring of store nodes.
+
+    Every node is placed at `vnodes` points of the ring; a key belongs to
+    the nodes of the first points found clockwise from its hash, so a
+    node joining or leaving only moves the keys next to its points.
+    """
+
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        """Build the ring of some nodes ("host:port" addresses)."""
+        self.nodes = list(dict.fromkeys(nodes))
+        self.vnodes = vnodes
+        points = sorted((_hash('{}#{}'.format(node, i)), node)
+                        for node in self.nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def nodes_for(self, key: str, count: int) -> List[str]:
+        """Return the `count` distinct nodes of a key, first owner first."""
+        count = min(count, len(self.nodes))
+        found: List[str] = []
+        if count <= 0:
+            return found
+        start = bisect(self._hashes, _hash(key))
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in found:
+                found.append(node)
+                if len(found) == count:
+                    break
+        return found
+
+
+class NodeClient:
+    """Connections to one store node, one per thread.
+
+    A node failing a request is considered down for `retry_after` seconds
+    and skipped meanwhile.
+    """
+
+    def __init__(self, address: str, timeout: float = 2.0,
+                 retry_after: float = 1.0):
+        """Initialize the client (connections are opened lazily)."""
+        self.address = address
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.down_until = 0.0
+        self._local = local()
+
+    @property
+    def up(self) -> bool:
+        """Tell if the node is not known to be down."""
+        return self.down_until <= monotonic()
+
+    def send(self, request: dict):
+        """Send a request; its response is read by receive()."""
+        conn = getattr(self._local, 'conn', None)
+        try:
+            if conn is None:
+                sock = socket.create_connection(parse_address(self.address),
+                                                self.timeout)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conn = self._local.conn = sock.makefile('rwb')
+            conn.write(encode(request).encode() + b'\n')
+            conn.flush()
+        except OSError:
+            self._fail()
+            raise
+
+    def receive(self) -> dict:
+        """Read the response of the request sent last."""
+        try:
+            line = self._local.conn.readline()
+            if not line:
+                raise ConnectionError('{} closed the connection'.format(
+                    self.address))
+        except (OSError, AttributeError):
+            self._fail()
+            raise ConnectionError('no connection to {}'.format(self.address))
+        self.down_until = 0.0
+        return decode(line)
+
+    def call(self, request: dict) -> dict:
+        """Send a request and return its response."""
+        self.send(request)
+        return self.receive()
+
+    def _fail(self):
+        """Drop the connection of the thread and mark the node down."""
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        self.down_until = monotonic() + self.retry_after
+
+
+class PartitionedSessionStore(SessionStore):
+    """Session store partitioned across store nodes by consistent hashing.
+
+    A session is kept by `replicas` nodes of the ring (see HashRing):
+    writes are sent to all of them at once, reads go to the local node
+    when it is one of them, else to the first one, and fall back to the
+    others when a node is down or lacks the session.
+
+    add_node() and remove_node() change the ring of this store only, and
+    move the sessions whose nodes changed. While they move, writes go to
+    the nodes of both rings, and a session written meanwhile is not
+    copied again from the old ring. Other processes read their nodes from
+    SESSION_NODES. A joining node must start empty: sessions it kept
+    before leaving may have been deleted since.
+    """
+
+    # Sessions are seen by every process using the nodes
+    shared = True
+
+    def __init__(self, nodes: List[str], replicas: int = 2,
+                 local_node: str = None, ttl: float = 0,
+                 vnodes: int = 64):
+        """Initialize the store.
+
+        Args:
+            nodes (List[str]): "host:port" addresses of the nodes.
+            replicas (int): Nodes keeping each session.
+            local_node (str, optional): Address of the node on this host,
+                read first when it keeps the session.
+            ttl (float): Seconds a session lives after it is stored, 0 or
+                less for sessions that never expire.
+            vnodes (int): Points of every node on the ring.
+        """
+        self.replicas = max(replicas, 1)
+        self.local_node = local_node
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.ring = HashRing(nodes, vnodes)
+        # Ring being left by a rebalance
+        self._old_ring: Optional[HashRing] = None
+        self._clients: Dict[str, NodeClient] = {}
+        self._lock = Lock()
+        self._rebalance_lock = Lock()
+        # Writes in progress by ring switch, waited for by a rebalance
+        self._writes_done = Condition(self._lock)
+        self._switches = 0
+        self._writing: Dict[int, int] = {}
+        # Sessions written during a rebalance
+        self._touched: Optional[set] = None
+        self._key_locks = [Lock() for _ in range(KEY_LOCKS)]
+        self.local_reads = 0
+        self.remote_reads = 0
+        self.read_fallbacks = 0
+        self.write_errors = 0
+        self.moved = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_config(cls, config: AuthConfig,
+                    ttl: float = 0) -> 'PartitionedSessionStore':
+        """Build the store from SESSION_NODES, SESSION_REPLICAS and
+        SESSION_LOCAL_NODE."""
+        return cls(list(config.session_nodes), config.session_replicas,
+                   config.session_local_node, ttl)
+
+    def _client(self, node: str) -> NodeClient:
+        """Return the client of a node."""
+        client = self._clients.get(node)
+        if client is None:
+            with self._lock:
+                client = self._clients.setdefault(node, NodeClient(node))
+        return client
+
+    def _nodes_for(self, session_id: str) -> List[str]:
+        """Return the nodes a session is written to."""
+        nodes = self.ring.nodes_for(session_id, self.replicas)
+        old = self._old_ring
+        if old is not None:
+            nodes += [node for node in
+                      old.nodes_for(session_id, self.replicas)
+                      if node not in nodes]
+        return nodes
+
+    @contextmanager
+    def _write(self, session_id: str):
+        """Context of a write of a session, giving its nodes.
+
+        During a rebalance the session is marked written and locked, so
+        it is not copied from a dump taken before this write.
+        """
+        with self._lock:
+            switch = self._switches
+            self._writing[switch] = self._writing.get(switch, 0) + 1
+            if self._touched is not None:
+                self._touched.add(session_id)
+                key_lock = self._key_locks[_hash(session_id) % KEY_LOCKS]
+            else:
+                key_lock = None
+            nodes = self._nodes_for(session_id)
+        try:
+            if key_lock is None:
+                yield nodes
+            else:
+                with key_lock:
+                    yield nodes
+        finally:
+            with self._lock:
+                self._writing[switch] -= 1
+                if not self._writing[switch]:
+                    del self._writing[switch]
+                    self._writes_done.notify_all()
+
+    def _read_order(self, session_id: str) -> List[str]:
+        """Return the nodes to read a session from, in order."""
+        nodes = self._nodes_for(session_id)
+        if self.local_node in nodes:
+            nodes.remove(self.local_node)
+            nodes.insert(0, self.local_node)
+        return nodes
+
+    def _fan_out(self, nodes: List[str], request: dict) -> List[dict]:
+        """Send a request to nodes at once; return the responses of the
+        nodes that answered."""
+        sent = []
+        for node in nodes:
+            client = self._client(node)
+            if not client.up:
+                continue
+            try:
+                client.send(request)
+                sent.append(client)
+            except OSError:
+                pass
+        responses = []
+        for client in sent:
+            try:
+                responses.append(client.receive())
+            except OSError:
+                pass
+        return responses
+
+    def get(self, session_id: str, default=None):
+        """Return the session of an ID, `default` if there is none."""
+        for i, node in enumerate(self._read_order(session_id)):
+            client = self._client(node)
+            if not client.up:
+                continue
+            try:
+                response = client.call({'op': 'get', 'id': session_id})
+            except OSError:
+                continue
+            with self._lock:
+                if i > 0:
+                    self.read_fallbacks += 1
+                if node == self.local_node:
+                    self.local_reads += 1
+                else:
+                    self.remote_reads += 1
+            if response.get('found'):
+                return response['value']
+        return default
+
+    def set(self, session_id: str, value):
+        """Store the session of an ID on all its nodes.
+
+        Raises:
+            ConnectionError: If none of its nodes could store it.
+        """
+        with self._write(session_id) as nodes:
+            responses = self._fan_out(nodes, {'op': 'set', 'id': session_id,
+                                              'value': value,
+                                              'ttl': self.ttl})
+        if len(responses) < len(nodes):
+            with self._lock:
+                self.write_errors += len(nodes) - len(responses)
+        if not responses:
+            raise ConnectionError('no session store node for {}'.format(
+                session_id))
+
+    def delete(self, session_id: str) -> bool:
+        """Drop the session of an ID from all its nodes, tell if there was
+        one."""
+        with self._write(session_id) as nodes:
+            responses = self._fan_out(nodes, {'op': 'delete',
+                                              'id': session_id})
+        return any(response.get('ok') for response in responses)
+
+    def add_node(self, node: str):
+        """Add a node to the ring and move to it the sessions it keeps."""
+        self._rebalance(self.ring.nodes + [node])
+
+    def remove_node(self, node: str):
+        """Remove a node from the ring, moving its sessions to the nodes
+        keeping them now; the node may already be down."""
+        self._rebalance([n for n in self.ring.nodes if n != node])
+
+    def _rebalance(self, nodes: List[str]):
+        """Switch to a ring of nodes and move the sessions accordingly.
+
+        Every session of the nodes of the old ring is copied to its nodes
+        in the new ring that did not keep it, and dropped from the nodes
+        that no longer keep it. Sessions of a node that is down are
+        copied from their other replicas. Sessions written or deleted
+        after the switch are left to those writes, which go to the nodes
+        of both rings: copying them from an older dump would undo them.
+        """
+        with self._rebalance_lock:
+            old, new = self.ring, HashRing(nodes, self.vnodes)
+            with self._lock:
+                # Writes go to the nodes of both rings until the move is
+                # done
+                self._old_ring, self.ring = old, new
+                self._touched = set()
+                self._switches += 1
+                # The dumps must show the writes sent to the old ring only
+                while any(switch < self._switches
+                          for switch in self._writing):
+                    self._writes_done.wait()
+            try:
+                copied = set()
+                for node in old.nodes:
+                    try:
+                        entries = self._client(node).call({'op': 'dump'})
+                    except OSError:
+                        continue
+                    for session_id, value, ttl in entries['entries']:
+                        before = old.nodes_for(session_id, self.replicas)
+                        after = new.nodes_for(session_id, self.replicas)
+                        if session_id not in copied:
+                            copied.add(session_id)
+                            self._copy(session_id, value, ttl,
+                                       [n for n in after if n not in before])
+                        if node not in after:
+                            self._fan_out([node], {'op': 'delete',
+                                                   'id': session_id})
+                            with self._lock:
+                                self.dropped += 1
+            finally:
+                with self._lock:
+                    self._old_ring = self._touched = None
+
+    def _copy(self, session_id: str, value, ttl: float, nodes: List[str]):
+        """Copy a session of a dump to nodes, unless it was written
+        since the rebalance began."""
+        with self._key_locks[_hash(session_id) % KEY_LOCKS]:
+            with self._lock:
+                if session_id in self._touched:
+                    return
+            self._fan_out(nodes, {'op': 'set', 'id': session_id,
+                                  'value': value, 'ttl': ttl})
+        with self._lock:
+            self.moved += len(nodes)
+
+    def __len__(self) -> int:
+        """Number of distinct sessions on the nodes reachable."""
+        return len(set(self))
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the session IDs of the nodes reachable."""
+        ids = {}
+        for response in self._fan_out(self.ring.nodes, {'op': 'dump'}):
+            ids.update(dict.fromkeys(entry[0]
+                                     for entry in response['entries']))
+        return iter(list(ids))
+
+    def stats(self) -> dict:
+        """Return the nodes with their size and state, the reads (local,
+        remote, from a fallback node), the failed writes and the sessions
+        moved and dropped by rebalances."""
+        nodes = {}
+        for node in self.ring.nodes:
+            client = self._client(node)
+            try:
+                size = client.call({'op': 'stats'})['size']
+            except OSError:
+                size = None
+            nodes[node] = {'size': size, 'up': client.up}
+        with self._lock:
+            return {
+                'nodes': nodes,
+                'replicas': self.replicas,
+                'local_reads': self.local_reads,
+                'remote_reads': self.remote_reads,
+                'read_fallbacks': self.read_fallbacks,
+                'write_errors': self.write_errors,
+                'moved': self.moved,
+                'dropped': self.dropped,
+            }
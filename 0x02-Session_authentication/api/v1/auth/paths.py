@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Module for the excluded paths of Auth.require_auth
+"""
+import re
+from typing import Iterable, Iterator
+
+
+class ExcludedPaths:
+    """Paths that need no authentication, compiled once.
+
+    Paths are compared without their trailing slashes. A path ending with
+    "*" excludes every path starting with what comes before the "*"; the
+    other paths are looked up in a set, and all the "*" prefixes are tried
+    at once by a single regular expression.
+    """
+
+    __slots__ = ('paths', 'exact', 'prefix')
+
+    def __init__(self, paths: Iterable[str] = ()):
+        """Compile the excluded paths.
+
+        Args:
+            paths (Iterable[str]): Excluded paths, ending by / or *.
+        """
+        self.paths = tuple(paths)
+        self.exact = frozenset(path.rstrip("/") for path in self.paths
+                               if not path.endswith("*"))
+        prefixes = [path[:-1] for path in self.paths if path.endswith("*")]
+        # match() anchors every alternative at the start of the path
+        self.prefix = re.compile("|".join(map(re.escape, prefixes))).match \
+            if prefixes else None
+
+    def __len__(self) -> int:
+        """Number of excluded paths."""
+        return len(self.paths)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the excluded paths as given."""
+        return iter(self.paths)
+
+    def excludes(self, path: str) -> bool:
+        """Tell if a path needs no authentication.
+
+        Args:
+            path (str): The request path, with or without trailing slash.
+
+        Returns:
+            bool: True if the path is excluded, False otherwise.
+        """
+        path = path.rstrip("/")
+        return path in self.exact or \
+            (self.prefix is not None and self.prefix(path) is not None)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Module for the registry of authentication backends
+"""
+from importlib import import_module
+
+from .auth import Auth
+from .config import AuthConfig
+
+# AUTH_TYPE -> (module, class) of the backend, imported on first use
+BACKENDS = {
+    'default': ('api.v1.auth.auth', 'Auth'),
+    'basic_auth': ('api.v1.auth.basic_auth', 'BasicAuth'),
+    'session_auth': ('api.v1.auth.session_auth', 'SessionAuth'),
+    'session_exp_auth': ('api.v1.auth.session_exp_auth', 'SessionExpAuth'),
+    'session_db_auth': ('api.v1.auth.session_db_auth', 'SessionDBAuth'),
+    'signed_session_auth': ('api.v1.auth.signed_session_auth',
+                            'SignedSessionAuth'),
+    'token_auth': ('api.v1.auth.token_auth', 'TokenAuth'),
+    'chain_auth': ('api.v1.auth.chain_auth', 'ChainAuth'),
+}
+
+
+def backend(auth_type: str) -> type:
+    """Return the class of a backend, importing its module only now.
+
+    Args:
+        auth_type (str): A key of BACKENDS; unknown types give Auth.
+
+    Returns:
+        type: The Auth subclass.
+    """
+    if auth_type not in BACKENDS:
+        return Auth
+    module, name = BACKENDS[auth_type]
+    return getattr(import_module(module), name)
+
+
+def create(config: AuthConfig = None) -> Auth:
+    """Create the backend selected by the settings.
+
+    Args:
+        config (AuthConfig, optional): Defaults to AuthConfig.from_env().
+
+    Returns:
+        Auth: The backend, holding the settings.
+    """
+    config = config or AuthConfig.from_env()
+    return backend(config.auth_type)(config)
@@ -4,12 +4,45 @@
 
 from uuid import uuid4
 from models.user import User
+from . import session_store
 from .auth import Auth
+from .config import AuthConfig
 
 
 class SessionAuth(Auth):
-    """Session authentication class that inherits from Auth class."""
-    user_id_by_session_id = {}
+    """Session authentication class that inherits from Auth class.
+
+    Sessions are kept in user_id_by_session_id, a session store (see
+    api.v1.auth.session_store) bounded in size, used like a dict. Each
+    backend has its own store, not a dict shared by the class: sessions
+    outlive a SessionAuth only in a shared store.
+    """
+    # A session is a dict lookup
+    cost = 1
+
+    def __init__(self, config: AuthConfig = None):
+        """Initialize the backend and its session store."""
+        super().__init__(config)
+        self.user_id_by_session_id = self.create_store()
+
+    def create_store(self) -> session_store.SessionStore:
+        """Create the session store selected by SESSION_STORE."""
+        return session_store.create(self.config, self.session_ttl())
+
+    def session_ttl(self) -> int:
+        """Seconds the session store keeps a session (SESSION_TTL)."""
+        return self.config.session_ttl
+
+    def has_credentials(self, request=None) -> bool:
+        """Tells if the request has a session cookie.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            bool: True if the session cookie is set.
+        """
+        return self.session_cookie(request) is not None
 
     def create_session(self, user_id: str = None) -> str:
         """Creates a Session ID for a user_id.
@@ -23,10 +56,16 @@ class SessionAuth(Auth):
         """
         if isinstance(user_id, str):
             session_id = str(uuid4())
-            self.user_id_by_session_id[session_id] = user_id
+            self.user_id_by_session_id[session_id] = \
+                self.session_value(user_id)
             return session_id
         return None
 
+    def session_value(self, user_id: str):
+        """Returns what the session store keeps for a new session of a
+        user: the user ID."""
+        return user_id
+
     def user_id_for_session_id(self, session_id: str = None) -> str:
         """Retrieves the user ID for a given session ID.
 
@@ -71,7 +110,6 @@ class SessionAuth(Auth):
         if request is None or session_id is None or user_id is None:
             return False
 
-        if session_id in self.user_id_by_session_id:
-            del self.user_id_by_session_id[session_id]
-
+        # The session may expire meanwhile: delete without checking first
+        self.user_id_by_session_id.delete(session_id)
         return True
@@ -10,8 +10,15 @@ from .session_exp_auth import SessionExpAuth
 
 class SessionDBAuth(SessionExpAuth):
     """Session authentication class with database storage & expiration support.
+
+    Sessions are saved as UserSession objects. When the session store is
+    shared between processes (SESSION_STORE=sqlite), it is looked up
+    first and the UserSession search only serves the sessions it lacks.
     """
 
+    # A session is an indexed UserSession search
+    cost = 2
+
     def create_session(self, user_id: str) -> str:
         """Creates and stores a session id for the user.
 
@@ -44,6 +51,12 @@ class SessionDBAuth(SessionExpAuth):
         Returns:
             str: User id associated with the session id.
         """
+        # A store shared by every worker knows about sessions created and
+        # destroyed by the others: it answers without a database search
+        if self.user_id_by_session_id.shared:
+            user_id = super().user_id_for_session_id(session_id)
+            if user_id is not None:
+                return user_id
         try:
             # Try to retrieve the UserSession instance from the database
             sessions = UserSession.search({'session_id': session_id})
@@ -74,6 +87,8 @@ class SessionDBAuth(SessionExpAuth):
         """
         # Get the session id from the request cookie
         session_id = self.session_cookie(request)
+        if session_id is not None:
+            self.user_id_by_session_id.delete(session_id)
         try:
             # Try to retrieve the UserSession instance from the database
             sessions = UserSession.search({'session_id': session_id})
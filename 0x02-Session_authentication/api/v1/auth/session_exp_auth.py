@@ -3,9 +3,9 @@
 """
 
 
-import os
-from datetime import datetime as dt, timedelta
+from datetime import datetime as dt
 
+from .config import AuthConfig
 from .session_auth import SessionAuth
 
 
@@ -16,56 +16,48 @@ class SessionExpAuth(SessionAuth):
     It adds session expiration to the authentication mechanism.
     """
 
-    def __init__(self):
+    def __init__(self, config: AuthConfig = None):
         """
         Constructor for the SessionExpAuth class.
         Initializes the session_duration attribute.
         """
         # Call the superclass's constructor
-        super().__init__()
+        super().__init__(config)
 
-        # Get the value of the SESSION_DURATION environment variable
-        # Convert it to an integer and assign it to session_duration attribute
-        # If the environment variable does not exist or cannot be converted to
-        # an integer, set session_duration to 0
-        self.session_duration = int(os.environ.get("SESSION_DURATION", 0))
+        # Take the value of the SESSION_DURATION environment variable, as an
+        # integer (0 if it does not exist), from the settings
+        self.session_duration = self.config.session_duration
 
-    def create_session(self, user_id: int) -> str:
-        """Creates a new session for a user and assigns a session ID.
+    def session_ttl(self) -> int:
+        """Seconds the session store keeps a session: SESSION_DURATION,
+        expired sessions leave the store."""
+        return max(self.config.session_duration, 0)
 
-        The session ID is stored in the user_id_by_session_id dictionary with
-        the user_id and creation time as values.
-        The session has an expiration time defined by the session_duration
-        attribute.
+    def session_value(self, user_id: str) -> dict:
+        """Returns the session dictionary of a new session of a user.
+
+        The session is stored with the user_id and creation time as
+        values, in one write to the session store. The session has an
+        expiration time defined by the session_duration attribute.
 
         Args:
-            user_id (int): The id of the user to create a session for
+            user_id (str): The id of the user to create a session for
 
         Returns:
-            str: The session ID if the session was successfully created, None
-        otherwise
+            dict: The user_id and the creation time of the session
         """
-        # Call the create_session method of the superclass
-        # This will create a session ID and store the user_id to session_id
-        # mapping in the user_id_by_session_id dictionary
-        sessn_id = super().create_session(user_id)
-        # If the session was not created, return None
-        if sessn_id is None:
-            return None
-        # Add the created_at key to the session dictionary
-        # The value of this key is the current time
-        self.user_id_by_session_id[sessn_id] = {
+        return {
             'user_id': user_id,
             'created_at': dt.now()
         }
-        # Return the session ID
-        return sessn_id
 
     def user_id_for_session_id(self, session_id: str) -> int:
         """Gets the user_id associated with a session ID.
 
         The session is considered valid if it was created within the
-        session_duration time.
+        session_duration time: the session store drops it once that time
+        has passed on the monotonic clock, and its sweeper purges the
+        sessions nobody looks up again.
 
         Args:
             session_id (str): The session ID to get the user_id for
@@ -77,33 +69,14 @@ class SessionExpAuth(SessionAuth):
         # If the session_id is None, return None
         if session_id is None:
             return None
-        # If the user_id_by_session_id dictionary does not contain the
-        # session_id, return None
-        if session_id not in self.user_id_by_session_id:
-            return None
-        # Get the session info from the user_id_by_session_id dictionary
+        # Get the session info from the store; an expired session is gone
         session_dict = self.user_id_by_session_id.get(session_id)
         if session_dict is None:
             return None
-        # If the session_duration is 0 or less, return the user_id
-        if self.session_duration <= 0:
-            return session_dict.get("user_id")
-        # Get created_at from session info
-        created_at = session_dict.get('created_at')
         # If the created_at key does not exist in the session dictionary,
-        # return None
-        if created_at is None:
-            return None
-        # Check if the session has expired
-        now = dt.now()
-        if created_at + timedelta(seconds=self.session_duration) < now:
-            return None
-        # Calculate the session expiration date
-        expires_at = session_dict["created_at"] + \
-            timedelta(seconds=self.session_duration)
-        # Return None if the current time is past the expiration date
-        if expires_at < dt.now():
+        # the session has no start to expire from: return None
+        if self.session_duration > 0 and \
+                session_dict.get('created_at') is None:
             return None
-        # Return the user_id from the session dictionary if the session
-        # has not expired
+        # Return the user_id from the session dictionary
         return session_dict.get("user_id", None)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Module for the session store nodes of the partitioned session store
+
+A node is a MemorySessionStore served over TCP, one JSON request per
+line and one JSON response per line:
+
+    {"op": "get", "id": ...}                  -> {"found": bool, "value": ..}
+    {"op": "set", "id": ..., "value": ..., "ttl": seconds} -> {"ok": true}
+    {"op": "delete", "id": ...}               -> {"ok": bool}
+    {"op": "dump"}                 -> {"entries": [[id, value, ttl], ...]}
+    {"op": "stats"}                           -> the stats of the store
+
+Usage: python3 -m api.v1.auth.session_node [host:]port [max_entries]
+"""
+import socketserver
+import sys
+from threading import Thread
+from typing import Tuple
+
+from .session_store import MemorySessionStore, decode, encode
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Return the (host, port) of "host:port" or "port" (localhost)."""
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Serves the requests of one connection until it is closed."""
+
+    def handle(self):
+        """Answer every request line of the connection."""
+        store = self.server.store
+        for line in self.rfile:
+            try:
+                request = decode(line)
+                op = request['op']
+                if op == 'get':
+                    value = store.get(request['id'], self)
+                    response = {'found': value is not self,
+                                'value': None if value is self else value}
+                elif op == 'set':
+                    store.set(request['id'], request['value'],
+                              request.get('ttl', 0))
+                    response = {'ok': True}
+                elif op == 'delete':
+                    response = {'ok': store.delete(request['id'])}
+                elif op == 'dump':
+                    response = {'entries': store.dump()}
+                elif op == 'stats':
+                    response = store.stats()
+                else:
+                    response = {'error': 'unknown op'}
+            except (ValueError, KeyError, TypeError) as err:
+                response = {'error': str(err)}
+            self.wfile.write(encode(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class SessionNode(socketserver.ThreadingTCPServer):
+    """A session store node: a MemorySessionStore behind a TCP server,
+    one thread per connection."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: str = '127.0.0.1:0',
+                 max_entries: int = 0):
+        """Bind the node.
+
+        Args:
+            address (str): "host:port" to listen on, port 0 for any.
+            max_entries (int): Sessions kept at most, 0 or less for no
+                bound.
+        """
+        # Sessions expire with the TTL of each request
+        self.store = MemorySessionStore(max_entries, 3600)
+        super().__init__(parse_address(address), _Handler)
+
+    @property
+    def address(self) -> str:
+        """The "host:port" the node listens on."""
+        host, port = self.server_address[:2]
+        return '{}:{}'.format(host, port)
+
+    def start(self) -> 'SessionNode':
+        """Serve in a daemon thread; return the node."""
+        Thread(target=self.serve_forever, daemon=True,
+               name='session-node-{}'.format(self.address)).start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+        self.store.close()
+
+
+if __name__ == "__main__":
+    node = SessionNode(sys.argv[1] if len(sys.argv) > 1 else '5100',
+                       int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    print(node.address, flush=True)
+    try:
+        node.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Module for the session stores of SessionAuth
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from importlib import import_module
+import json
+from math import ceil
+from threading import Lock
+from time import monotonic
+from typing import Iterator, Optional
+
+from .config import AuthConfig
+from .expiry import ExpirySweeper, TimerWheel
+
+# SESSION_STORE -> (module, class) of the store, imported on first use
+STORES = {
+    'memory': ('api.v1.auth.session_store', 'MemorySessionStore'),
+    'sqlite': ('api.v1.auth.sqlite_session_store', 'SQLiteSessionStore'),
+    'partitioned': ('api.v1.auth.partitioned_session_store',
+                    'PartitionedSessionStore'),
+}
+
+
+def encode(value) -> str:
+    """Serialize a session value (datetimes included) as JSON, for the
+    stores keeping sessions out of the process."""
+    return json.dumps(value, default=lambda obj: {
+        '__datetime__': obj.isoformat()})
+
+
+def decode(data: str):
+    """Deserialize a session value written by encode()."""
+    return json.loads(data, object_hook=lambda obj: datetime.fromisoformat(
+        obj['__datetime__']) if '__datetime__' in obj else obj)
+
+
+class SessionStore(ABC):
+    """Session ID -> session mapping used by SessionAuth.
+
+    Stores implement from_config(), get(), set(), delete(), __len__() and
+    __iter__() (a store lacking one cannot be created) and may extend
+    stats(); the dict operations SessionAuth uses (store[id] = value,
+    store.get(id), id in store, del store[id]) are built on them.
+    """
+
+    # Whether the sessions are seen by the other processes of the app
+    shared = False
+
+    @classmethod
+    @abstractmethod
+    def from_config(cls, config: AuthConfig,
+                    ttl: float = 0) -> 'SessionStore':
+        """Build the store from the settings, sessions living `ttl`
+        seconds."""
+
+    @abstractmethod
+    def get(self, session_id: str, default=None):
+        """Return the session of an ID, `default` if there is none."""
+
+    @abstractmethod
+    def set(self, session_id: str, value):
+        """Store the session of an ID."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Drop the session of an ID, tell if there was one."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of sessions stored."""
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the session IDs."""
+
+    def stats(self) -> dict:
+        """Return size and activity figures of the store."""
+        return {'size': len(self)}
+
+    def __setitem__(self, session_id: str, value):
+        """store[session_id] = value"""
+        self.set(session_id, value)
+
+    def __getitem__(self, session_id: str):
+        """store[session_id], KeyError if there is no such session."""
+        value = self.get(session_id, self)
+        if value is self:
+            raise KeyError(session_id)
+        return value
+
+    def __delitem__(self, session_id: str):
+        """del store[session_id], KeyError if there is no such session."""
+        if not self.delete(session_id):
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        """session_id in store"""
+        return self.get(session_id, self) is not self
+
+    def __repr__(self) -> str:
+        """The sessions, as a dict."""
+        return repr({session_id: self.get(session_id)
+                     for session_id in list(self)})
+
+
+class MemorySessionStore(SessionStore):
+    """Bounded in-process session store with LRU eviction and a TTL.
+
+    Sessions are kept in an OrderedDict, least recently used first, with
+    the monotonic time they expire at: a lookup of an expired session
+    drops it, and storing beyond `max_entries` evicts the least recently
+    used one. Every operation is O(1).
+
+    With a TTL, sessions are also scheduled on a timer wheel and a
+    background sweeper purges the expired ones every `sweep_interval`
+    seconds, so sessions nobody looks up again do not stay until evicted.
+    """
+
+    def __init__(self, max_entries: int = 100000, ttl: float = 0,
+                 sweep_interval: float = 1.0):
+        """Initialize an empty store.
+
+        Args:
+            max_entries (int): Sessions kept at most, 0 or less for no
+                bound.
+            ttl (float): Seconds a session lives after it is stored, 0 or
+                less for sessions that never expire.
+            sweep_interval (float): Seconds between two sweeps of expired
+                sessions, 0 or less to only drop them on lookup.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # session ID -> (value, monotonic expiry or None)
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._wheel: Optional[TimerWheel] = None
+        self._sweeper: Optional[ExpirySweeper] = None
+        if ttl > 0 and sweep_interval > 0:
+            # Slots for a whole TTL: a session is visited once, when due
+            slots = min(max(ceil(ttl / sweep_interval) + 1, 64), 4096)
+            self._wheel = TimerWheel(sweep_interval, slots)
+            self._sweeper = ExpirySweeper(self.sweep, sweep_interval)
+
+    @classmethod
+    def from_config(cls, config: AuthConfig,
+                    ttl: float = 0) -> 'MemorySessionStore':
+        """Build the store from SESSION_MAX_ENTRIES and
+        SESSION_SWEEP_INTERVAL."""
+        return cls(config.session_max_entries, ttl,
+                   config.session_sweep_interval)
+
+    def get(self, session_id: str, default=None):
+        """Return the session of an ID, `default` if there is none."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[1] is not None and entry[1] <= monotonic():
+                del self._entries[session_id]
+                if self._wheel is not None:
+                    self._wheel.cancel(session_id)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, session_id: str, value, ttl: float = None):
+        """Store the session of an ID, evicting the least recently used
+        one if the store is full.
+
+        Args:
+            session_id (str): The session ID.
+            value: The session.
+            ttl (float, optional): Seconds the session lives, 0 or less
+                for ever; the TTL of the store by default.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = monotonic() + ttl if ttl > 0 else None
+        with self._lock:
+            self._entries[session_id] = (value, expires_at)
+            self._entries.move_to_end(session_id)
+            if self._wheel is not None:
+                if expires_at is None:
+                    self._wheel.cancel(session_id)
+                else:
+                    self._wheel.schedule(session_id, expires_at)
+            if 0 < self.max_entries < len(self._entries):
+                evicted, _ = self._entries.popitem(last=False)
+                if self._wheel is not None:
+                    self._wheel.cancel(evicted)
+                self.evictions += 1
+        if self._sweeper is not None:
+            self._sweeper.start()
+
+    def delete(self, session_id: str) -> bool:
+        """Drop the session of an ID, tell if there was one."""
+        with self._lock:
+            if self._wheel is not None:
+                self._wheel.cancel(session_id)
+            return self._entries.pop(session_id, None) is not None
+
+    def dump(self) -> list:
+        """Return the live sessions as (ID, value, seconds left or 0)
+        tuples, least recently used first."""
+        now = monotonic()
+        with self._lock:
+            return [(session_id, value, expires_at - now if expires_at
+                     else 0) for session_id, (value, expires_at)
+                    in self._entries.items()
+                    if expires_at is None or expires_at > now]
+
+    def sweep(self, limit: int = 0) -> tuple:
+        """Drop the expired sessions, without scanning the others.
+
+        Args:
+            limit (int): Sessions dropped at most, 0 or less for all.
+
+        Returns:
+            tuple: The number of sessions dropped and of expired sessions
+            left (the backlog).
+        """
+        if self._wheel is None:
+            return 0, 0
+        now = monotonic()
+        with self._lock:
+            expired = self._wheel.advance(now, limit)
+            for session_id in expired:
+                self._entries.pop(session_id, None)
+            self.expirations += len(expired)
+            return len(expired), self._wheel.backlog(now)
+
+    def close(self):
+        """Stop the sweeper thread."""
+        if self._sweeper is not None:
+            self._sweeper.close()
+
+    def __len__(self) -> int:
+        """Number of sessions stored, expired ones not dropped yet
+        included."""
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over a copy of the session IDs."""
+        with self._lock:
+            return iter(list(self._entries))
+
+    def stats(self) -> dict:
+        """Return the size, bound, hits, misses, evictions and
+        expirations of the store, and the figures of its sweeper."""
+        with self._lock:
+            stats = {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+            if self._wheel is not None:
+                backlog = self._wheel.backlog(monotonic())
+        if self._sweeper is not None:
+            stats.update(self._sweeper.stats(), backlog=backlog)
+        return stats
+
+
+def create(config: AuthConfig = None, ttl: float = 0) -> SessionStore:
+    """Create the session store selected by SESSION_STORE.
+
+    Args:
+        config (AuthConfig, optional): Defaults to AuthConfig.from_env().
+        ttl (float): Seconds a session lives, 0 or less for no expiry.
+
+    Returns:
+        SessionStore: The store; unknown names give a MemorySessionStore.
+    """
+    config = config or AuthConfig.from_env()
+    module, name = STORES.get(config.session_store, STORES['memory'])
+    return getattr(import_module(module), name).from_config(config, ttl)
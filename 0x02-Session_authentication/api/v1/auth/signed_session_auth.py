@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Module for stateless signed session authentication
+"""
+import base64
+import binascii
+import hashlib
+from heapq import heappop, heappush
+import hmac
+import json
+import secrets
+from threading import Lock
+from time import time
+from typing import Dict, List, Tuple
+
+from .config import AuthConfig
+from .session_auth import SessionAuth
+
+# Lifetime in seconds of the sessions when SESSION_DURATION is 0 or less:
+# a revocation is kept until its session expires, so every one must
+DEFAULT_DURATION = 24 * 3600
+
+
+def _b64encode(data: bytes) -> str:
+    """Encode bytes as unpadded URL-safe Base64."""
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data: str) -> bytes:
+    """Decode unpadded URL-safe Base64."""
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+class SignedSessionAuth(SessionAuth):
+    """Session authentication whose session ID is a signed cookie.
+
+    The cookie is <key id>.<payload>.<signature>: the payload holds the
+    user ID, a random session ID (jti), the issue and expiry times, and the
+    signature is an HMAC-SHA256 of the key id and payload. Checking it
+    needs no server-side lookup, so any node sharing the keys accepts it.
+
+    Keys come from SESSION_KEYS ("kid:secret,kid:secret"): the first one
+    signs, all of them verify, so a key is rotated by putting a new one
+    first and dropping the old one once its sessions have expired. Without
+    SESSION_KEYS a random key is made, valid in this process only.
+
+    Logging out adds the session ID to a revocation set, kept until the
+    session would have expired anyway; it is local to the process. The
+    sessions always expire, after DEFAULT_DURATION seconds when
+    SESSION_DURATION is 0 or less, so the set stays small. No session
+    store is built: nothing is kept per session.
+    """
+
+    # A session is an HMAC and a dict lookup
+    cost = 1
+
+    def __init__(self, config: AuthConfig = None):
+        """Initialize the backend with the keys of the settings."""
+        super().__init__(config)
+        keys = self.config.session_keys or \
+            (('local', secrets.token_urlsafe(32)),)
+        self.keys: Dict[str, bytes] = {kid: secret.encode()
+                                       for kid, secret in keys}
+        self.signing_kid = keys[0][0]
+        self.duration = self.config.session_duration \
+            if self.config.session_duration > 0 else DEFAULT_DURATION
+        # jti -> expiry
+        self.revoked: Dict[str, int] = {}
+        # (expiry, jti) of the revocations that expire, soonest first
+        self._revoked_expiry: List[Tuple[int, str]] = []
+        self._revoked_lock = Lock()
+
+    def create_store(self) -> None:
+        """No session store: the sessions are in the cookies."""
+        return None
+
+    def _sign(self, kid: str, payload: str) -> str:
+        """Return the signature of a payload with a key."""
+        return _b64encode(hmac.new(self.keys[kid],
+                                   (kid + '.' + payload).encode(),
+                                   hashlib.sha256).digest())
+
+    def create_session(self, user_id: str = None) -> str:
+        """Creates a signed session for a user_id.
+
+        Args:
+            user_id (str, optional): The ID of user to create a session for.
+                Defaults to None.
+
+        Returns:
+            str: The session cookie if the user ID is valid, None otherwise.
+        """
+        if not isinstance(user_id, str):
+            return None
+        now = int(time())
+        claims = {'sub': user_id, 'jti': secrets.token_urlsafe(12),
+                  'iat': now, 'exp': now + self.duration}
+        payload = _b64encode(json.dumps(claims,
+                                        separators=(',', ':')).encode())
+        kid = self.signing_kid
+        return '.'.join((kid, payload, self._sign(kid, payload)))
+
+    def claims(self, session_id: str = None) -> dict:
+        """Returns the claims of a session cookie if it is valid.
+
+        Args:
+            session_id (str, optional): The session cookie. Defaults to None.
+
+        Returns:
+            dict: The claims (sub, jti, iat, exp), or None if the signature
+            is wrong, the key unknown, or the session expired, without
+            expiry or revoked.
+        """
+        # Cookies made here are ASCII; compare_digest() rejects other str
+        if not isinstance(session_id, str) or not session_id.isascii() or \
+                session_id.count('.') != 2:
+            return None
+        kid, payload, signature = session_id.split('.')
+        if kid not in self.keys or \
+                not hmac.compare_digest(signature, self._sign(kid, payload)):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+        except (binascii.Error, ValueError):
+            return None
+        # A session without expiry could not be revoked for good
+        exp = claims.get('exp')
+        if not isinstance(exp, int) or exp <= time():
+            return None
+        if claims.get('jti') in self.revoked:
+            return None
+        return claims
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """Retrieves the user ID of a signed session cookie.
+
+        Args:
+            session_id (str, optional): The session cookie. Defaults to None.
+
+        Returns:
+            str: The user ID if the session is valid, None otherwise.
+        """
+        claims = self.claims(session_id)
+        return claims.get('sub') if claims else None
+
+    def destroy_session(self, request=None) -> bool:
+        """Revokes the session of the request until it expires.
+
+        Args:
+            request (flask.request, optional): The Flask request object.
+                Defaults to None.
+
+        Returns:
+            bool: True if the session was revoked, False otherwise.
+        """
+        claims = self.claims(self.session_cookie(request))
+        if claims is None:
+            return False
+        jti, exp = claims['jti'], claims['exp']
+        now = time()
+        with self._revoked_lock:
+            # Sessions past their expiry are rejected anyway
+            while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+                self.revoked.pop(heappop(self._revoked_expiry)[1], None)
+            # Revoked meanwhile by a concurrent logout
+            if jti in self.revoked:
+                return False
+            self.revoked[jti] = exp
+            heappush(self._revoked_expiry, (exp, jti))
+        return True
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Module for the session store shared by the processes of a host
+"""
+from collections import OrderedDict
+import sqlite3
+from threading import Lock, local
+from time import time
+from typing import Iterator, Optional
+
+from .config import AuthConfig
+from .expiry import ExpirySweeper
+from .session_store import SessionStore, decode, encode
+
+# Seconds the change log is kept; a process not reading it for longer
+# drops its whole cache
+CHANGE_LOG_KEEP = 60.0
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite WAL database, with an in-process cache.
+
+    Every worker process of a host opens the same database, so a session
+    created by one is known to all. Lookups are served from a bounded LRU
+    cache of the sessions read; a session deleted or replaced by another
+    process is dropped from the cache through a change log, read only
+    when `PRAGMA data_version` tells the database was written by another
+    connection, so a cache hit takes no database lock.
+
+    Expiry times are wall-clock (the database outlives the processes) and
+    indexed: the sweeper deletes the expired rows without a scan.
+    """
+
+    # Sessions are seen by every process of the host
+    shared = True
+
+    def __init__(self, db_path: str = '.db_sessions.sqlite3',
+                 cache_entries: int = 100000, ttl: float = 0,
+                 sweep_interval: float = 1.0):
+        """Initialize the store (connections are opened lazily).
+
+        Args:
+            db_path (str): SQLite database file.
+            cache_entries (int): Sessions cached at most in this process,
+                0 or less for no bound.
+            ttl (float): Seconds a session lives after it is stored, 0 or
+                less for sessions that never expire.
+            sweep_interval (float): Seconds between two sweeps of expired
+                sessions and of the change log, 0 or less for none.
+        """
+        self.db_path = db_path
+        self.cache_entries = cache_entries
+        self.ttl = ttl
+        self._local = local()
+        # session ID -> (value, wall-clock expiry or None)
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = Lock()
+        self._sync_lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.cache_resets = 0
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY '
+                     'KEY, value TEXT NOT NULL, expires_at REAL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires_at '
+                     'ON sessions (expires_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS session_changes (seq '
+                     'INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL, '
+                     'at REAL NOT NULL)')
+        # Last change applied to the cache
+        self._seq = self._last_change(conn)
+        self._sweeper: Optional[ExpirySweeper] = None
+        if sweep_interval > 0:
+            self._sweeper = ExpirySweeper(self.sweep, sweep_interval)
+
+    @classmethod
+    def from_config(cls, config: AuthConfig,
+                    ttl: float = 0) -> 'SQLiteSessionStore':
+        """Build the store from SESSION_SQLITE_PATH, SESSION_MAX_ENTRIES
+        (the cache bound) and SESSION_SWEEP_INTERVAL."""
+        return cls(config.session_sqlite_path, config.session_max_entries,
+                   ttl, config.session_sweep_interval)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   check_same_thread=False, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.version = None
+        return conn
+
+    @staticmethod
+    def _last_change(conn: sqlite3.Connection) -> int:
+        """Return the number of the last change ever logged; unlike
+        MAX(seq), trimming the log does not lower it."""
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = "
+                           "'session_changes'").fetchone()
+        return row[0] if row else 0
+
+    def _sync(self, conn: sqlite3.Connection):
+        """Drop from the cache the sessions other processes changed."""
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._local.version:
+            return
+        self._local.version = version
+        with self._sync_lock:
+            # One read transaction: the rows and the last change agree
+            conn.execute('BEGIN')
+            try:
+                last = self._last_change(conn)
+                rows = [] if last <= self._seq else conn.execute(
+                    'SELECT seq, id FROM session_changes WHERE seq > ? '
+                    'ORDER BY seq', (self._seq,)).fetchall()
+            finally:
+                conn.execute('COMMIT')
+            if last <= self._seq:
+                return
+            with self._lock:
+                # Changes were trimmed before this process read them
+                if not rows or rows[0][0] != self._seq + 1:
+                    self._cache.clear()
+                    self.cache_resets += 1
+                else:
+                    for _, session_id in rows:
+                        self._cache.pop(session_id, None)
+                self._seq = last
+                self.invalidations += len(rows)
+
+    def get(self, session_id: str, default=None):
+        """Return the session of an ID, `default` if there is none."""
+        conn = self._conn()
+        self._sync(conn)
+        now = time()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                if entry[1] is None or entry[1] > now:
+                    self._cache.move_to_end(session_id)
+                    self.hits += 1
+                    return entry[0]
+                del self._cache[session_id]
+            seq = self._seq
+        row = conn.execute('SELECT value, expires_at FROM sessions WHERE '
+                           'id = ?', (session_id,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            with self._lock:
+                self.misses += 1
+            return default
+        value = decode(row[0])
+        with self._lock:
+            self.loads += 1
+            # Not cached if a change was applied meanwhile: it may be this
+            # session's
+            if seq == self._seq:
+                self._cache[session_id] = (value, row[1])
+                if 0 < self.cache_entries < len(self._cache):
+                    self._cache.popitem(last=False)
+        return value
+
+    def set(self, session_id: str, value):
+        """Store the session of an ID, replacing it in every process."""
+        expires_at = time() + self.ttl if self.ttl > 0 else None
+        data = encode(value)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('UPDATE sessions SET value = ?, expires_at = ? '
+                            'WHERE id = ?',
+                            (data, expires_at, session_id)).rowcount:
+                conn.execute('INSERT INTO session_changes (id, at) VALUES '
+                             '(?, ?)', (session_id, time()))
+            else:
+                conn.execute('INSERT INTO sessions (id, value, expires_at) '
+                             'VALUES (?, ?, ?)',
+                             (session_id, data, expires_at))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        with self._lock:
+            self._cache.pop(session_id, None)
+        if self._sweeper is not None:
+            self._sweeper.start()
+
+    def delete(self, session_id: str) -> bool:
+        """Drop the session of an ID in every process, tell if there was
+        one."""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            deleted = conn.execute('DELETE FROM sessions WHERE id = ?',
+                                   (session_id,)).rowcount
+            if deleted:
+                conn.execute('INSERT INTO session_changes (id, at) VALUES '
+                             '(?, ?)', (session_id, time()))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        with self._lock:
+            self._cache.pop(session_id, None)
+        if self._sweeper is not None:
+            self._sweeper.start()
+        return bool(deleted)
+
+    def sweep(self, limit: int = 0) -> tuple:
+        """Delete the expired sessions, in expiry order, and the old
+        entries of the change log.
+
+        Args:
+            limit (int): Sessions deleted at most, 0 or less for all.
+
+        Returns:
+            tuple: The number of sessions deleted and of expired sessions
+            left (the backlog).
+        """
+        now = time()
+        conn = self._conn()
+        # Expired sessions are skipped by lookups: no change to log
+        deleted = conn.execute(
+            'DELETE FROM sessions WHERE id IN (SELECT id FROM sessions '
+            'WHERE expires_at <= ? ORDER BY expires_at LIMIT ?)',
+            (now, limit if limit > 0 else -1)).rowcount
+        conn.execute('DELETE FROM session_changes WHERE at < ?',
+                     (now - CHANGE_LOG_KEEP,))
+        backlog = conn.execute('SELECT COUNT(*) FROM sessions WHERE '
+                               'expires_at <= ?', (now,)).fetchone()[0]
+        return deleted, backlog
+
+    def close(self):
+        """Stop the sweeper thread."""
+        if self._sweeper is not None:
+            self._sweeper.close()
+
+    def __len__(self) -> int:
+        """Number of sessions stored, expired ones not deleted yet
+        included."""
+        return self._conn().execute(
+            'SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over a copy of the session IDs."""
+        return iter([row[0] for row in self._conn().execute(
+            'SELECT id FROM sessions')])
+
+    def stats(self) -> dict:
+        """Return the size, the cache figures (hits, database loads,
+        misses, sessions invalidated by other processes) and the figures
+        of the sweeper."""
+        size = len(self)
+        with self._lock:
+            stats = {
+                'size': size,
+                'cache_size': len(self._cache),
+                'cache_entries': self.cache_entries,
+                'hits': self.hits,
+                'loads': self.loads,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'cache_resets': self.cache_resets,
+            }
+        if self._sweeper is not None:
+            stats.update(self._sweeper.stats())
+        return stats
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Module for API token authentication
+"""
+import secrets
+from threading import Lock
+from time import time
+from typing import TypeVar
+
+from models.api_token import ApiToken
+from models.user import User
+
+from .auth import Auth
+from .config import AuthConfig
+
+
+class TokenAuth(Auth):
+    """Authentication by opaque API tokens: Authorization: Bearer <token>.
+
+    A token is random and only its SHA-256 digest is stored (see
+    models.api_token), so checking one is a digest and an index lookup,
+    with no slow password hash. Tokens expire after TOKEN_DURATION seconds
+    (never when 0 or less) and can be revoked; an expired token is deleted
+    when it is next presented.
+    """
+
+    # A token is a SHA-256 digest and an index lookup
+    cost = 1
+
+    def __init__(self, config: AuthConfig = None):
+        """Initialize the backend (tokens are loaded on first use)."""
+        super().__init__(config)
+        self.token_duration = self.config.token_duration
+        self._loaded = False
+        self._load_lock = Lock()
+
+    def _load(self):
+        """Load the tokens from file once."""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                ApiToken.load_from_file()
+                self._loaded = True
+
+    def has_credentials(self, request=None) -> bool:
+        """Tells if the request has a Bearer Authorization header.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            bool: True if the Authorization header starts by Bearer.
+        """
+        return self.extract_token(self.authorization_header(request)) \
+            is not None
+
+    def extract_token(self, authorization_header: str) -> str:
+        """Extracts the token of a Bearer Authorization header.
+
+        Args:
+            authorization_header (str): The Authorization header string.
+
+        Returns:
+            str: The token, or None if the header is not a Bearer one.
+        """
+        if not isinstance(authorization_header, str) or \
+                not authorization_header.startswith("Bearer "):
+            return None
+        return authorization_header[len("Bearer "):].strip() or None
+
+    def issue_token(self, user_id: str = None) -> str:
+        """Creates a token for a user.
+
+        Args:
+            user_id (str, optional): The ID of the user. Defaults to None.
+
+        Returns:
+            str: The token, which is not stored and only returned here, or
+            None if user_id is not a string.
+        """
+        if not isinstance(user_id, str):
+            return None
+        self._load()
+        token = secrets.token_urlsafe(32)
+        expires_at = int(time()) + self.token_duration \
+            if self.token_duration > 0 else None
+        ApiToken(user_id=user_id, digest=ApiToken.digest_of(token),
+                 expires_at=expires_at).save()
+        return token
+
+    def _find(self, token: str) -> ApiToken:
+        """Return the stored token, None if unknown."""
+        if not isinstance(token, str):
+            return None
+        self._load()
+        tokens = ApiToken.search({'digest': ApiToken.digest_of(token)})
+        return tokens[0] if tokens else None
+
+    def user_id_for_token(self, token: str = None) -> str:
+        """Retrieves the user ID of a token.
+
+        Args:
+            token (str, optional): The token. Defaults to None.
+
+        Returns:
+            str: The user ID, or None if the token is unknown or expired.
+        """
+        api_token = self._find(token)
+        if api_token is None:
+            return None
+        if api_token.is_expired():
+            api_token.remove()
+            return None
+        return api_token.user_id
+
+    def revoke_token(self, token: str = None) -> bool:
+        """Revokes a token.
+
+        Args:
+            token (str, optional): The token. Defaults to None.
+
+        Returns:
+            bool: True if the token was revoked, False if it is unknown.
+        """
+        api_token = self._find(token)
+        if api_token is None:
+            return False
+        api_token.remove()
+        return True
+
+    def revoke_user_tokens(self, user_id: str = None) -> int:
+        """Revokes all the tokens of a user.
+
+        Args:
+            user_id (str, optional): The ID of the user. Defaults to None.
+
+        Returns:
+            int: The number of tokens revoked.
+        """
+        if not isinstance(user_id, str):
+            return 0
+        self._load()
+        tokens = ApiToken.search({'user_id': user_id})
+        ApiToken.remove_many(api_token.id for api_token in tokens)
+        return len(tokens)
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """Returns the User of the Bearer token of a request.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            User: The User instance, or None if the token is not valid.
+        """
+        token = self.extract_token(self.authorization_header(request))
+        user_id = self.user_id_for_token(token)
+        if user_id is None:
+            return None
+        return User.get(user_id)
+
+    def destroy_token(self, request=None) -> bool:
+        """Revokes the Bearer token of a request.
+
+        Args:
+            request (flask.request, optional): The request. Defaults to None.
+
+        Returns:
+            bool: True if the token was revoked, False otherwise.
+        """
+        return self.revoke_token(
+            self.extract_token(self.authorization_header(request)))
@@ -1,14 +1,31 @@
 #!/usr/bin/env python3
 """ DocDocDocDocDocDoc
 """
+from threading import Lock
+
 from flask import Blueprint
 
 app_views = Blueprint("app_views", __name__, url_prefix="/api/v1")
 
 from api.v1.views.index import *
 from api.v1.views.users import *
+from api.v1.views.session_auth import *
+from api.v1.views.token_auth import *
 
-User.load_from_file()
+_users_loaded = False
+_users_lock = Lock()
 
-from api.v1.views.session_auth import *
+
+@app_views.before_app_request
+def load_users():
+    """Load the users from file before the first request, not when the
+    app is imported: a worker boots without reading the user file.
+    """
+    global _users_loaded
+    if _users_loaded:
+        return
+    with _users_lock:
+        if not _users_loaded:
+            User.load_from_file()
+            _users_loaded = True
 
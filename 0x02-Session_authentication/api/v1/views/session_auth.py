@@ -3,12 +3,10 @@
 """
 
 
-import os
 from typing import Tuple
 
 from flask import abort, jsonify, request
 
-from api.v1.app import auth
 from api.v1.views import app_views
 from models.user import User
 
@@ -39,11 +37,13 @@ def session_auth_login() -> Tuple[str, int]:
         return jsonify({"error": "wrong password"}), 401
     # Otherwise, create a Session ID for the User ID
     # You must use auth.create_session(..) for creating a Session ID
+    # (imported here: api.v1.app imports this module while it initializes)
+    from api.v1.app import auth
     session_id = auth.create_session(getattr(user[0], 'id'))
     # Return the User in JSON format
     response = jsonify(user[0].to_json())
     # Set the cookie in the response
-    response.set_cookie(os.getenv("SESSION_NAME"), session_id)
+    response.set_cookie(auth.config.session_name, session_id)
     # Return the response with the User and the cookie
     return response
 
@@ -57,6 +57,7 @@ def session_auth_logout():
         - An empty JSON object.
     """
     # You must use auth.destroy_session(request) for deleting the Session ID
+    from api.v1.app import auth
     is_destroyed = auth.destroy_session(request)
     # If destroy_session returns False, abort(404)
     if not is_destroyed:
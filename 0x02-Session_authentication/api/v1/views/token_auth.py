@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Module for API token views.
+"""
+from typing import Tuple
+
+from flask import abort, jsonify, request
+
+from api.v1.views import app_views
+from models.user import User
+
+
+@app_views.route('/auth_token/login', methods=['POST'], strict_slashes=False)
+def token_auth_login() -> Tuple[str, int]:
+    """POST /api/v1/auth_token/login
+
+    Returns:
+        - The token and the JSON representation of the User; the token is
+          only ever shown here.
+        - 404 if the app does not authenticate by token.
+    """
+    from api.v1.app import auth
+    if not hasattr(auth, 'issue_token'):
+        abort(404)
+    email = request.form.get('email')
+    password = request.form.get('password')
+    if not email:
+        return jsonify({"error": "email missing"}), 400
+    if not password:
+        return jsonify({"error": "password missing"}), 400
+    user = User.search({'email': email})
+    if not user:
+        return jsonify({"error": "no user found for this email"}), 404
+    if not user[0].is_valid_password(password):
+        return jsonify({"error": "wrong password"}), 401
+    token = auth.issue_token(user[0].id)
+    # A chain without a token backend
+    if token is None:
+        abort(404)
+    return jsonify({"token": token, "user": user[0].to_json()}), 201
+
+
+@app_views.route(
+    '/auth_token/logout', methods=['DELETE'], strict_slashes=False)
+def token_auth_logout():
+    """DELETE /api/v1/auth_token/logout: revokes the Bearer token
+
+    Returns:
+        - An empty JSON object.
+        - 404 if the token is unknown or the app does not use tokens.
+    """
+    from api.v1.app import auth
+    if not hasattr(auth, 'destroy_token') or \
+            not auth.destroy_token(request):
+        abort(404)
+    return jsonify({}), 200
@@ -8,19 +8,98 @@ Handles operations related to the User model, including:
 - Updating user details
 """
 
-from flask import abort, jsonify, request
+from urllib.parse import urlencode
+
+from flask import Response, abort, jsonify, request
 from api.v1.views import app_views
+from models.base import to_epoch
 from models.user import User
 
 
+# Largest page of GET /api/v1/users?limit=
+MAX_PAGE = 1000
+
+
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """GET /api/v1/users
+    Query:
+        - limit (optional): page size, at most MAX_PAGE
+        - after (optional): id of the last user of the previous page
+        - email_prefix (optional): only users whose email starts with it,
+          ordered by email
+        - created_after (optional): only users created later than this
+          time (TIMESTAMP_FORMAT or epoch seconds), oldest first
     Returns:
-        - List of all User objects in JSON format
+        - With email_prefix or created_after, the first `limit` (or
+          MAX_PAGE) matching User objects
+        - With limit, one page of User objects ordered by id, and a
+          Link header to the next page when this one is full
+        - Otherwise all User objects from `after` on, streamed
+        - 400 error if limit is not a positive integer, created_after
+          is not a time, or after comes with email_prefix or created_after
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    after = request.args.get('after')
+    limit = request.args.get('limit')
+    email_prefix = request.args.get('email_prefix')
+    created_after = request.args.get('created_after')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= MAX_PAGE:
+            return jsonify({'error': f"limit must be between 1 and "
+                                     f"{MAX_PAGE}"}), 400
+
+    if email_prefix is not None or created_after is not None:
+        if after is not None:
+            # Filtered users are not in id order: no page follows an id
+            return jsonify({'error': "after cannot be used with "
+                                     "email_prefix or created_after"}), 400
+        ranges = {}
+        if created_after is not None:
+            try:
+                since = int(created_after) if created_after.isdigit() \
+                    else to_epoch(created_after)
+            except ValueError:
+                return jsonify({'error': "created_after must be a time"}), \
+                    400
+            ranges['created_at'] = (since + 1, None)
+        users = User.query(
+            prefix=None if email_prefix is None else {'email': email_prefix},
+            ranges=ranges,
+            order_by='created_at' if email_prefix is None else 'email',
+            limit=limit or MAX_PAGE)
+        return Response(b'[' + b','.join(user.to_json_bytes()
+                                         for user in users) + b']\n',
+                        mimetype='application/json')
+
+    if limit is not None:
+        # Join the cached JSON of each user instead of re-encoding them
+        users = User.page(limit, after)
+        body = b','.join(user.to_json_bytes() for user in users)
+        response = Response(b'[' + body + b']\n',
+                            mimetype='application/json')
+        if len(users) == limit:
+            response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+                request.base_url,
+                urlencode({'limit': limit, 'after': users[-1].id}))
+        return response
+
+    def stream():
+        """Yield the JSON array one page of users at a time."""
+        sep, last = b'[', after
+        while True:
+            users = User.page(MAX_PAGE, last)
+            if users:
+                yield sep + b','.join(user.to_json_bytes() for user in users)
+                sep, last = b',', users[-1].id
+            if len(users) < MAX_PAGE:
+                break
+        yield b'[]\n' if sep == b'[' else b']\n'
+
+    return Response(stream(), mimetype='application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -42,7 +121,8 @@ def view_one_user(user_id: str = None) -> str:
     if user is None:
         abort(404)
 
-    return jsonify(user.to_json())
+    return Response(user.to_json_bytes() + b'\n',
+                    mimetype='application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
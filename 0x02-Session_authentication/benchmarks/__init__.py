@@ -0,0 +1,4 @@
+#!/usr/bin/env python3
+""" Benchmarks of the API and its models, run from the project root with
+python3 -m benchmarks.<name>
+"""
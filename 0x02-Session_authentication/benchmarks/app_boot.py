@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" Boot time of the API for each AUTH_TYPE
+
+Writes N users in a temporary directory, then for every AUTH_TYPE imports
+api.v1.app in a fresh interpreter under -X importtime and reports the
+import time of the app, the authentication modules it loaded and the
+time of its first request (which loads the users).
+
+Backends imported through the registry do not show in -X importtime
+output (importlib.import_module is not traced), so the modules loaded
+are read from sys.modules.
+
+Usage: python3 -m benchmarks.app_boot [users] [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKENDS = ('default', 'basic_auth', 'session_auth', 'session_exp_auth',
+            'session_db_auth')
+
+BOOT = """
+import sys, time
+start = time.perf_counter()
+import api.v1.app
+imported = time.perf_counter()
+api.v1.app.app.test_client().get('/api/v1/status')
+print(imported - start, time.perf_counter() - imported, ','.join(sorted(
+    name for name in sys.modules
+    if name.startswith('api.v1.auth.') or name == 'models.user_session')))
+"""
+
+
+def importtime(stderr: str, module: str) -> int:
+    """Return the cumulative import time of a module in us."""
+    for line in stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1])
+    return 0
+
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    root = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+
+    from models.user import User
+
+    User.save_many(User(email="user{}@hbtn.io".format(i), first_name="Bob")
+                   for i in range(n_users))
+    print("users={}".format(n_users))
+    for auth_type in BACKENDS:
+        env = dict(os.environ, PYTHONPATH=root, AUTH_TYPE=auth_type,
+                   SESSION_NAME='_my_session_id')
+        best = None
+        for _ in range(runs):
+            out = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', BOOT], env=env,
+                capture_output=True, text=True, check=True)
+            load, first, modules = out.stdout.split()
+            result = (importtime(out.stderr, 'api.v1.app'), float(load),
+                      float(first))
+            best = result if best is None else tuple(map(min, best, result))
+        print("{}: importtime api.v1.app {:.1f} ms, import {:.3f} s, first "
+              "request {:.3f} s (best of {})\n    {}".format(
+                  auth_type, best[0] / 1000, best[1], best[2], runs,
+                  modules.replace(',', ' ')))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Cost of Auth.require_auth against the number of excluded paths
+
+Compares the linear scan require_auth used to do over a list of excluded
+paths with the ExcludedPaths matcher compiled once, for N excluded paths
+(half of them ending by *) and request paths that are an exact match, a
+wildcard match, and not excluded. Both must agree on every path.
+
+Usage: python3 -m benchmarks.excluded_paths [calls]
+"""
+import sys
+import timeit
+
+from api.v1.auth.auth import Auth
+from api.v1.auth.paths import ExcludedPaths
+
+SIZES = (4, 50, 200)
+
+
+def linear(path: str, excluded_paths: list) -> bool:
+    """require_auth as a scan of the list, as before."""
+    if not path or not excluded_paths:
+        return True
+    path = path.rstrip("/")
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith("*") and \
+                path.startswith(excluded_path[:-1]):
+            return False
+        elif path == excluded_path.rstrip("/"):
+            return False
+    return True
+
+
+def routes(n_paths: int) -> list:
+    """Return n_paths excluded paths, every other one a wildcard."""
+    return ['/api/v1/public{}/*'.format(i) if i % 2 else
+            '/api/v1/page{}/'.format(i) for i in range(n_paths)]
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    auth = Auth()
+    for n_paths in SIZES:
+        excluded = routes(n_paths)
+        compiled = ExcludedPaths(excluded)
+        requests = {
+            'exact': '/api/v1/page{}'.format(n_paths - 2),
+            'wildcard': '/api/v1/public{}/doc/1'.format(n_paths - 1),
+            'miss': '/api/v1/users/me',
+        }
+        for name, path in requests.items():
+            assert linear(path, excluded) == \
+                auth.require_auth(path, compiled), (n_paths, path)
+            before = timeit.timeit(lambda: linear(path, excluded),
+                                   number=calls) / calls
+            after = timeit.timeit(lambda: auth.require_auth(path, compiled),
+                                  number=calls) / calls
+            print("{} paths, {}: list {:.2f} us, compiled {:.2f} us "
+                  "({:.1f}x)".format(n_paths, name, before * 1e6,
+                                     after * 1e6, before / after))
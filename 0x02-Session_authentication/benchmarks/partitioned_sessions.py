@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+""" Throughput and rebalancing of the partitioned session store
+
+Starts store nodes as local processes (api.v1.auth.session_node), then:
+- throughput: C client processes each create sessions through
+  SessionExpAuth and look up random ones, with 1, 2 and 4 nodes;
+- rebalance: with 3 nodes, creates sessions, adds a 4th node, kills one
+  node, then removes it from the ring, checking after each step that
+  every session is still found.
+
+Usage: python3 -m benchmarks.partitioned_sessions [clients] [sessions]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from api.v1.auth.partitioned_session_store import PartitionedSessionStore
+
+RUN = """
+import json, random, sys, time
+from api.v1.auth.session_exp_auth import SessionExpAuth
+
+n_sessions = int(sys.argv[1])
+auth = SessionExpAuth()
+start = time.perf_counter()
+ids = [auth.create_session('user{}'.format(i)) for i in range(n_sessions)]
+created = time.perf_counter() - start
+lookups = [random.choice(ids) for _ in range(n_sessions * 4)]
+start = time.perf_counter()
+found = sum(auth.user_id_for_session_id(session_id) is not None
+            for session_id in lookups)
+looked_up = time.perf_counter() - start
+print(json.dumps({'sets': n_sessions, 'set_seconds': created,
+                  'gets': len(lookups), 'get_seconds': looked_up,
+                  'found': found}))
+"""
+
+
+def start_nodes(count: int) -> list:
+    """Start store node processes; return (process, address) pairs."""
+    nodes = []
+    for _ in range(count):
+        node = subprocess.Popen(
+            [sys.executable, '-m', 'api.v1.auth.session_node', '0'],
+            env=dict(os.environ, PYTHONPATH=os.getcwd()),
+            stdout=subprocess.PIPE, text=True)
+        nodes.append((node, node.stdout.readline().strip()))
+    return nodes
+
+
+def stop_nodes(nodes: list):
+    """Kill store node processes."""
+    for node, _ in nodes:
+        node.kill()
+        node.wait()
+
+
+def throughput(n_nodes: int, n_clients: int, n_sessions: int):
+    """Print the operations per second of clients sharing the nodes."""
+    nodes = start_nodes(n_nodes)
+    addresses = [address for _, address in nodes]
+    env = dict(os.environ, PYTHONPATH=os.getcwd(),
+               SESSION_STORE='partitioned', SESSION_DURATION='3600',
+               SESSION_NODES=','.join(addresses),
+               SESSION_REPLICAS=str(min(2, n_nodes)))
+    try:
+        start = time.perf_counter()
+        clients = [subprocess.Popen(
+            [sys.executable, '-c', RUN, str(n_sessions)],
+            env=dict(env, SESSION_LOCAL_NODE=addresses[i % n_nodes]),
+            stdout=subprocess.PIPE, text=True) for i in range(n_clients)]
+        results = [json.loads(client.communicate()[0])
+                   for client in clients]
+        elapsed = time.perf_counter() - start
+    finally:
+        stop_nodes(nodes)
+    ops = sum(r['sets'] + r['gets'] for r in results)
+    print("{} nodes: {:.0f} ops/s ({} clients), set {:.0f} us, get "
+          "{:.0f} us, {:.0%} found".format(
+              n_nodes, ops / elapsed, n_clients,
+              sum(r['set_seconds'] for r in results) /
+              sum(r['sets'] for r in results) * 1e6,
+              sum(r['get_seconds'] for r in results) /
+              sum(r['gets'] for r in results) * 1e6,
+              sum(r['found'] for r in results) /
+              sum(r['gets'] for r in results)))
+
+
+def rebalance(n_sessions: int):
+    """Print the sessions found after nodes join, fail and leave."""
+    nodes = start_nodes(4)
+    addresses = [address for _, address in nodes]
+    store = PartitionedSessionStore(addresses[:3], 2, ttl=3600)
+
+    def check(step: str, start: float):
+        found = sum(store.get('s{}'.format(i)) == i
+                    for i in range(n_sessions))
+        stats = store.stats()
+        print("{}: {:.1f} ms, {}/{} sessions found, moved {}, dropped {}, "
+              "sizes {}".format(step, (time.perf_counter() - start) * 1e3,
+                                found, n_sessions, stats['moved'],
+                                stats['dropped'],
+                                [n['size'] for n in stats['nodes'].values()]))
+
+    try:
+        start = time.perf_counter()
+        for i in range(n_sessions):
+            store.set('s{}'.format(i), i)
+        check('3 nodes', start)
+        start = time.perf_counter()
+        store.add_node(addresses[3])
+        check('node joined', start)
+        nodes[0][0].kill()
+        nodes[0][0].wait()
+        check('node killed', time.perf_counter())
+        start = time.perf_counter()
+        store.remove_node(addresses[0])
+        check('node removed', start)
+    finally:
+        stop_nodes(nodes)
+
+
+if __name__ == "__main__":
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    for n_nodes in (1, 2, 4):
+        throughput(n_nodes, n_clients, n_sessions)
+    rebalance(n_sessions * 4)
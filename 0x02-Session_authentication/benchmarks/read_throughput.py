@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+""" Read throughput of the model store while a writer keeps saving
+
+Reader threads run User.get/User.search(email) in a loop while one writer
+thread saves users (each save rewrites .db_User.json).
+
+Usage: python3 -m benchmarks.read_throughput [users] [readers] [seconds]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from models.user import User
+
+
+def reader(ids: list, emails: list, stop: threading.Event, out: list):
+    """Look users up until stopped, record count and worst latency."""
+    count, worst = 0, 0.0
+    while not stop.is_set():
+        i = random.randrange(len(ids))
+        start = time.perf_counter()
+        User.get(ids[i])
+        User.search({'email': emails[i]})
+        worst = max(worst, time.perf_counter() - start)
+        count += 1
+    out.append((count, worst))
+
+
+def writer(users: list, stop: threading.Event, out: list):
+    """Save random users until stopped."""
+    count = 0
+    while not stop.is_set():
+        random.choice(users).save()
+        count += 1
+    out.append(count)
+
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    os.chdir(tempfile.mkdtemp())
+
+    # Seed the JSON file directly: saving one by one rewrites it every time
+    seed = [User(email="user{}@hbtn.io".format(i)) for i in range(n_users)]
+    with open(".db_User.json", "w") as f:
+        json.dump({u.id: u.to_json(True) for u in seed}, f)
+    User.load_from_file()
+    users = User.all()
+    ids = [u.id for u in users]
+    emails = [u.email for u in users]
+
+    stop = threading.Event()
+    reads, writes = [], []
+    threads = [threading.Thread(target=reader, args=(ids, emails, stop, reads))
+               for _ in range(n_readers)]
+    threads.append(threading.Thread(target=writer, args=(users, stop, writes)))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    total_reads = sum(c for c, _ in reads)
+    print("users={} readers={} seconds={}".format(n_users, n_readers, seconds))
+    print("reads/s: {:.0f}".format(total_reads / seconds))
+    print("worst read latency: {:.1f} ms".format(
+        max(w for _, w in reads) * 1000))
+    print("writes/s: {:.1f}".format(sum(writes) / seconds))
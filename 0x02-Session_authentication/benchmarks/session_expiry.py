@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+""" Cost of purging expired sessions from the memory session store
+
+Stores N sessions of which a fraction expires, then purges the expired
+ones with the timer wheel sweep and with a full scan of the store, and
+reports the time per purged session and the longest time the store lock
+is held at once.
+
+Usage: python3 -m benchmarks.session_expiry [sessions] [expired fraction]
+"""
+import sys
+import time
+from time import monotonic, perf_counter
+
+from api.v1.auth.session_store import MemorySessionStore
+
+
+def fill(n_sessions: int, expired: float) -> MemorySessionStore:
+    """Return a store of n sessions, the `expired` fraction of them due
+    within a second, the others in an hour."""
+    store = MemorySessionStore(0, 3600, sweep_interval=0.1)
+    # Purge in the benchmark thread only
+    store.close()
+    n_expired = int(n_sessions * expired)
+    store.ttl = 0.5
+    for i in range(n_expired):
+        store.set('short{}'.format(i), i)
+    store.ttl = 3600
+    for i in range(n_sessions - n_expired):
+        store.set('long{}'.format(i), i)
+    return store
+
+
+def scan(store: MemorySessionStore) -> tuple:
+    """Purge the expired sessions by looking at every one of them; return
+    how many and the time the lock was held."""
+    start = perf_counter()
+    now = monotonic()
+    with store._lock:
+        expired = [session_id for session_id, (_, expires_at)
+                   in store._entries.items() if expires_at <= now]
+        for session_id in expired:
+            del store._entries[session_id]
+            store._wheel.cancel(session_id)
+    return len(expired), perf_counter() - start
+
+
+def wheel(store: MemorySessionStore) -> tuple:
+    """Purge the expired sessions in sweeper batches; return how many and
+    the longest batch."""
+    purged, longest = 0, 0.0
+    while True:
+        start = perf_counter()
+        batch, _ = store.sweep(10000)
+        longest = max(longest, perf_counter() - start)
+        purged += batch
+        if batch < 10000:
+            return purged, longest
+
+
+if __name__ == "__main__":
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    expired = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    print("sessions={} expired={:.0%}".format(n_sessions, expired))
+    for label, purge in (('scan', scan), ('wheel', wheel)):
+        store = fill(n_sessions, expired)
+        time.sleep(1)
+        start = perf_counter()
+        purged, longest = purge(store)
+        elapsed = perf_counter() - start
+        print("{}: {} purged in {:.1f} ms, {:.2f} us per session, lock "
+              "held {:.1f} ms at most".format(
+                  label, purged, elapsed * 1e3,
+                  elapsed * 1e6 / max(purged, 1), longest * 1e3))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+""" Memory and speed of the SessionAuth session stores
+
+Creates N sessions through SessionAuth.create_session, as abandoned
+logins would, then looks sessions up, with the plain dict SessionAuth
+used to keep and with the session store selected by the environment
+(SESSION_STORE, SESSION_MAX_ENTRIES, ...), each in a fresh interpreter.
+
+Usage: python3 -m benchmarks.session_store [sessions] [lookups]
+"""
+import json
+import os
+import subprocess
+import sys
+
+RUN = """
+import json, sys, time
+from collections import deque
+from api.v1.auth.session_auth import SessionAuth
+
+n_sessions, n_lookups, plain = int(sys.argv[1]), int(sys.argv[2]), \\
+    sys.argv[3] == 'dict'
+auth = SessionAuth()
+if plain:
+    auth.user_id_by_session_id = {}
+start = time.perf_counter()
+recent = deque((auth.create_session('user{}'.format(i))
+                for i in range(n_sessions)), n_lookups)
+created = time.perf_counter() - start
+start = time.perf_counter()
+for session_id in recent:
+    auth.user_id_for_session_id(session_id)
+looked_up = time.perf_counter() - start
+with open('/proc/self/status') as f:
+    rss_kb = [line.split()[1] for line in f if line.startswith('VmHWM')][0]
+store = auth.user_id_by_session_id
+print(json.dumps({
+    'create_us': created / n_sessions * 1e6,
+    'lookup_us': looked_up / len(recent) * 1e6,
+    'peak_rss_mb': int(rss_kb) / 1024,
+    'stats': store.stats() if hasattr(store, 'stats') else
+    {'size': len(store)},
+}))
+"""
+
+
+if __name__ == "__main__":
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    n_lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    print("sessions={}".format(n_sessions))
+    for label in ('dict', 'store'):
+        out = subprocess.run(
+            [sys.executable, '-c', RUN, str(n_sessions), str(n_lookups),
+             label], env=dict(os.environ, PYTHONPATH=os.getcwd()),
+            capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.splitlines()[-1])
+        print("{}: create {:.2f} us, lookup {:.2f} us, peak RSS {:.0f} MB, "
+              "{}".format(label, result['create_us'], result['lookup_us'],
+                          result['peak_rss_mb'], result['stats']))
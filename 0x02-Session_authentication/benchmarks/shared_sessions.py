@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+""" Sessions seen across worker processes, per session store
+
+Starts W worker processes, as gunicorn would, each with its own
+SessionAuth. Every worker creates sessions, then looks up the sessions
+of all the workers, as a load balancer spreading a user's requests
+would. Reports the share of sessions found, the lookups per second of
+all the workers and the share served without reading the database, with
+the memory and the sqlite session stores.
+
+Usage: python3 -m benchmarks.shared_sessions [workers] [sessions] [lookups]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RUN = """
+import json, os, random, sys, time
+from api.v1.auth.session_exp_auth import SessionExpAuth
+
+n_sessions, n_lookups, ids_dir = int(sys.argv[1]), int(sys.argv[2]), \\
+    sys.argv[3]
+auth = SessionExpAuth()
+with open(os.path.join(ids_dir, str(os.getpid())), 'w') as f:
+    f.write(' '.join(auth.create_session('user{}'.format(i))
+                     for i in range(n_sessions)))
+# Wait for the other workers to create theirs
+print('ready', flush=True)
+sys.stdin.readline()
+ids = []
+for name in os.listdir(ids_dir):
+    with open(os.path.join(ids_dir, name)) as f:
+        ids.extend(f.read().split())
+lookups = [random.choice(ids) for _ in range(n_lookups)]
+# Lookups of the sqlite store are served by the process cache once read
+start = time.perf_counter()
+found = sum(auth.user_id_for_session_id(session_id) is not None
+            for session_id in lookups)
+elapsed = time.perf_counter() - start
+print(json.dumps({'found': found, 'lookups': n_lookups,
+                  'seconds': elapsed,
+                  'hits': auth.user_id_by_session_id.stats().get('hits')}))
+"""
+
+
+def run(store: str, n_workers: int, n_sessions: int, n_lookups: int):
+    """Run the workers with a session store, print what they found."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ids_dir = os.path.join(tmp, 'ids')
+        os.mkdir(ids_dir)
+        env = dict(os.environ, PYTHONPATH=os.getcwd(), SESSION_STORE=store,
+                   SESSION_DURATION='3600',
+                   SESSION_SQLITE_PATH=os.path.join(tmp, 'sessions.db'))
+        workers = [subprocess.Popen(
+            [sys.executable, '-c', RUN, str(n_sessions), str(n_lookups),
+             ids_dir], env=env, stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, text=True) for _ in range(n_workers)]
+        for worker in workers:
+            worker.stdout.readline()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.stdin.write('\n')
+            worker.stdin.flush()
+        results = [json.loads(worker.communicate()[0])
+                   for worker in workers]
+        elapsed = time.perf_counter() - start
+    found = sum(r['found'] for r in results)
+    lookups = sum(r['lookups'] for r in results)
+    hits = sum(r['hits'] for r in results)
+    print("{}: {:.0%} of the sessions found, {:.0f} lookups/s over {} "
+          "workers, {:.0%} answered in process".format(
+              store, found / lookups, lookups / elapsed, n_workers,
+              hits / lookups))
+
+
+if __name__ == "__main__":
+    n_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    n_lookups = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    print("workers={} sessions={} lookups={}".format(
+        n_workers, n_sessions * n_workers, n_lookups * n_workers))
+    for store in ('memory', 'sqlite'):
+        run(store, n_workers, n_sessions, n_lookups)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+""" Snapshot time and writer stalls of User.snapshot
+
+Seeds N users in the JSON engine (write-behind, so a save only touches
+memory) and runs a writer thread changing and saving users. Writer
+latencies are measured while idle, during online snapshots, and during
+copies that hold the class read lock for the whole write, as a backup
+had to before.
+
+Usage: python3 -m benchmarks.snapshot [users] [snapshots]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(values: list, pct: float) -> float:
+    """Return the pct-th percentile of `values`, in ms."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n_snapshots = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    os.chdir(tempfile.mkdtemp())
+    os.environ['MODELS_WRITE_BEHIND'] = '1'
+    os.environ['MODELS_FLUSH_INTERVAL_MS'] = '3600000'
+
+    from models.base import STORAGE
+    from models.user import User
+
+    users = [User(email="user{}@hbtn.io".format(i), first_name="Bob")
+             for i in range(n_users)]
+    User.save_many(users)
+
+    latencies = []
+    stop = threading.Event()
+
+    def writer():
+        """Change and save users until stopped."""
+        i = 0
+        while not stop.is_set():
+            user = users[i % n_users]
+            start = time.perf_counter()
+            user.first_name = "Bob{}".format(i)
+            user.save()
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    def locked_copy(path: str):
+        """Copy the users while holding the read lock, as before."""
+        with STORAGE.locks['User'].read():
+            STORAGE._write(User, list(STORAGE.data['User'].values()),
+                           path, STORAGE.snapshot_format)
+
+    def phase(name: str, action):
+        """Run `action` n_snapshots times next to the writer."""
+        latencies.clear()
+        thread = threading.Thread(target=writer)
+        thread.start()
+        start = time.perf_counter()
+        durations = []
+        for _ in range(n_snapshots):
+            t = time.perf_counter()
+            action()
+            durations.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        thread.join()
+        stop.clear()
+        print("{}: {:.3f} s per copy, writer {:.0f} saves/s, "
+              "p99 {:.2f} ms, max {:.1f} ms".format(
+                  name, sum(durations) / len(durations),
+                  len(latencies) / elapsed, percentile(latencies, 99),
+                  max(latencies) * 1000))
+
+    print("users={}".format(n_users))
+    phase("idle", lambda: time.sleep(0.2))
+    phase("User.snapshot", lambda: User.snapshot('backup.json'))
+    phase("copy under read lock", lambda: locked_copy('locked.json'))
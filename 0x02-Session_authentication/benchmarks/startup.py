@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" Startup time of User.load_from_file for each data file format
+
+Writes N users as .db_User.json, .db_User.bin and .db_User.lazy in a
+temporary directory, then loads each file in a fresh interpreter and looks
+one user up by email.
+
+Usage: python3 -m benchmarks.startup [users]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# VmHWM (peak RSS) is reset by exec, unlike getrusage's ru_maxrss
+LOAD = """
+import sys, time
+from models.user import User
+start = time.perf_counter()
+User.load_from_file()
+loaded = time.perf_counter()
+User.search({'email': sys.argv[1]})
+elapsed = time.perf_counter() - loaded
+with open('/proc/self/status') as f:
+    rss_kb = [line.split()[1] for line in f if line.startswith('VmHWM')][0]
+print(loaded - start, elapsed, User.count(), rss_kb)
+"""
+
+# format -> (file extension, environment)
+FORMATS = {
+    'json': ('json', {'MODELS_SNAPSHOT_FORMAT': 'json'}),
+    'binary': ('bin', {'MODELS_SNAPSHOT_FORMAT': 'binary'}),
+    'lazy': ('lazy', {'MODELS_STORAGE': 'lazy'}),
+}
+
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    root = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    os.environ['PYTHONPATH'] = root
+
+    from models import lazy_engine, snapshot
+    from models.base import STORAGE
+    from models.user import User
+
+    start = time.perf_counter()
+    users = [User(email="user{}@hbtn.io".format(i), first_name="Bob",
+                  _password="$2b$12$" + "x" * 53) for i in range(n_users)]
+    for fmt in ('json', 'binary'):
+        STORAGE._write(User, users, STORAGE.file_path(User, fmt), fmt)
+    columns = snapshot.slot_names(User)
+    lazy_engine.write_file(User, '.db_User.lazy',
+                           (snapshot.to_row(u, columns) for u in users))
+    print("users={} (generated in {:.1f} s)".format(
+        n_users, time.perf_counter() - start))
+    del users
+
+    for fmt, (ext, env) in FORMATS.items():
+        out = subprocess.run(
+            [sys.executable, '-c', LOAD, "user{}@hbtn.io".format(n_users - 1)],
+            env=dict(os.environ, **env), capture_output=True, text=True,
+            check=True)
+        load, lookup, count, rss_kb = out.stdout.split()
+        size = os.path.getsize('.db_User.' + ext)
+        print("{}: load {:.3f} s, first lookup {:.2f} ms, {} objects, "
+              "peak RSS {:.0f} MB, file {:.1f} MB".format(
+                  fmt, float(load), float(lookup) * 1000, count,
+                  int(rss_kb) / 1024, size / 1e6))
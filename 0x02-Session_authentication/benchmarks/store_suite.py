@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+""" Model store benchmark suite, with a JSON report
+
+For every storage configuration and object count, a first interpreter
+seeds N users and N user sessions, then a fresh one loads them and
+measures, single-threaded and with N threads:
+    save (change a user, save it), get, search(email), count
+then save_to_file, the size of the data files and the peak RSS. Every
+operation runs for a fixed time, so slow ones (a write-through save of
+1M objects rewrites the whole file) still finish.
+
+Usage: python3 -m benchmarks.store_suite [--sizes 10000,100000,1000000]
+           [--configs json,json-wb,json-binary,sqlite,lazy] [--threads 4]
+           [--seconds 2] [--out report.json]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# configuration name -> environment selecting it
+CONFIGS = {
+    'json': {'MODELS_STORAGE': 'json'},
+    'json-wb': {'MODELS_STORAGE': 'json', 'MODELS_WRITE_BEHIND': '1'},
+    'json-binary': {'MODELS_STORAGE': 'json',
+                    'MODELS_SNAPSHOT_FORMAT': 'binary'},
+    'sqlite': {'MODELS_STORAGE': 'sqlite'},
+    'lazy': {'MODELS_STORAGE': 'lazy'},
+}
+OPERATIONS = ('save', 'get', 'search', 'count')
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process (VmHWM)."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def seed(n_objects: int):
+    """Create the users and sessions and persist them."""
+    from models.user import User
+    from models.user_session import UserSession
+
+    for model_cls in (User, UserSession):
+        model_cls.load_from_file()
+    users = [User(email="user{}@hbtn.io".format(i), first_name="Bob",
+                  _password="$2b$12$" + "x" * 53) for i in range(n_objects)]
+    User.save_many(users)
+    UserSession.save_many(UserSession(user_id=user.id,
+                                      session_id="session{}".format(i))
+                          for i, user in enumerate(users))
+    for model_cls in (User, UserSession):
+        model_cls.save_to_file()
+
+
+def measure(op, threads: int, seconds: float) -> dict:
+    """Run `op` in `threads` threads for `seconds`, return its stats."""
+    stop = threading.Event()
+    latencies = []
+
+    def worker():
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            op()
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'ops': count,
+        'ops_per_s': count / elapsed,
+        'mean_ms': sum(latencies) / count * 1000 if count else None,
+        'p99_ms': latencies[min(count - 1, int(count * 0.99))] * 1000
+        if count else None,
+        'max_ms': latencies[-1] * 1000 if count else None,
+    }
+
+
+def run(threads: int, seconds: float) -> dict:
+    """Load the seeded store and measure every operation."""
+    from models.base import flush
+    from models.user import User
+    from models.user_session import UserSession
+
+    start = time.perf_counter()
+    for model_cls in (User, UserSession):
+        model_cls.load_from_file()
+    result = {'load_from_file_s': time.perf_counter() - start}
+
+    sample = User.page(1000)
+    ids = [user.id for user in sample]
+    emails = [user.email for user in sample]
+    ops = {
+        'save': lambda: random.choice(sample).save(),
+        'get': lambda: User.get(random.choice(ids)),
+        'search': lambda: User.search({'email': random.choice(emails)}),
+        'count': User.count,
+    }
+    for label, n_threads in (('single', 1), ('threads', threads)):
+        result[label] = {'threads': n_threads}
+        for name in OPERATIONS:
+            result[label][name] = measure(ops[name], n_threads, seconds)
+            flush()
+
+    start = time.perf_counter()
+    for model_cls in (User, UserSession):
+        model_cls.save_to_file()
+    result['save_to_file_s'] = time.perf_counter() - start
+    result['objects'] = User.count()
+    result['file_bytes'] = sum(os.path.getsize(name)
+                               for name in glob.glob('.db_*'))
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def child(phase: str, config: str, n_objects: int, workdir: str,
+          args: argparse.Namespace) -> dict:
+    """Run a phase in a fresh interpreter and return its JSON output."""
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), **CONFIGS[config])
+    out = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.store_suite', '--phase', phase,
+         '--objects', str(n_objects), '--threads', str(args.threads),
+         '--seconds', str(args.seconds)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model store benchmarks")
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--configs', default=','.join(CONFIGS))
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--out', help="report file (default: stdout)")
+    parser.add_argument('--phase', choices=('seed', 'run'),
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--objects', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == 'seed':
+        start = time.perf_counter()
+        seed(args.objects)
+        print(json.dumps({'seed_s': time.perf_counter() - start}))
+        sys.exit(0)
+    if args.phase == 'run':
+        print(json.dumps(run(args.threads, args.seconds)))
+        sys.exit(0)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds_per_op': args.seconds,
+        },
+        'results': [],
+    }
+    for n_objects in map(int, args.sizes.split(',')):
+        for config in args.configs.split(','):
+            workdir = tempfile.mkdtemp()
+            result = {'config': config, 'env': CONFIGS[config],
+                      'size': n_objects}
+            result.update(child('seed', config, n_objects, workdir, args))
+            result.update(child('run', config, n_objects, workdir, args))
+            report['results'].append(result)
+            print("{} {}: load {:.2f} s, get {:.0f}/s, save {:.0f}/s, "
+                  "peak RSS {:.0f} MB".format(
+                      config, n_objects, result['load_from_file_s'],
+                      result['single']['get']['ops_per_s'],
+                      result['single']['save']['ops_per_s'],
+                      result['peak_rss_mb']), file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
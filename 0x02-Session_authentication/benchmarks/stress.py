@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+""" Concurrency stress test of a model store implementation
+
+Runs a random mix of save/remove/search/get/load_from_file on User from
+several threads, against the models package of a project (by default
+this one and 0x01-Basic_authentication, whose Base has no lock), one
+fresh interpreter and directory per target and thread count.
+
+Every thread only creates, changes and removes its own users and knows
+the version (first_name) each of them should have, so afterwards:
+    - count: User.count() == len(User.all()) == users alive
+    - lost updates: users missing, resurrected or with a stale version
+    - file agreement: after flushing, reloading the files gives back the
+      same users and versions
+Exceptions raised by the operations are counted per operation.
+
+Usage: python3 -m benchmarks.stress [--targets 0x02,0x01]
+           [--threads 1,2,4,8] [--seconds 3] [--objects 200]
+           [--out report.json]
+"""
+import argparse
+from collections import Counter
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# op -> weight in the random mix
+MIX = {
+    'save_new': 10,
+    'save': 25,
+    'remove': 10,
+    'search': 25,
+    'get': 25,
+    'load_from_file': 5,
+}
+
+
+class Worker(threading.Thread):
+    """Thread running the random mix on its own users."""
+
+    def __init__(self, tid: int, users: list, stop: threading.Event):
+        """Take ownership of `users`."""
+        super().__init__()
+        self.tid = tid
+        self.live = {user.id: user for user in users}
+        # id -> version the user should have
+        self.versions = {user.id: 0 for user in users}
+        self.removed = set()
+        self.stop = stop
+        self.ops = Counter()
+        self.errors = Counter()
+        self.samples = {}
+        self.created = 0
+
+    def step(self, op: str):
+        """Run one operation."""
+        from models.user import User
+
+        if op == 'save_new' or not self.live:
+            self.created += 1
+            user = User(email="t{}-{}@hbtn.io".format(self.tid, self.created),
+                        first_name="v0")
+            self.live[user.id] = user
+            self.versions[user.id] = 0
+            user.save()
+        elif op == 'save':
+            user = random.choice(list(self.live.values()))
+            self.versions[user.id] += 1
+            user.first_name = "v{}".format(self.versions[user.id])
+            user.save()
+        elif op == 'remove':
+            user = self.live.pop(random.choice(list(self.live)))
+            del self.versions[user.id]
+            self.removed.add(user.id)
+            user.remove()
+        elif op == 'search':
+            user = random.choice(list(self.live.values()))
+            User.search({'email': user.email})
+        elif op == 'get':
+            User.get(random.choice(list(self.live)))
+        else:
+            User.load_from_file()
+
+    def run(self):
+        """Run random operations until stopped."""
+        ops, weights = zip(*MIX.items())
+        while not self.stop.is_set():
+            op = random.choices(ops, weights)[0]
+            try:
+                self.step(op)
+                self.ops[op] += 1
+            except Exception as e:
+                self.errors[op] += 1
+                self.samples.setdefault(op, "{}: {}".format(
+                    type(e).__name__, e))
+
+
+def state() -> dict:
+    """Return id -> first_name of every user in the store."""
+    from models.user import User
+
+    return {user.id: user.first_name for user in User.all()}
+
+
+def run(n_threads: int, seconds: float, n_objects: int) -> dict:
+    """Stress the models package on the path, return the report."""
+    from models.user import User
+    import models.base
+
+    User.load_from_file()
+    users = [User(email="seed{}@hbtn.io".format(i), first_name="v0")
+             for i in range(n_objects)]
+    for user in users:
+        user.save()
+    stop = threading.Event()
+    share = n_objects // n_threads
+    workers = [Worker(i, users[i * share:(i + 1) * share], stop)
+               for i in range(n_threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    ops, errors, samples = Counter(), Counter(), {}
+    expected = {}
+    removed = set()
+    for worker in workers:
+        ops.update(worker.ops)
+        errors.update(worker.errors)
+        samples.update(worker.samples)
+        expected.update({user_id: "v{}".format(version)
+                         for user_id, version in worker.versions.items()})
+        removed |= worker.removed
+
+    # 0x01 has no write-behind and no flush()
+    getattr(models.base, 'flush', lambda: 0)()
+    memory = state()
+    result = {
+        'threads': n_threads,
+        'ops': sum(ops.values()),
+        'ops_per_s': sum(ops.values()) / elapsed,
+        'ops_by_type': dict(ops),
+        'errors': dict(errors),
+        'error_samples': samples,
+        'count_consistent': User.count() == len(memory) == len(expected),
+        'missing': sum(1 for user_id in expected if user_id not in memory),
+        'resurrected': sum(1 for user_id in removed if user_id in memory),
+        'stale': sum(1 for user_id, version in expected.items()
+                     if user_id in memory and memory[user_id] != version),
+    }
+    result['lost_updates'] = result['missing'] + result['resurrected'] + \
+        result['stale']
+    try:
+        User.load_from_file()
+        result['file_agrees'] = state() == memory
+    except Exception as e:
+        result['file_agrees'] = False
+        result['error_samples']['reload'] = "{}: {}".format(
+            type(e).__name__, e)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model store stress test")
+    parser.add_argument('--targets', default='0x02,0x01',
+                        help="projects: 0x02 (this one), 0x01 or a path")
+    parser.add_argument('--threads', default='1,2,4,8')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--objects', type=int, default=200)
+    parser.add_argument('--out', help="report file (default: stdout)")
+    parser.add_argument('--run', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run, args.seconds, args.objects)))
+        sys.exit(0)
+
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    projects = {'0x02': here,
+                '0x01': os.path.join(os.path.dirname(here),
+                                     '0x01-Basic_authentication')}
+    report = {'mix': MIX, 'seconds': args.seconds, 'objects': args.objects,
+              'results': []}
+    for target in args.targets.split(','):
+        project = projects.get(target, os.path.abspath(target))
+        for n_threads in map(int, args.threads.split(',')):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__),
+                 '--run', str(n_threads), '--seconds', str(args.seconds),
+                 '--objects', str(args.objects)],
+                cwd=tempfile.mkdtemp(), capture_output=True, text=True,
+                env=dict(os.environ, PYTHONPATH=project))
+            if out.returncode != 0:
+                result = {'threads': n_threads, 'crashed': True,
+                          'stderr': out.stderr[-2000:]}
+            else:
+                result = json.loads(out.stdout.splitlines()[-1])
+            result['target'] = target
+            report['results'].append(result)
+            summary = "crashed" if result.get('crashed') else \
+                "{:.0f} ops/s, {} errors, {} lost updates, count {}, " \
+                "file {}".format(
+                    result['ops_per_s'], sum(result['errors'].values()),
+                    result['lost_updates'],
+                    "ok" if result['count_consistent'] else "WRONG",
+                    "ok" if result['file_agrees'] else "WRONG")
+            print("{} x{}: {}".format(target, n_threads, summary),
+                  file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
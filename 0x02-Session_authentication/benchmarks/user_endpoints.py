@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+""" Latency of GET /api/v1/users (full, paged) and GET /api/v1/users/<id>
+
+Seeds N users, opens a session for one of them and calls both endpoints
+through the Flask test client.
+
+Usage: python3 -m benchmarks.user_endpoints [users] [list calls] [get calls]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+if __name__ == "__main__":
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    list_calls = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    get_calls = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    os.chdir(tempfile.mkdtemp())
+    os.environ['AUTH_TYPE'] = 'session_auth'
+    os.environ['SESSION_NAME'] = '_my_session_id'
+
+    from models.user import User
+    # Seed the JSON file directly: saving one by one rewrites it every time
+    seed = [User(email="user{}@hbtn.io".format(i), first_name="Bob",
+                 last_name="Dylan") for i in range(n_users)]
+    with open(".db_User.json", "w") as f:
+        json.dump({u.id: u.to_json(True) for u in seed}, f)
+    ids = [u.id for u in seed]
+    del seed
+
+    from api.v1.app import app, auth
+    client = app.test_client()
+    client.set_cookie('_my_session_id', auth.create_session(ids[0]))
+
+    def timed(url: str, calls: int) -> float:
+        """Return the mean latency of `calls` requests, in ms."""
+        start = time.perf_counter()
+        for _ in range(calls):
+            response = client.get(url() if callable(url) else url)
+            assert response.status_code == 200, response.status_code
+            response.get_data()  # streamed bodies are only built here
+        return (time.perf_counter() - start) / calls * 1000
+
+    # Warm up (the first list call fills caches, if any)
+    client.get('/api/v1/users')
+    print("users={}".format(n_users))
+    print("GET /api/v1/users: {:.1f} ms".format(
+        timed('/api/v1/users', list_calls)))
+    print("GET /api/v1/users?limit=100&after=<id>: {:.3f} ms".format(
+        timed(lambda: '/api/v1/users?limit=100&after=' + random.choice(ids),
+              get_calls)))
+    print("GET /api/v1/users/<id>: {:.3f} ms".format(
+        timed(lambda: '/api/v1/users/' + random.choice(ids), get_calls)))
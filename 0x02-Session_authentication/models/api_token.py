@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Module for API tokens
+"""
+from hashlib import sha256
+from time import time
+
+from models.base import Base
+
+
+class ApiToken(Base):
+    """API token of a user.
+
+    Only the SHA-256 digest of the token is stored, and looked up through
+    the `digest` index. A token is revoked by removing it.
+    """
+
+    __slots__ = ('user_id', 'digest', 'expires_at')
+    __fields__ = Base.__fields__ + __slots__
+    __indexes__ = ('digest', 'user_id')
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """Initializes an API token instance.
+        """
+        super().__init__(*args, **kwargs)
+        self.user_id = kwargs.get('user_id')
+        self.digest = kwargs.get('digest')
+        # Epoch seconds, None for a token that never expires
+        self.expires_at = kwargs.get('expires_at')
+
+    @staticmethod
+    def digest_of(token: str) -> str:
+        """Return the digest under which a token is stored."""
+        return sha256(token.encode()).hexdigest()
+
+    def is_expired(self) -> bool:
+        """Tell if the token has expired."""
+        return self.expires_at is not None and self.expires_at <= time()
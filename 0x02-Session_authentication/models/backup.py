@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+""" Online backup of every model class
+
+Each class is written with Base.snapshot() as .db_<cls>.<ext> in the
+backup directory, so restoring is copying those files back to the
+working directory of the application.
+
+Usage: python3 -m models.backup <directory>
+"""
+from importlib import import_module
+import os
+import pkgutil
+import sys
+import time
+from typing import Dict, List
+
+import models
+from models.base import Base, STORAGE
+
+
+def model_classes() -> List[type]:
+    """Return every subclass of Base, parents first.
+
+    Every module of the models package is imported first, so a model
+    class is found without being listed here.
+    """
+    for module in pkgutil.iter_modules(models.__path__):
+        import_module('models.' + module.name)
+    classes = []
+    pending = list(Base.__subclasses__())
+    while pending:
+        model_cls = pending.pop(0)
+        classes.append(model_cls)
+        pending.extend(model_cls.__subclasses__())
+    return classes
+
+
+def snapshot_all(directory: str) -> Dict[str, float]:
+    """Snapshot every model class in `directory`.
+
+    Returns:
+        class name -> seconds taken by its snapshot.
+    """
+    os.makedirs(directory, exist_ok=True)
+    timings = {}
+    for model_cls in model_classes():
+        start = time.perf_counter()
+        model_cls.snapshot(os.path.join(directory,
+                                        STORAGE.snapshot_name(model_cls)))
+        timings[model_cls.__name__] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 -m models.backup <directory>")
+        sys.exit(1)
+    for model_cls in model_classes():
+        model_cls.load_from_file()
+    for s_class, elapsed in snapshot_all(sys.argv[1]).items():
+        print("{}: {:.3f} s".format(s_class, elapsed))
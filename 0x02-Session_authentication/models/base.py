@@ -1,29 +1,123 @@
+from calendar import timegm
 from datetime import datetime
-from typing import TypeVar, List, Iterable, Dict
-from os import path
+from typing import TypeVar, List, Iterable, Iterator, Optional, Tuple
+from os import getenv
+from time import gmtime, strftime, time
+import atexit
 import json
 import uuid
-from threading import Lock
+
+from models.json_engine import JSONEngine
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA: Dict[str, Dict[str, 'Base']] = {}
-DATA_LOCK = Lock()
+# Fields stored as epoch seconds in a slot of the same name prefixed by _
+TIMESTAMPS = ('created_at', 'updated_at')
+
+
+def to_epoch(value) -> int:
+    """Convert a naive UTC datetime or a TIMESTAMP_FORMAT string to epoch."""
+    if isinstance(value, str):
+        # TIMESTAMP_FORMAT is ISO 8601, fromisoformat is much faster
+        value = datetime.fromisoformat(value)
+    return timegm(value.utctimetuple())
+
+
+def _engine_from_env():
+    """Build the storage engine selected by MODELS_STORAGE
+    (json|sqlite|lazy)."""
+    storage = getenv('MODELS_STORAGE', 'json').lower()
+    if storage == 'sqlite':
+        from models.sqlite_engine import SQLiteEngine
+        return SQLiteEngine.from_env()
+    if storage == 'lazy':
+        from models.lazy_engine import LazyEngine
+        return LazyEngine.from_env()
+    return JSONEngine.from_env()
+
+
+STORAGE = _engine_from_env()
+if isinstance(STORAGE, JSONEngine):
+    # Historical names of the in-memory store and its flusher
+    DATA = STORAGE.data
+    FLUSHER = STORAGE.flusher
+
+
+def flush() -> int:
+    """Persist all pending write-behind changes now."""
+    return STORAGE.flush()
+
+
+def close():
+    """Persist pending changes and release the storage engine."""
+    STORAGE.close()
+
+
+atexit.register(close)
+
 
 class Base:
-    """Base class providing basic CRUD and serialization functionality."""
+    """Base class providing basic CRUD and serialization functionality.
+
+    Instances have no __dict__: subclasses list their attributes in
+    __slots__ and their serialized fields in __fields__. Timestamps are
+    kept as epoch seconds and only turned into datetimes or strings when
+    read.
+
+    The public JSON form is cached per object, as a dict and as encoded
+    bytes, and dropped whenever an attribute is assigned.
+    """
+
+    __slots__ = ('id', '_created_at', '_updated_at',
+                 '_json_dict', '_json_bytes')
+    # Slots that are never persisted
+    __transient__: Tuple[str, ...] = ('_json_dict', '_json_bytes')
+    # Fields serialized by to_json, in order
+    __fields__: Tuple[str, ...] = ('id', 'created_at', 'updated_at')
+    # Attributes with a secondary hash index, used by search()
+    __indexes__: Tuple[str, ...] = ()
+    # Stored attributes with a sorted index, used by query()
+    __sorted__: Tuple[str, ...] = ('_created_at',)
+    # Freezes of running snapshots, see models.freeze
+    __frozen__: Tuple = ()
 
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a Base instance."""
-        s_class = self.__class__.__name__
-        with DATA_LOCK:
-            if DATA.get(s_class) is None:
-                DATA[s_class] = {}
+        STORAGE.register(self.__class__)
 
+        now = int(time())
         self.id = kwargs.get('id', str(uuid.uuid4()))
-        self.created_at = datetime.strptime(kwargs.get('created_at'), TIMESTAMP_FORMAT) \
-            if kwargs.get('created_at') else datetime.utcnow()
-        self.updated_at = datetime.strptime(kwargs.get('updated_at'), TIMESTAMP_FORMAT) \
-            if kwargs.get('updated_at') else datetime.utcnow()
+        self._created_at = to_epoch(kwargs['created_at']) \
+            if kwargs.get('created_at') else now
+        self._updated_at = to_epoch(kwargs['updated_at']) \
+            if kwargs.get('updated_at') else now
+
+    @property
+    def created_at(self) -> datetime:
+        """Creation time (naive UTC)."""
+        return datetime.utcfromtimestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """Set the creation time from a naive UTC datetime."""
+        self._created_at = to_epoch(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        """Last update time (naive UTC)."""
+        return datetime.utcfromtimestamp(self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """Set the last update time from a naive UTC datetime."""
+        self._updated_at = to_epoch(value)
+
+    def __setattr__(self, name: str, value):
+        """Set an attribute and drop the cached JSON form."""
+        for freeze in self.__frozen__:
+            freeze.preserve(self)
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_json_dict', None)
+        object.__setattr__(self, '_json_bytes', None)
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """Check equality based on type and id."""
@@ -31,83 +125,164 @@ class Base:
 
     def to_json(self, for_serialization: bool = False) -> dict:
         """Convert the object to a JSON dictionary."""
+        if not for_serialization:
+            cached = self._json_dict
+            if cached is None:
+                cached = self._to_json(False)
+                object.__setattr__(self, '_json_dict', cached)
+            return dict(cached)
+        return self._to_json(True)
+
+    def to_json_bytes(self) -> bytes:
+        """Return the public JSON form of the object, encoded."""
+        cached = self._json_bytes
+        if cached is None:
+            cached = json.dumps(self.to_json(),
+                                separators=(',', ':')).encode()
+            object.__setattr__(self, '_json_bytes', cached)
+        return cached
+
+    def _to_json(self, for_serialization: bool) -> dict:
+        """Build the JSON dictionary of the object."""
         result = {}
-        for key, value in self.__dict__.items():
+        for key in self.__fields__:
             if not for_serialization and key.startswith('_'):
                 continue
-            result[key] = value.strftime(TIMESTAMP_FORMAT) if isinstance(value, datetime) else value
+            if key == 'created_at' or key == 'updated_at':
+                result[key] = strftime(TIMESTAMP_FORMAT,
+                                       gmtime(getattr(self, '_' + key)))
+            else:
+                result[key] = getattr(self, key)
         return result
 
     @classmethod
     def load_from_file(cls):
         """Load all objects from file."""
-        s_class = cls.__name__
-        file_path = f".db_{s_class}.json"
-        with DATA_LOCK:
-            DATA[s_class] = {}
-            if not path.exists(file_path):
-                return
-
-            try:
-                with open(file_path, 'r') as f:
-                    objs_json = json.load(f)
-                    for obj_id, obj_json in objs_json.items():
-                        DATA[s_class][obj_id] = cls(**obj_json)
-            except (FileNotFoundError, json.JSONDecodeError) as e:
-                print(f"Error loading file: {e}")
+        STORAGE.load(cls)
 
     @classmethod
     def save_to_file(cls):
         """Save all objects to file."""
-        s_class = cls.__name__
-        file_path = f".db_{s_class}.json"
-        with DATA_LOCK:
-            objs_json = {obj_id: obj.to_json(True) for obj_id, obj in DATA[s_class].items()}
-            with open(file_path, 'w') as f:
-                json.dump(objs_json, f)
+        STORAGE.save_to_file(cls)
 
     def save(self):
         """Save current object."""
-        s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        with DATA_LOCK:
-            DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self._updated_at = int(time())
+        STORAGE.save(self)
 
     def remove(self):
         """Remove object."""
-        s_class = self.__class__.__name__
-        with DATA_LOCK:
-            if self.id in DATA[s_class]:
-                del DATA[s_class][self.id]
-        self.__class__.save_to_file()
+        STORAGE.remove(self)
+
+    @classmethod
+    def save_many(cls, objs: Iterable[TypeVar('Base')]):
+        """Save several objects at once: the class is locked and persisted
+        once, and either all objects are saved or none is."""
+        objs = list(objs)
+        for obj in objs:
+            if not isinstance(obj, cls):
+                raise TypeError(f"{obj!r} is not a {cls.__name__}")
+        stamps = [obj._updated_at for obj in objs]
+        now = int(time())
+        for obj in objs:
+            obj._updated_at = now
+        try:
+            STORAGE.save_many(cls, objs)
+        except Exception:
+            for obj, stamp in zip(objs, stamps):
+                obj._updated_at = stamp
+            raise
+
+    @classmethod
+    def remove_many(cls, ids: Iterable[str]):
+        """Remove the objects with these IDs at once (unknown IDs are
+        ignored), either all of them or none."""
+        STORAGE.remove_many(cls, list(ids))
+
+    @classmethod
+    def query(cls, prefix: Optional[dict] = None,
+              ranges: Optional[dict] = None, order_by: str = 'id',
+              reverse: bool = False,
+              limit: Optional[int] = None) -> List[TypeVar('Base')]:
+        """Return the objects matching prefix and range predicates.
+
+        Args:
+            prefix: field -> prefix its string value starts with.
+            ranges: field -> (low, high), low included and high excluded,
+                either None for no bound. Timestamps are datetimes, strings
+                in TIMESTAMP_FORMAT or epoch seconds.
+            order_by: field sorting the result, objects without a value
+                come last.
+            reverse: sort in descending order.
+            limit: maximum number of objects returned.
+
+        Fields of `__sorted__` (email of users, creation time) are looked
+        up in sorted indexes, others are filtered one object at a time.
+        """
+        def stored(field: str) -> str:
+            return '_' + field if field in TIMESTAMPS else field
+
+        def bound(field: str, value):
+            if field in TIMESTAMPS and value is not None and \
+                    not isinstance(value, int):
+                return to_epoch(value)
+            return value
+
+        return STORAGE.query(
+            cls, {stored(k): v for k, v in (prefix or {}).items()},
+            {stored(k): (bound(k, low), bound(k, high))
+             for k, (low, high) in (ranges or {}).items()},
+            stored(order_by), reverse, limit)
+
+    @classmethod
+    def snapshot(cls, path: str):
+        """Write a point-in-time copy of all objects to `path`, in the
+        format of the class file, without blocking writers meanwhile."""
+        STORAGE.snapshot(cls, path)
+
+    @classmethod
+    def export_json(cls, path: Optional[str] = None):
+        """Write all objects to `path` as JSON, the import and export
+        format of every storage engine, .db_<cls>.json by default."""
+        STORAGE.export_json(cls, path)
 
     @classmethod
     def count(cls) -> int:
         """Count all objects."""
-        s_class = cls.__name__
-        with DATA_LOCK:
-            return len(DATA[s_class])
+        return STORAGE.count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
         """Return all objects."""
         return cls.search()
 
+    @classmethod
+    def iter_all(cls, after: Optional[str] = None,
+                 batch: int = 1000) -> Iterator[TypeVar('Base')]:
+        """Iterate over all objects in id order, one page at a time.
+
+        Only `batch` objects are held at once; objects saved or removed
+        while iterating may or may not be seen, none is seen twice.
+        """
+        while True:
+            objs = cls.page(batch, after)
+            yield from objs
+            if len(objs) < batch:
+                return
+            after = objs[-1].id
+
+    @classmethod
+    def page(cls, limit: int,
+             after: Optional[str] = None) -> List[TypeVar('Base')]:
+        """Return up to `limit` objects in id order, after the id `after`."""
+        return STORAGE.page(cls, after, limit)
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """Return one object by ID."""
-        s_class = cls.__name__
-        with DATA_LOCK:
-            return DATA[s_class].get(id)
+        return STORAGE.get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """Search all objects with matching attributes."""
-        s_class = cls.__name__
-        
-        def _search(obj):
-            return all(getattr(obj, k) == v for k, v in attributes.items())
-        
-        with DATA_LOCK:
-            return list(filter(_search, DATA[s_class].values()))
+        return STORAGE.search(cls, attributes)
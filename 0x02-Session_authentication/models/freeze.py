@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Copy-on-write freezes: point-in-time copies of live model objects.
+
+A freeze is taken from the objects of a class while the class lock is
+held, which only costs a copy of their references. While it is installed
+on the class (`__frozen__`), Base.__setattr__ hands it every object about
+to change, and the freeze keeps the row of values the object had before
+its first change. The copy is then read without any lock: each object
+contributes its kept row if it changed, its current values otherwise.
+"""
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List
+
+from models import snapshot
+
+# Serializes the updates of `__frozen__` by concurrent snapshots
+_install_lock = Lock()
+
+
+class Freeze:
+    """Point-in-time copy of a set of objects of one class."""
+
+    def __init__(self, model_cls: type, objs: Iterable):
+        """Freeze `objs`, the objects of `model_cls` (class lock held)."""
+        self.model_cls = model_cls
+        self.columns = snapshot.slot_names(model_cls)
+        self.members: Dict[str, object] = {obj.id: obj for obj in objs}
+        # id -> row of the object before its first change
+        self.preimages: Dict[str, tuple] = {}
+
+    def install(self):
+        """Start keeping the members that change (class lock held, so
+        that nothing is saved between the freeze and this call)."""
+        with _install_lock:
+            self.model_cls.__frozen__ = self.model_cls.__frozen__ + (self,)
+
+    def uninstall(self):
+        """Stop keeping the members that change."""
+        with _install_lock:
+            self.model_cls.__frozen__ = tuple(
+                f for f in self.model_cls.__frozen__ if f is not self)
+
+    def preserve(self, obj):
+        """Keep the current values of a member about to change."""
+        obj_id = getattr(obj, 'id', None)
+        if self.members.get(obj_id) is obj and obj_id not in self.preimages:
+            # setdefault: of two threads changing the object at once, the
+            # first one to get here has read the unchanged values
+            self.preimages.setdefault(
+                obj_id, snapshot.to_row(obj, self.columns))
+
+    def rows(self) -> List[tuple]:
+        """Return the rows of the members as they were when frozen."""
+        preimages = self.preimages
+        rows = []
+        for obj_id, obj in self.members.items():
+            # Read first: a preimage missing after the read means the
+            # object only changed after it
+            row = snapshot.to_row(obj, self.columns)
+            rows.append(preimages.get(obj_id, row))
+        return rows
+
+    def copies(self) -> Iterator:
+        """Yield detached copies of the members as they were when frozen."""
+        build = snapshot.row_builder(self.model_cls, self.columns)
+        return map(build, self.rows())
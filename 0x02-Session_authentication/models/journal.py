@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Change journal shared by the processes serving one model store.
+
+Every save/remove appends one JSON line to .db_<cls>.journal while holding
+an exclusive `fcntl.flock` on .db_<cls>.lock. The lock file also holds the
+store state, 16 bytes: a generation counter bumped whenever the journal is
+folded into a new snapshot, and the journal length. A process compares the
+state with what it has applied (one pread) and then only reads the journal
+tail, or reloads the snapshot when the generation moved.
+"""
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+STATE = struct.Struct('>QQ')
+
+
+class Journal:
+    """Journal and lock/state file of one model class."""
+
+    def __init__(self, s_class: str, durability: str = 'os'):
+        """Open (creating if needed) the lock/state file of `s_class`."""
+        self.path = f".db_{s_class}.journal"
+        self.durability = durability
+        self.fd = os.open(f".db_{s_class}.lock", os.O_RDWR | os.O_CREAT,
+                          0o644)
+        # (generation, journal length) applied by this process
+        self.seen: Optional[Tuple[int, int]] = None
+
+    def state(self) -> Tuple[int, int]:
+        """Return the current (generation, journal length)."""
+        data = os.pread(self.fd, STATE.size, 0)
+        return STATE.unpack(data) if len(data) == STATE.size else (0, 0)
+
+    def changed(self) -> bool:
+        """Tell if other processes changed the store since the last sync."""
+        return self.state() != self.seen
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """Hold the inter-process lock of the store."""
+        fcntl.flock(self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def tail(self) -> Tuple[bool, List[Dict]]:
+        """Return (reload snapshot?, records to apply), lock held.
+
+        The records are the journal tail after what this process applied,
+        or the whole journal when the snapshot has to be reloaded.
+        """
+        generation, length = self.state()
+        reload = self.seen is None or self.seen[0] != generation
+        start = 0 if reload else self.seen[1]
+        records = []
+        if length > start:
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                data = f.read(length - start)
+            records = [json.loads(line) for line in data.splitlines()]
+        self.seen = (generation, length)
+        return reload, records
+
+    def append(self, record: Dict):
+        """Append a record after a sync, exclusive lock held."""
+        line = (json.dumps(record) + '\n').encode()
+        with open(self.path, 'ab') as f:
+            f.write(line)
+            if self.durability == 'fsync':
+                f.flush()
+                os.fsync(f.fileno())
+        generation, length = self.seen
+        self.seen = (generation, length + len(line))
+        os.pwrite(self.fd, STATE.pack(*self.seen), 0)
+
+    def reset(self):
+        """Empty the journal once folded into a snapshot, lock held."""
+        with open(self.path, 'wb'):
+            pass
+        self.seen = (self.state()[0] + 1, 0)
+        os.pwrite(self.fd, STATE.pack(*self.seen), 0)
+
+    @property
+    def size(self) -> int:
+        """Journal length applied by this process."""
+        return self.seen[1] if self.seen else 0
+
+    def close(self):
+        """Close the lock/state file."""
+        os.close(self.fd)
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""In-memory storage engine persisted as one file per model class."""
+from os import path, getenv, fsync, replace
+import gc
+from itertools import chain, dropwhile, islice
+import json
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import query, snapshot
+from models.freeze import Freeze
+from models.journal import Journal
+from models.rwlock import RWLock
+from models.write_behind import WriteBehindFlusher
+
+
+class JSONEngine:
+    """Keeps every object in a dict per class and dumps it to .db_<cls>.json.
+
+    With the "binary" snapshot format the file is .db_<cls>.bin instead
+    (see models.snapshot); the JSON file is then only read when no binary
+    snapshot exists yet, and can still be written with export_json().
+
+    Every class has its own reader-writer lock guarding its objects and
+    indexes, so lookups run concurrently and only wait for in-memory
+    updates. Files are written from a snapshot of the objects taken under
+    the read lock; the JSON encoding and disk I/O happen outside of it.
+
+    In multiprocess mode (several workers sharing the files) changes are
+    appended to a journal instead of rewriting the snapshot (see
+    models.journal), and every operation first applies what the other
+    processes appended. The snapshot is rewritten by save_to_file() or
+    once the journal outgrows `journal_max_bytes`; the write-behind flusher
+    is not used in this mode.
+
+    Attributes:
+        data: class name -> id -> object.
+        indexes: class name -> attribute -> value -> bucket, where a bucket
+            is the id itself for a single match or {id: None} otherwise.
+        sorted_indexes: class name -> attribute -> SortedIndex, for the
+            attributes of `__sorted__` (see models.query).
+        indexed_values: class name -> id -> values of the `__indexes__`
+            then `__sorted__` attributes at last save.
+        order: class name -> SortedIndex of the ids, for paging.
+        changes: class name -> number of changes made in memory.
+        locks: class name -> RWLock over the six mappings above.
+        saved: class name -> value of `changes` the file was written or
+            read at, so a reload knows if it would drop unwritten changes.
+        file_locks: class name -> Lock ordering the writes of its file.
+        journals: class name -> Journal, in multiprocess mode only.
+        lock: guards the registration of new classes.
+    """
+
+    def __init__(self, durability: str = 'os',
+                 flusher: Optional[WriteBehindFlusher] = None,
+                 snapshot_format: str = 'json', multiprocess: bool = False,
+                 journal_max_bytes: int = 4 << 20):
+        """Initialize an empty store.
+
+        Args:
+            durability (str): "os" leaves written files to the page cache,
+                "fsync" forces them to disk.
+            flusher (WriteBehindFlusher, optional): Batches file writes
+                when given, otherwise every change is written through.
+            snapshot_format (str): "json" or "binary".
+            multiprocess (bool): Keep several processes coherent through
+                a shared journal.
+            journal_max_bytes (int): Journal size triggering a snapshot.
+        """
+        self.data: Dict[str, Dict[str, object]] = {}
+        self.indexes: Dict[str, Dict[str, Dict[object, object]]] = {}
+        self.sorted_indexes: Dict[str, Dict[str, query.SortedIndex]] = {}
+        self.indexed_values: Dict[str, Dict[str, Tuple]] = {}
+        self.order: Dict[str, query.SortedIndex] = {}
+        self.changes: Dict[str, int] = {}
+        self.saved: Dict[str, int] = {}
+        self.locks: Dict[str, RWLock] = {}
+        self.file_locks: Dict[str, Lock] = {}
+        self.lock = Lock()
+        self.durability = durability
+        self.flusher = flusher
+        self.snapshot_format = snapshot_format
+        self.multiprocess = multiprocess
+        self.journal_max_bytes = journal_max_bytes
+        self.journals: Dict[str, Journal] = {}
+
+    @classmethod
+    def from_env(cls) -> 'JSONEngine':
+        """Build the engine from the MODELS_DURABILITY,
+        MODELS_WRITE_BEHIND, MODELS_SNAPSHOT_FORMAT, MODELS_MULTIPROCESS
+        and MODELS_JOURNAL_MAX_BYTES env vars."""
+        multiprocess = getenv('MODELS_MULTIPROCESS', '0').lower() in \
+            ('1', 'true')
+        return cls(getenv('MODELS_DURABILITY', 'os'),
+                   None if multiprocess else WriteBehindFlusher.from_env(),
+                   getenv('MODELS_SNAPSHOT_FORMAT', 'json').lower(),
+                   multiprocess,
+                   int(getenv('MODELS_JOURNAL_MAX_BYTES', 4 << 20)))
+
+    def file_path(self, model_cls: type, fmt: str = None) -> str:
+        """Return the data file of a model class in the given format."""
+        fmt = fmt or self.snapshot_format
+        ext = 'bin' if fmt == 'binary' else 'json'
+        return f".db_{model_cls.__name__}.{ext}"
+
+    @staticmethod
+    def _read_json(model_cls: type, file_path: str) -> Dict[str, object]:
+        """Decode a JSON data file into id -> object."""
+        objs = {}
+        try:
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
+                for obj_id, obj_json in objs_json.items():
+                    objs[obj_id] = model_cls(**obj_json)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error loading file: {e}")
+        return objs
+
+    def _write(self, model_cls: type, objs: List, file_path: str, fmt: str):
+        """Write objects to `file_path` through a temporary file."""
+        tmp_path = file_path + '.tmp'
+        if fmt == 'binary':
+            with open(tmp_path, 'wb') as f:
+                snapshot.write(model_cls, objs, f)
+                if self.durability == 'fsync':
+                    f.flush()
+                    fsync(f.fileno())
+        else:
+            objs_json = {obj.id: obj.to_json(True) for obj in objs}
+            with open(tmp_path, 'w') as f:
+                json.dump(objs_json, f)
+                if self.durability == 'fsync':
+                    f.flush()
+                    fsync(f.fileno())
+        replace(tmp_path, file_path)
+
+    def register(self, model_cls: type):
+        """Create the empty store of a model class if needed."""
+        s_class = model_cls.__name__
+        if s_class in self.data:
+            return
+        with self.lock:
+            if self.data.get(s_class) is None:
+                self.locks[s_class] = RWLock()
+                self.file_locks[s_class] = Lock()
+                if self.multiprocess:
+                    self.journals[s_class] = Journal(s_class, self.durability)
+                self._reset_indexes(model_cls)
+                self.changes[s_class] = self.saved[s_class] = 0
+                self.data[s_class] = {}
+
+    def _reset_indexes(self, model_cls: type):
+        """Drop all index entries of the class (write lock held)."""
+        s_class = model_cls.__name__
+        self.indexes[s_class] = {attr: {} for attr in model_cls.__indexes__}
+        self.sorted_indexes[s_class] = {attr: query.SortedIndex()
+                                        for attr in model_cls.__sorted__}
+        self.indexed_values[s_class] = {}
+        self.order[s_class] = query.SortedIndex()
+
+    def _store(self, obj):
+        """Insert or replace an object (write lock held)."""
+        s_class = obj.__class__.__name__
+        objs = self.data[s_class]
+        if obj.id not in objs:
+            self.order[s_class].add(obj.id, obj.id)
+        objs[obj.id] = obj
+        self.changes[s_class] += 1
+        self._index_add(obj)
+
+    def _discard(self, model_cls: type, obj_id: str):
+        """Delete an object if present (write lock held)."""
+        s_class = model_cls.__name__
+        if self.data[s_class].pop(obj_id, None) is None:
+            return
+        self.changes[s_class] += 1
+        self.order[s_class].remove(obj_id, obj_id)
+        self._index_remove(model_cls, obj_id)
+
+    def _replace(self, model_cls: type,
+                 changes: Dict[str, object]) -> Dict[str, object]:
+        """Store the objects of id -> object changes, None deletes, and
+        return the objects they replaced (write lock held)."""
+        objs = self.data[model_cls.__name__]
+        previous = {obj_id: objs.get(obj_id) for obj_id in changes}
+        for obj_id, obj in changes.items():
+            if obj is None:
+                self._discard(model_cls, obj_id)
+            else:
+                self._store(obj)
+        return previous
+
+    def _index_remove(self, model_cls: type, obj_id: str):
+        """Remove an object id from the class indexes (write lock held)."""
+        s_class = model_cls.__name__
+        values = self.indexed_values[s_class].pop(obj_id, None)
+        if values is None:
+            return
+        for attr, value in zip(model_cls.__indexes__, values):
+            index = self.indexes[s_class][attr]
+            bucket = index.get(value)
+            if type(bucket) is dict:
+                bucket.pop(obj_id, None)
+                if len(bucket) == 1:
+                    index[value] = next(iter(bucket))
+            elif bucket == obj_id:
+                del index[value]
+        sorted_values = values[len(model_cls.__indexes__):]
+        for attr, value in zip(model_cls.__sorted__, sorted_values):
+            self.sorted_indexes[s_class][attr].remove(value, obj_id)
+
+    def _index_add(self, obj):
+        """(Re)index the object under its current values (write lock held)."""
+        model_cls = obj.__class__
+        s_class = model_cls.__name__
+        values = tuple(getattr(obj, attr, None) for attr in
+                       model_cls.__indexes__ + model_cls.__sorted__)
+        if self.indexed_values[s_class].get(obj.id) == values:
+            return
+        self._index_remove(model_cls, obj.id)
+        for attr, value in zip(model_cls.__indexes__, values):
+            self._bucket_add(self.indexes[s_class][attr], value, obj.id)
+        sorted_values = values[len(model_cls.__indexes__):]
+        for attr, value in zip(model_cls.__sorted__, sorted_values):
+            self.sorted_indexes[s_class][attr].add(value, obj.id)
+        self.indexed_values[s_class][obj.id] = values
+
+    @staticmethod
+    def _bucket_add(index: dict, value, obj_id: str):
+        """Add an id to the bucket of `value`, most buckets hold one id."""
+        bucket = index.get(value)
+        if bucket is None:
+            index[value] = obj_id
+        elif type(bucket) is dict:
+            bucket[obj_id] = None
+        elif bucket != obj_id:
+            index[value] = {bucket: None, obj_id: None}
+
+    @staticmethod
+    def _bucket_ids(bucket) -> Iterable:
+        """Return the ids of an index bucket."""
+        if bucket is None:
+            return ()
+        return bucket if type(bucket) is dict else (bucket,)
+
+    @staticmethod
+    def _build_indexes(model_cls: type, objs: Dict[str, object]) -> Tuple:
+        """Build the hash indexes, sorted indexes and indexed values of a
+        full set of objects."""
+        attrs = model_cls.__indexes__ + model_cls.__sorted__
+        indexed_values = {obj_id: tuple([getattr(obj, attr, None)
+                                         for attr in attrs])
+                          for obj_id, obj in objs.items()}
+        indexes = {}
+        for pos, attr in enumerate(model_cls.__indexes__):
+            # Unique values (the usual case) only need one id per bucket
+            index = {values[pos]: obj_id
+                     for obj_id, values in indexed_values.items()}
+            if len(index) != len(indexed_values):
+                index = {}
+                for obj_id, values in indexed_values.items():
+                    JSONEngine._bucket_add(index, values[pos], obj_id)
+            indexes[attr] = index
+        sorted_indexes = {
+            attr: query.SortedIndex({obj_id: values[pos] for obj_id, values
+                                     in indexed_values.items()})
+            for pos, attr in enumerate(model_cls.__sorted__,
+                                       len(model_cls.__indexes__))}
+        return indexes, sorted_indexes, indexed_values
+
+    def load(self, model_cls: type):
+        """Load all objects of the class from its file.
+
+        In binary mode a missing snapshot falls back to the JSON file, which
+        is how existing JSON stores are imported.
+        """
+        self.register(model_cls)
+        s_class = model_cls.__name__
+        journal = self.journals.get(s_class)
+        if journal is None:
+            # Changes not written yet are written first, not dropped, and
+            # the reload is retried if more came in while reading
+            with self.file_locks[s_class]:
+                while True:
+                    if self.changes[s_class] != self.saved[s_class]:
+                        self._save(model_cls)
+                    if self._load_snapshot(model_cls, self.saved[s_class]):
+                        return
+        with self.file_locks[s_class], journal.locked():
+            journal.seen = None
+            self._sync(model_cls)
+
+    def _load_snapshot(self, model_cls: type,
+                       saved: Optional[int] = None) -> bool:
+        """Replace the objects of the class by its snapshot file.
+
+        When `saved` is given, the objects are only replaced if no change
+        was made since the file was written at that count; returns whether
+        they were replaced.
+        """
+        s_class = model_cls.__name__
+        bin_path = self.file_path(model_cls, 'binary')
+        json_path = self.file_path(model_cls, 'json')
+        objs = {}
+        # Read and decode outside the lock, then swap the objects in.
+        # Decoding only allocates acyclic objects: collections triggered
+        # by the allocation count would just rescan the growing heap. The
+        # collector is off for the whole process, so only meanwhile
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if self.snapshot_format == 'binary' and path.exists(bin_path):
+                try:
+                    with open(bin_path, 'rb') as f:
+                        objs = snapshot.read(model_cls, f)
+                except (EOFError, ValueError, TypeError) as e:
+                    print(f"Error loading file: {e}")
+            elif path.exists(json_path):
+                objs = self._read_json(model_cls, json_path)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        indexes, sorted_indexes, indexed_values = \
+            self._build_indexes(model_cls, objs)
+        order = query.SortedIndex(dict(zip(objs, objs)))
+        with self.locks[s_class].write():
+            if saved is not None and self.changes[s_class] != saved:
+                return False
+            self.data[s_class] = objs
+            self.indexes[s_class] = indexes
+            self.sorted_indexes[s_class] = sorted_indexes
+            self.indexed_values[s_class] = indexed_values
+            self.order[s_class] = order
+            self.saved[s_class] = self.changes[s_class]
+        return True
+
+    def save_to_file(self, model_cls: type):
+        """Write all objects of the class to its file.
+
+        The file is written to a temporary name and renamed over the old
+        one, so readers of the file never see a partial write.
+        """
+        s_class = model_cls.__name__
+        journal = self.journals.get(s_class)
+        if journal is not None:
+            with self.file_locks[s_class], journal.locked(exclusive=True):
+                self._sync(model_cls)
+                self._compact(model_cls)
+            return
+        # The file lock is taken before the snapshot: a later snapshot is
+        # never overwritten by an earlier one
+        with self.file_locks[s_class]:
+            self._save(model_cls)
+
+    def _save(self, model_cls: type):
+        """Write the class file from a copy of its objects (file lock
+        held)."""
+        s_class = model_cls.__name__
+        with self.locks[s_class].read():
+            objs = list(self.data[s_class].values())
+            changes = self.changes[s_class]
+        self._write(model_cls, objs, self.file_path(model_cls),
+                    self.snapshot_format)
+        self.saved[s_class] = changes
+
+    def _compact(self, model_cls: type):
+        """Fold the journal into a new snapshot (inter-process lock held)."""
+        s_class = model_cls.__name__
+        with self.locks[s_class].read():
+            objs = list(self.data[s_class].values())
+        self._write(model_cls, objs, self.file_path(model_cls),
+                    self.snapshot_format)
+        self.journals[s_class].reset()
+
+    def _sync(self, model_cls: type):
+        """Apply the changes of other processes (inter-process lock held)."""
+        reload, records = self.journals[model_cls.__name__].tail()
+        if reload:
+            self._load_snapshot(model_cls)
+        for record in records:
+            self._apply(model_cls, record)
+
+    def _refresh(self, model_cls: type):
+        """Catch up with other processes before a read, if they wrote."""
+        journal = self.journals.get(model_cls.__name__)
+        if journal is not None and journal.changed():
+            with self.file_locks[model_cls.__name__], journal.locked():
+                self._sync(model_cls)
+
+    def _apply(self, model_cls: type, record: dict, obj=None):
+        """Apply one journal record to the objects in memory.
+
+        `obj` is what the record was made from in this process: the saved
+        object, or the id -> object changes of a batch.
+        """
+        s_class = model_cls.__name__
+        op = record['op']
+        if op == 'save':
+            obj = obj or model_cls(**record['obj'])
+            with self.locks[s_class].write():
+                self._store(obj)
+        elif op == 'remove':
+            with self.locks[s_class].write():
+                self._discard(model_cls, record['id'])
+        else:
+            if obj is None:
+                obj = {d['id']: model_cls(**d) for d in record['objs']} \
+                    if op == 'save_many' else dict.fromkeys(record['ids'])
+            with self.locks[s_class].write():
+                self._replace(model_cls, obj)
+
+    def _journal(self, model_cls: type, record: dict, obj=None):
+        """Append a change to the journal and apply it locally."""
+        s_class = model_cls.__name__
+        journal = self.journals[s_class]
+        with self.file_locks[s_class], journal.locked(exclusive=True):
+            self._sync(model_cls)
+            journal.append(record)
+            self._apply(model_cls, record, obj)
+            if journal.size > self.journal_max_bytes:
+                self._compact(model_cls)
+
+    def export_json(self, model_cls: type, file_path: str = None):
+        """Write all objects of the class as JSON, whatever the format
+        (to the JSON data file by default)."""
+        s_class = model_cls.__name__
+        self.register(model_cls)
+        self._refresh(model_cls)
+        with self.locks[s_class].read():
+            objs = list(self.data[s_class].values())
+        self._write(model_cls, objs,
+                    file_path or self.file_path(model_cls, 'json'), 'json')
+
+    def snapshot(self, model_cls: type, file_path: str):
+        """Write a point-in-time copy of the class to `file_path`.
+
+        The class lock is only held to freeze the objects (see
+        models.freeze); copying, encoding and writing run unlocked.
+        """
+        s_class = model_cls.__name__
+        self.register(model_cls)
+        self._refresh(model_cls)
+        with self.locks[s_class].read():
+            freeze = Freeze(model_cls, self.data[s_class].values())
+            freeze.install()
+        try:
+            copies = list(freeze.copies())
+        finally:
+            freeze.uninstall()
+        self._write(model_cls, copies, file_path, self.snapshot_format)
+
+    def snapshot_name(self, model_cls: type) -> str:
+        """Return the file name of a snapshot of the class."""
+        return self.file_path(model_cls)
+
+    def _persist(self, model_cls: type):
+        """Write the class file now or hand it to the write-behind flusher."""
+        if self.flusher is not None:
+            self.flusher.mark_dirty(model_cls)
+        else:
+            model_cls.save_to_file()
+
+    def save(self, obj):
+        """Store an object and persist its class."""
+        s_class = obj.__class__.__name__
+        if s_class in self.journals:
+            self._journal(obj.__class__,
+                          {'op': 'save', 'obj': obj.to_json(True)}, obj)
+            return
+        with self.locks[s_class].write():
+            self._store(obj)
+        self._persist(obj.__class__)
+
+    def remove(self, obj):
+        """Delete an object and persist its class."""
+        model_cls = obj.__class__
+        s_class = model_cls.__name__
+        if s_class in self.journals:
+            self._journal(model_cls, {'op': 'remove', 'id': obj.id})
+            return
+        with self.locks[s_class].write():
+            self._discard(model_cls, obj.id)
+        self._persist(model_cls)
+
+    def _change_many(self, model_cls: type, changes: Dict[str, object],
+                     record: dict):
+        """Apply a batch of changes under one lock and persist it once.
+
+        Written through, a failed file write undoes the batch (unless the
+        objects changed again meanwhile). In multiprocess mode the batch
+        is a single journal record.
+        """
+        s_class = model_cls.__name__
+        if s_class in self.journals:
+            self._journal(model_cls, record, changes)
+            return
+        with self.locks[s_class].write():
+            previous = self._replace(model_cls, changes)
+        if self.flusher is not None:
+            self.flusher.mark_dirty(model_cls)
+            return
+        try:
+            model_cls.save_to_file()
+        except Exception:
+            with self.locks[s_class].write():
+                objs = self.data[s_class]
+                self._replace(model_cls, {
+                    obj_id: obj for obj_id, obj in previous.items()
+                    if objs.get(obj_id) is changes[obj_id]})
+            raise
+
+    def save_many(self, model_cls: type, objs: List):
+        """Store several objects and persist their class once."""
+        self._change_many(model_cls, {obj.id: obj for obj in objs},
+                          {'op': 'save_many',
+                           'objs': [obj.to_json(True) for obj in objs]})
+
+    def remove_many(self, model_cls: type, ids: List[str]):
+        """Delete several objects by ID and persist their class once."""
+        self._change_many(model_cls, dict.fromkeys(ids),
+                          {'op': 'remove_many', 'ids': ids})
+
+    def count(self, model_cls: type) -> int:
+        """Count all objects of the class."""
+        s_class = model_cls.__name__
+        self._refresh(model_cls)
+        with self.locks[s_class].read():
+            return len(self.data[s_class])
+
+    def get(self, model_cls: type, obj_id: str):
+        """Return one object by ID."""
+        s_class = model_cls.__name__
+        self._refresh(model_cls)
+        with self.locks[s_class].read():
+            return self.data[s_class].get(obj_id)
+
+    def page(self, model_cls: type, after: Optional[str],
+             limit: int) -> List:
+        """Return up to `limit` objects in id order, after the id `after`."""
+        s_class = model_cls.__name__
+        self._refresh(model_cls)
+        with self.locks[s_class].read():
+            order = self.order[s_class]
+            ids = order.iter_ids(order.span(after))
+            if after is not None:
+                ids = dropwhile(after.__eq__, ids)
+            return list(map(self.data[s_class].__getitem__,
+                            islice(ids, limit)))
+
+    def search(self, model_cls: type, attributes: dict) -> List:
+        """Return the objects whose attributes match."""
+        s_class = model_cls.__name__
+        self._refresh(model_cls)
+
+        def _search(obj):
+            return all(getattr(obj, k) == v for k, v in attributes.items())
+
+        with self.locks[s_class].read():
+            objs = self.data[s_class]
+            indexed = [k for k in attributes if k in model_cls.__indexes__]
+            if indexed:
+                # Narrow down to the smallest matching index bucket, the
+                # remaining attributes are still checked by _search
+                buckets = [self._bucket_ids(
+                    self.indexes[s_class][k].get(attributes[k]))
+                    for k in indexed]
+                ids = min(buckets, key=len)
+                return list(filter(_search, (objs[i] for i in ids)))
+            return list(filter(_search, objs.values()))
+
+    def query(self, model_cls: type, prefix: Dict[str, str],
+              ranges: Dict[str, Tuple], order_by: str = 'id',
+              reverse: bool = False, limit: Optional[int] = None) -> List:
+        """Return the objects matching prefix and range predicates.
+
+        The candidates are the smallest slice of a sorted index covering
+        a predicate. When they are already in the requested order (or no
+        predicate is indexed and the order is indexed) they are read in
+        index order and the scan stops after `limit` matches; otherwise
+        the matches are sorted (see models.query).
+        """
+        s_class = model_cls.__name__
+        self._refresh(model_cls)
+        match = query.matcher(prefix, ranges)
+        with self.locks[s_class].read():
+            objs = self.data[s_class]
+            sorted_indexes = self.sorted_indexes[s_class]
+            spans = [(attr, sorted_indexes[attr].prefix_span(start))
+                     for attr, start in prefix.items()
+                     if attr in sorted_indexes]
+            spans += [(attr, sorted_indexes[attr].span(*bounds))
+                      for attr, bounds in ranges.items()
+                      if attr in sorted_indexes]
+            if spans:
+                attr, span = min(spans, key=lambda s: sorted_indexes[
+                    s[0]].size(s[1]))
+                in_order = sorted_indexes[attr].iter_ids(span, reverse)
+                if order_by != attr:
+                    return query.ordered(
+                        filter(match, map(objs.__getitem__, in_order)),
+                        order_by, reverse, limit)
+            elif order_by in sorted_indexes:
+                index = sorted_indexes[order_by]
+                in_order = chain(index.iter_ids(reverse=reverse),
+                                 sorted(index.nulls, reverse=reverse))
+            elif order_by == 'id':
+                in_order = self.order[s_class].iter_ids(reverse=reverse)
+            else:
+                return query.ordered(filter(match, objs.values()),
+                                     order_by, reverse, limit)
+            found = filter(match, map(objs.__getitem__, in_order))
+            return list(islice(found, limit))
+
+    def flush(self) -> int:
+        """Persist all pending write-behind changes now."""
+        return self.flusher.flush() if self.flusher is not None else 0
+
+    def close(self):
+        """Stop the write-behind flusher after persisting pending changes."""
+        if self.flusher is not None:
+            self.flusher.close()
+        for journal in self.journals.values():
+            journal.close()
+        self.journals.clear()
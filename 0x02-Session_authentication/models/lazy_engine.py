@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+"""Lazy storage engine: objects are hydrated on demand from a mapped file.
+
+A lazy data file (.db_<cls>.lazy) holds every object as a marshal row plus
+one sorted key table per lookup attribute (the id and each attribute of
+`__indexes__` and `__sorted__`), so a lookup is a binary search in the
+memory-mapped file.
+Loading a class only maps the file and reads its header: cold-start time
+and resident memory do not depend on the number of objects.
+
+    header: magic | version u16 | marshal version u16 | rows u32
+            | meta length u32 | tables u16
+    meta: marshal (class name, columns, table names)
+    directory: one u64 offset of the pointer array of each table
+    records: marshal rows
+    per table: entries (key length u32 | key | record offset u64
+               | record length u32), then the u64 pointers to the entries
+               sorted by key
+"""
+from collections import OrderedDict
+import heapq
+from itertools import islice
+from os import dup, path, getenv, fsync, replace
+import marshal
+import mmap
+import struct
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from models import query, snapshot
+from models.freeze import Freeze
+from models.write_behind import WriteBehindFlusher
+
+MAGIC = b'MODELLZY'
+VERSION = 1
+HEADER = struct.Struct('>8sHHIIH')
+U32 = struct.Struct('>I')
+U64 = struct.Struct('>Q')
+INT_KEY = struct.Struct('>Q')
+INT_BIAS = 1 << 63
+RECORD_REF = struct.Struct('>QI')
+
+
+def encode_key(value) -> bytes:
+    """Encode a lookup value so that equal values give equal bytes.
+
+    Strings and 64-bit integers keep their natural order (each after a
+    type byte), which allows range scans.
+    """
+    if value is None:
+        return b'n'
+    if isinstance(value, str):
+        return b's' + value.encode('utf-8', 'surrogatepass')
+    if type(value) is int and -INT_BIAS <= value < INT_BIAS:
+        return b'i' + INT_KEY.pack(value + INT_BIAS)
+    return b'm' + marshal.dumps(value, snapshot.MARSHAL_VERSION)
+
+
+class LazyFile:
+    """Read-only view of a memory-mapped lazy data file."""
+
+    def __init__(self, file_path: Union[str, int]):
+        """Map `file_path` (or an open descriptor, closed with the view)
+        and read its header and table directory."""
+        self._f = open(file_path, 'rb')
+        self.mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, marshal_version, self.count, meta_len, n_tables = \
+            HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or \
+                marshal_version != snapshot.MARSHAL_VERSION:
+            self.close()
+            raise snapshot.SnapshotError(
+                f"unsupported lazy file {magic!r} v{version}")
+        start = HEADER.size
+        self.class_name, self.columns, names = marshal.loads(
+            self.mm[start:start + meta_len])
+        start += meta_len
+        self.tables = {name: U64.unpack_from(self.mm, start + 8 * i)[0]
+                       for i, name in enumerate(names)}
+
+    def _entry(self, table: int, i: int) -> Tuple[bytes, int, int]:
+        """Return key, record offset and length of entry `i` of a table."""
+        ptr = U64.unpack_from(self.mm, table + 8 * i)[0]
+        key_len = U32.unpack_from(self.mm, ptr)[0]
+        key_end = ptr + 4 + key_len
+        rec_off, rec_len = RECORD_REF.unpack_from(self.mm, key_end)
+        return self.mm[ptr + 4:key_end], rec_off, rec_len
+
+    def lower_bound(self, name: str, key: bytes) -> int:
+        """Return the first entry of table `name` whose key is >= `key`."""
+        table = self.tables[name]
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(table, mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, name: str, start: int = 0) -> Iterator[Tuple]:
+        """Yield (key, record offset, record length) from entry `start`."""
+        table = self.tables[name]
+        for i in range(start, self.count):
+            yield self._entry(table, i)
+
+    def find(self, name: str, value) -> List[Tuple[int, int]]:
+        """Return the records whose `name` column equals `value`."""
+        key = encode_key(value)
+        found = []
+        for entry_key, rec_off, rec_len in self.entries(
+                name, self.lower_bound(name, key)):
+            if entry_key != key:
+                break
+            found.append((rec_off, rec_len))
+        return found
+
+    def scan(self, name: str, low: bytes, high: Optional[bytes]) -> Iterator:
+        """Yield the records whose `name` key is in [low, high), where a
+        None high stops at the end of the keys of low's type."""
+        for key, rec_off, rec_len in self.entries(
+                name, self.lower_bound(name, low)):
+            if key[:1] != low[:1] or high is not None and key >= high:
+                break
+            yield rec_off, rec_len
+
+    def row(self, rec_off: int, rec_len: int) -> tuple:
+        """Decode one record."""
+        return marshal.loads(self.mm[rec_off:rec_off + rec_len])
+
+    def rows(self) -> Iterator[tuple]:
+        """Yield every record, in id order."""
+        for _, rec_off, rec_len in self.entries('id'):
+            yield self.row(rec_off, rec_len)
+
+    def close(self):
+        """Unmap and close the file."""
+        self.mm.close()
+        self._f.close()
+
+
+def write_file(model_cls: type, file_path: str, rows: Iterable[tuple],
+               durability: str = 'os'):
+    """Write rows of `snapshot.slot_names(model_cls)` as a lazy data file.
+
+    The file is written to a temporary name and renamed over `file_path`.
+    """
+    columns = snapshot.slot_names(model_cls)
+    names = tuple(dict.fromkeys(('id',) + model_cls.__indexes__ +
+                                model_cls.__sorted__))
+    positions = [columns.index(name) for name in names]
+    meta = marshal.dumps((model_cls.__name__, columns, names),
+                         snapshot.MARSHAL_VERSION)
+    entries: List[List[Tuple[bytes, int, int]]] = [[] for _ in names]
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, snapshot.MARSHAL_VERSION, 0,
+                            len(meta), len(names)))
+        f.write(meta)
+        directory = f.tell()
+        f.write(bytes(8 * len(names)))
+        count = 0
+        for row in rows:
+            record = marshal.dumps(row, snapshot.MARSHAL_VERSION)
+            rec_off = f.tell()
+            f.write(record)
+            for table, pos in zip(entries, positions):
+                table.append((encode_key(row[pos]), rec_off, len(record)))
+            count += 1
+        offsets = []
+        for table in entries:
+            table.sort(key=lambda entry: entry[0])
+            pointers = []
+            for key, rec_off, rec_len in table:
+                pointers.append(f.tell())
+                f.write(U32.pack(len(key)) + key +
+                        RECORD_REF.pack(rec_off, rec_len))
+            offsets.append(f.tell())
+            f.write(b''.join(U64.pack(ptr) for ptr in pointers))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, snapshot.MARSHAL_VERSION, count,
+                            len(meta), len(names)))
+        f.seek(directory)
+        f.write(b''.join(U64.pack(offset) for offset in offsets))
+        if durability == 'fsync':
+            f.flush()
+            fsync(f.fileno())
+    replace(tmp_path, file_path)
+
+
+def merged_rows(model_cls: type, lazy_file: Optional[LazyFile],
+                skip: Iterable[str], rows: Iterable[tuple]) -> Iterator:
+    """Yield the rows of `lazy_file` whose id is not in `skip`, then
+    `rows`, all as the columns of `snapshot.slot_names(model_cls)`."""
+    columns = snapshot.slot_names(model_cls)
+    if lazy_file is not None:
+        build = snapshot.row_builder(model_cls, lazy_file.columns)
+        id_pos = lazy_file.columns.index('id')
+        same = lazy_file.columns == columns
+        for row in lazy_file.rows():
+            if row[id_pos] in skip:
+                continue
+            yield row if same else snapshot.to_row(build(row), columns)
+    yield from rows
+
+
+class _ClassStore:
+    """Lazy state of one model class."""
+
+    def __init__(self):
+        """Initialize an empty state (no data file mapped)."""
+        self.lock = Lock()
+        self.file_lock = Lock()
+        self.file: Optional[LazyFile] = None
+        self.build = None
+        self.id_pos = 0
+        # Hydrated objects, least recently used first
+        self.cache: 'OrderedDict[str, object]' = OrderedDict()
+        # Changes not written to the data file yet, stamped with a sequence
+        # number so a rewrite only drops what it has written
+        self.overlay: Dict[str, object] = {}
+        self.deleted: Dict[str, None] = {}
+        self.changed: Dict[str, int] = {}
+        self.seq = 0
+
+
+class LazyEngine:
+    """Storage engine hydrating objects from the lazy data file on demand.
+
+    Hydrated objects are kept in a bounded LRU cache. Saved and removed
+    objects are kept in memory until the class file is rewritten
+    (save_to_file), which merges them with the mapped file.
+    """
+
+    def __init__(self, cache_size: int = 10000, durability: str = 'os',
+                 flusher: Optional[WriteBehindFlusher] = None):
+        """Initialize the engine.
+
+        Args:
+            cache_size (int): Maximum hydrated objects kept per class.
+            durability (str): "os" or "fsync", as for the JSON engine.
+            flusher (WriteBehindFlusher, optional): Batches file rewrites.
+        """
+        self.cache_size = cache_size
+        self.durability = durability
+        self.flusher = flusher
+        self.stores: Dict[str, _ClassStore] = {}
+        self.lock = Lock()
+
+    @classmethod
+    def from_env(cls) -> 'LazyEngine':
+        """Build the engine from MODELS_LAZY_CACHE_SIZE,
+        MODELS_DURABILITY and MODELS_WRITE_BEHIND."""
+        return cls(int(getenv('MODELS_LAZY_CACHE_SIZE', 10000)),
+                   getenv('MODELS_DURABILITY', 'os'),
+                   WriteBehindFlusher.from_env())
+
+    @staticmethod
+    def file_path(model_cls: type) -> str:
+        """Return the lazy data file of a model class."""
+        return f".db_{model_cls.__name__}.lazy"
+
+    def register(self, model_cls: type):
+        """Create the state of a model class if needed."""
+        s_class = model_cls.__name__
+        if s_class in self.stores:
+            return
+        with self.lock:
+            if s_class not in self.stores:
+                self.stores[s_class] = _ClassStore()
+
+    def _open(self, model_cls: type, store: _ClassStore,
+              lazy_file: Optional[LazyFile]):
+        """Swap in a new mapped file (store lock held)."""
+        if store.file is not None:
+            store.file.close()
+        store.file = lazy_file
+        if lazy_file is not None:
+            store.build = snapshot.row_builder(model_cls, lazy_file.columns)
+            store.id_pos = lazy_file.columns.index('id')
+
+    def load(self, model_cls: type):
+        """Map the data file of the class, importing JSON/binary stores.
+
+        A missing lazy file is created once from .db_<cls>.bin or
+        .db_<cls>.json when one of them exists. Pending changes are kept:
+        they are not in the file yet and still apply on top of it.
+        """
+        from models.json_engine import JSONEngine
+
+        self.register(model_cls)
+        s_class = model_cls.__name__
+        store = self.stores[s_class]
+        file_path = self.file_path(model_cls)
+        with store.file_lock:
+            if not path.exists(file_path):
+                objs = None
+                if path.exists(f".db_{s_class}.bin"):
+                    with open(f".db_{s_class}.bin", 'rb') as f:
+                        objs = snapshot.read(model_cls, f)
+                elif path.exists(f".db_{s_class}.json"):
+                    objs = JSONEngine._read_json(model_cls,
+                                                 f".db_{s_class}.json")
+                if objs is not None:
+                    columns = snapshot.slot_names(model_cls)
+                    write_file(model_cls, file_path,
+                               (snapshot.to_row(obj, columns)
+                                for obj in objs.values()), self.durability)
+            lazy_file = LazyFile(file_path) \
+                if path.exists(file_path) else None
+            with store.lock:
+                self._open(model_cls, store, lazy_file)
+                store.cache.clear()
+                for obj in store.overlay.values():
+                    self._cache_put(store, obj)
+
+    def save_to_file(self, model_cls: type):
+        """Rewrite the data file with the pending changes merged in."""
+        store = self.stores[model_cls.__name__]
+        file_path = self.file_path(model_cls)
+        columns = snapshot.slot_names(model_cls)
+        with store.file_lock:
+            with store.lock:
+                seq = store.seq
+                old = store.file
+                overlay = list(store.overlay.values())
+                skip = set(store.overlay) | set(store.deleted)
+            # Rows are copied from the old file after the lock is
+            # released: it stays mapped until the swap below
+            rows = merged_rows(model_cls, old, skip,
+                               (snapshot.to_row(obj, columns)
+                                for obj in overlay))
+            write_file(model_cls, file_path, rows, self.durability)
+            lazy_file = LazyFile(file_path)
+            with store.lock:
+                self._open(model_cls, store, lazy_file)
+                for obj_id, change in list(store.changed.items()):
+                    if change <= seq:
+                        del store.changed[obj_id]
+                        store.overlay.pop(obj_id, None)
+                        store.deleted.pop(obj_id, None)
+
+    def snapshot(self, model_cls: type, file_path: str):
+        """Write a point-in-time copy of the class as a lazy data file.
+
+        The store lock is only held to open a second view of the mapped
+        file, which a rewrite cannot unmap, and to freeze the pending
+        objects (see models.freeze).
+        """
+        self.register(model_cls)
+        store = self.stores[model_cls.__name__]
+        with store.lock:
+            view = LazyFile(dup(store.file._f.fileno())) \
+                if store.file is not None else None
+            skip = set(store.overlay) | set(store.deleted)
+            freeze = Freeze(model_cls, store.overlay.values())
+            freeze.install()
+        try:
+            pending = freeze.rows()
+        finally:
+            freeze.uninstall()
+        try:
+            write_file(model_cls, file_path,
+                       merged_rows(model_cls, view, skip, pending),
+                       self.durability)
+        finally:
+            if view is not None:
+                view.close()
+
+    def export_json(self, model_cls: type, file_path: str = None):
+        """Write all objects of the class as JSON (to .db_<cls>.json by
+        default), the format load() imports."""
+        from models.json_engine import JSONEngine
+
+        JSONEngine(self.durability)._write(
+            model_cls, self.search(model_cls, {}),
+            file_path or f".db_{model_cls.__name__}.json", 'json')
+
+    def snapshot_name(self, model_cls: type) -> str:
+        """Return the file name of a snapshot of the class."""
+        return self.file_path(model_cls)
+
+    def _persist(self, model_cls: type):
+        """Rewrite the class file now or hand it to the flusher."""
+        if self.flusher is not None:
+            self.flusher.mark_dirty(model_cls)
+        else:
+            model_cls.save_to_file()
+
+    def _cache_put(self, store: _ClassStore, obj):
+        """Insert an object in the LRU cache (store lock held)."""
+        store.cache[obj.id] = obj
+        store.cache.move_to_end(obj.id)
+        while len(store.cache) > self.cache_size:
+            store.cache.popitem(last=False)
+
+    def _hydrate(self, store: _ClassStore, row: tuple, cache: bool = True):
+        """Return the object of a row, reusing the cached instance."""
+        obj = store.cache.get(row[store.id_pos])
+        if obj is not None:
+            if cache:
+                store.cache.move_to_end(obj.id)
+            return obj
+        obj = store.build(row)
+        if cache:
+            self._cache_put(store, obj)
+        return obj
+
+    def _on_disk(self, store: _ClassStore, obj_id: str) -> bool:
+        """Tell if the mapped file holds `obj_id` (store lock held)."""
+        return store.file is not None and bool(store.file.find('id', obj_id))
+
+    def save(self, obj):
+        """Keep the object as a pending change and persist its class."""
+        store = self.stores[obj.__class__.__name__]
+        with store.lock:
+            store.seq += 1
+            store.changed[obj.id] = store.seq
+            store.overlay[obj.id] = obj
+            store.deleted.pop(obj.id, None)
+            self._cache_put(store, obj)
+        self._persist(obj.__class__)
+
+    def remove(self, obj):
+        """Mark the object deleted and persist its class."""
+        store = self.stores[obj.__class__.__name__]
+        with store.lock:
+            store.seq += 1
+            store.changed[obj.id] = store.seq
+            store.overlay.pop(obj.id, None)
+            store.deleted[obj.id] = None
+            store.cache.pop(obj.id, None)
+        self._persist(obj.__class__)
+
+    def save_many(self, model_cls: type, objs: List):
+        """Keep several objects as pending changes and persist them once.
+
+        The batch is applied under one lock and written in one file
+        rewrite; if the write fails it stays pending, whole.
+        """
+        store = self.stores[model_cls.__name__]
+        with store.lock:
+            store.seq += 1
+            for obj in objs:
+                store.changed[obj.id] = store.seq
+                store.overlay[obj.id] = obj
+                store.deleted.pop(obj.id, None)
+                self._cache_put(store, obj)
+        self._persist(model_cls)
+
+    def remove_many(self, model_cls: type, ids: List[str]):
+        """Mark several objects deleted and persist them once."""
+        store = self.stores[model_cls.__name__]
+        with store.lock:
+            store.seq += 1
+            for obj_id in ids:
+                store.changed[obj_id] = store.seq
+                store.overlay.pop(obj_id, None)
+                store.deleted[obj_id] = None
+                store.cache.pop(obj_id, None)
+        self._persist(model_cls)
+
+    def count(self, model_cls: type) -> int:
+        """Count all objects of the class."""
+        store = self.stores[model_cls.__name__]
+        with store.lock:
+            count = store.file.count if store.file is not None else 0
+            count += sum(1 for obj_id in store.overlay
+                         if not self._on_disk(store, obj_id))
+            count -= sum(1 for obj_id in store.deleted
+                         if self._on_disk(store, obj_id))
+            return count
+
+    def get(self, model_cls: type, obj_id: str):
+        """Return one object by ID, hydrating it if needed."""
+        store = self.stores[model_cls.__name__]
+        with store.lock:
+            if obj_id in store.deleted:
+                return None
+            obj = store.overlay.get(obj_id)
+            if obj is not None:
+                return obj
+            obj = store.cache.get(obj_id)
+            if obj is not None:
+                store.cache.move_to_end(obj_id)
+                return obj
+            if store.file is None:
+                return None
+            for rec in store.file.find('id', obj_id):
+                return self._hydrate(store, store.file.row(*rec))
+            return None
+
+    def page(self, model_cls: type, after: Optional[str],
+             limit: int) -> List:
+        """Return up to `limit` objects in id order, after the id `after`.
+
+        The id table of the file is already sorted, it is merged with the
+        pending changes; the page is hydrated without filling the cache.
+        """
+        store = self.stores[model_cls.__name__]
+        with store.lock:
+            lazy_file = store.file
+            pending = sorted((obj_id, None) for obj_id in store.overlay
+                             if after is None or obj_id > after)
+
+            def disk():
+                start = 0 if after is None else \
+                    lazy_file.lower_bound('id', encode_key(after))
+                for key, rec_off, rec_len in lazy_file.entries('id', start):
+                    obj_id = key[1:].decode('utf-8', 'surrogatepass')
+                    if obj_id != after and obj_id not in store.overlay \
+                            and obj_id not in store.deleted:
+                        yield obj_id, (rec_off, rec_len)
+
+            merged = heapq.merge(disk(), pending, key=lambda e: e[0]) \
+                if lazy_file is not None else iter(pending)
+            return [store.overlay[obj_id] if rec is None else
+                    self._hydrate(store, lazy_file.row(*rec), cache=False)
+                    for obj_id, rec in islice(merged, limit)]
+
+    def search(self, model_cls: type, attributes: dict) -> List:
+        """Return the objects whose attributes match.
+
+        A lookup on an indexed attribute hydrates (and caches) only the
+        matching records; other searches scan the whole file without
+        filling the cache.
+        """
+        store = self.stores[model_cls.__name__]
+
+        def _search(obj):
+            return all(getattr(obj, k) == v for k, v in attributes.items())
+
+        with store.lock:
+            found = []
+            lazy_file = store.file
+            if lazy_file is not None:
+                indexed = [k for k in attributes if k in lazy_file.tables]
+                if indexed:
+                    recs = min((lazy_file.find(k, attributes[k])
+                                for k in indexed), key=len)
+                    disk = (self._hydrate(store, lazy_file.row(*rec))
+                            for rec in recs)
+                else:
+                    disk = (self._hydrate(store, row, cache=False)
+                            for row in lazy_file.rows())
+                found = [obj for obj in disk
+                         if obj.id not in store.overlay and
+                         obj.id not in store.deleted and _search(obj)]
+            found.extend(filter(_search, list(store.overlay.values())))
+            return found
+
+    def query(self, model_cls: type, prefix: Dict[str, str],
+              ranges: Dict[str, Tuple], order_by: str = 'id',
+              reverse: bool = False, limit: Optional[int] = None) -> List:
+        """Return the objects matching prefix and range predicates.
+
+        The candidates read from the file are the records of the
+        smallest key range covering a predicate (the whole file when no
+        predicate has a key table); the matches are sorted in memory.
+        """
+        store = self.stores[model_cls.__name__]
+        match = query.matcher(prefix, ranges)
+        with store.lock:
+            found = []
+            lazy_file = store.file
+            if lazy_file is not None:
+                scans = []
+                for attr, start in prefix.items():
+                    if attr in lazy_file.tables:
+                        end = query.successor(start)
+                        scans.append((attr, encode_key(start), None
+                                      if end is None else encode_key(end)))
+                for attr, (low, high) in ranges.items():
+                    if attr in lazy_file.tables and low is not None:
+                        scans.append((attr, encode_key(low), None
+                                      if high is None else encode_key(high)))
+                if scans:
+                    recs = min((list(lazy_file.scan(*scan))
+                                for scan in scans), key=len)
+                    rows = (lazy_file.row(*rec) for rec in recs)
+                else:
+                    rows = lazy_file.rows()
+                disk = (self._hydrate(store, row, cache=False)
+                        for row in rows)
+                found = [obj for obj in disk
+                         if obj.id not in store.overlay and
+                         obj.id not in store.deleted and match(obj)]
+            found.extend(filter(match, list(store.overlay.values())))
+        return query.ordered(found, order_by, reverse, limit)
+
+    def flush(self) -> int:
+        """Persist all pending write-behind changes now."""
+        return self.flusher.flush() if self.flusher is not None else 0
+
+    def close(self):
+        """Persist pending changes and unmap every data file."""
+        if self.flusher is not None:
+            self.flusher.close()
+        for store in self.stores.values():
+            with store.lock:
+                if store.file is not None:
+                    store.file.close()
+                    store.file = None
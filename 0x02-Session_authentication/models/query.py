@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Prefix/range predicates, ordering and sorted indexes for Base.query().
+
+Predicates and orderings are expressed on stored attributes (slots), so
+timestamps compare as epoch seconds. Objects whose attribute is None
+never match a predicate on it and come last when ordered by it.
+"""
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def successor(prefix: str) -> Optional[str]:
+    """Return the smallest string greater than every string starting with
+    `prefix`, or None if there is none."""
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+def matcher(prefix: Dict[str, str],
+            ranges: Dict[str, Tuple]) -> Callable[[object], bool]:
+    """Return a test of the prefix and range predicates on an object.
+
+    Args:
+        prefix: attribute -> prefix its string value starts with.
+        ranges: attribute -> (low, high), low included and high excluded,
+            either None for no bound.
+    """
+    tests = []
+    for attr, start in prefix.items():
+        tests.append(lambda obj, attr=attr, start=start:
+                     isinstance(getattr(obj, attr, None), str) and
+                     getattr(obj, attr).startswith(start))
+    for attr, (low, high) in ranges.items():
+        tests.append(lambda obj, attr=attr, low=low, high=high:
+                     getattr(obj, attr, None) is not None and
+                     (low is None or getattr(obj, attr) >= low) and
+                     (high is None or getattr(obj, attr) < high))
+    return lambda obj: all(test(obj) for test in tests)
+
+
+def ordered(objs: Iterable, order_by: str, reverse: bool = False,
+            limit: Optional[int] = None) -> List:
+    """Sort objects by (attribute, id), None values last, and cut."""
+    values, nulls = [], []
+    for obj in objs:
+        (nulls if getattr(obj, order_by, None) is None else values).append(
+            obj)
+    values.sort(key=lambda obj: (getattr(obj, order_by), obj.id),
+                reverse=reverse)
+    nulls.sort(key=lambda obj: obj.id, reverse=reverse)
+    return (values + nulls)[:limit]
+
+
+class SortedIndex:
+    """Values of one attribute in (value, id) order, for range scans.
+
+    Entries are kept in chunks of parallel arrays (`keys`, `ids`) of at
+    most 2 * CHUNK entries, with the last (value, id) of every chunk in
+    `maxes`: an entry is found by bisecting `maxes` then its chunk, and
+    an insertion only shifts one chunk. Ids whose value is None are kept
+    apart in `nulls`.
+
+    A position is a (chunk, offset) pair; a span is the (start, stop)
+    positions of a range of entries.
+    """
+
+    __slots__ = ('keys', 'ids', 'maxes', 'nulls')
+
+    CHUNK = 1000
+
+    def __init__(self, values: Optional[Dict[str, object]] = None):
+        """Build the index of id -> value pairs at once."""
+        values = values or {}
+        # Two stable sorts with C-level keys instead of sorting tuples
+        ids = sorted(obj_id for obj_id, value in values.items()
+                     if value is not None)
+        ids.sort(key=values.__getitem__)
+        keys = list(map(values.__getitem__, ids))
+        self.keys: List[list] = [keys[i:i + self.CHUNK]
+                                 for i in range(0, len(keys), self.CHUNK)]
+        self.ids: List[list] = [ids[i:i + self.CHUNK]
+                                for i in range(0, len(ids), self.CHUNK)]
+        self.maxes: List[tuple] = [(k[-1], i[-1])
+                                   for k, i in zip(self.keys, self.ids)]
+        self.nulls = {obj_id: None for obj_id, value in values.items()
+                      if value is None}
+
+    def __len__(self) -> int:
+        """Number of indexed ids, None values included."""
+        return sum(map(len, self.ids)) + len(self.nulls)
+
+    def _locate(self, value, obj_id: str) -> Tuple[int, int]:
+        """Return where (value, id) is or would be inserted."""
+        c = min(bisect_left(self.maxes, (value, obj_id)),
+                len(self.maxes) - 1)
+        keys = self.keys[c]
+        lo = bisect_left(keys, value)
+        hi = bisect_right(keys, value, lo)
+        return c, bisect_left(self.ids[c], obj_id, lo, hi)
+
+    def add(self, value, obj_id: str):
+        """Index an id under a value."""
+        if value is None:
+            self.nulls[obj_id] = None
+            return
+        if not self.maxes:
+            self.keys.append([value])
+            self.ids.append([obj_id])
+            self.maxes.append((value, obj_id))
+            return
+        c, pos = self._locate(value, obj_id)
+        keys, ids = self.keys[c], self.ids[c]
+        keys.insert(pos, value)
+        ids.insert(pos, obj_id)
+        if pos == len(ids) - 1:
+            self.maxes[c] = (value, obj_id)
+        if len(ids) > 2 * self.CHUNK:
+            half = len(ids) // 2
+            self.keys[c:c + 1] = [keys[:half], keys[half:]]
+            self.ids[c:c + 1] = [ids[:half], ids[half:]]
+            self.maxes[c:c] = [(keys[half - 1], ids[half - 1])]
+
+    def remove(self, value, obj_id: str):
+        """Drop an id indexed under a value."""
+        if value is None:
+            self.nulls.pop(obj_id, None)
+            return
+        if not self.maxes:
+            return
+        c, pos = self._locate(value, obj_id)
+        keys, ids = self.keys[c], self.ids[c]
+        if pos == len(ids) or ids[pos] != obj_id:
+            return
+        del keys[pos]
+        del ids[pos]
+        if not ids:
+            del self.keys[c], self.ids[c], self.maxes[c]
+        elif pos == len(ids):
+            self.maxes[c] = (keys[-1], ids[-1])
+
+    def _bound(self, value) -> Tuple[int, int]:
+        """Return the position of the first entry whose value >= `value`."""
+        c = bisect_left(self.maxes, (value,))
+        if c == len(self.maxes):
+            return c, 0
+        return c, bisect_left(self.keys[c], value)
+
+    def span(self, low=None, high=None) -> Tuple:
+        """Return the span of the entries whose value is in [low, high)."""
+        start = (0, 0) if low is None else self._bound(low)
+        stop = (len(self.maxes), 0) if high is None else self._bound(high)
+        return start, max(start, stop)
+
+    def prefix_span(self, prefix: str) -> Tuple:
+        """Return the span of the entries whose value starts with `prefix`."""
+        return self.span(prefix or None, successor(prefix))
+
+    def size(self, span: Tuple) -> int:
+        """Return the number of entries of a span."""
+        (c1, p1), (c2, p2) = span
+        return sum(map(len, self.ids[c1:c2])) - p1 + p2
+
+    def iter_ids(self, span: Optional[Tuple] = None,
+                 reverse: bool = False) -> Iterator[str]:
+        """Yield the ids of a span (all non-None entries by default)."""
+        (c1, p1), (c2, p2) = span or self.span()
+        if c1 == c2:
+            chunks = [self.ids[c1][p1:p2]] if c1 < len(self.ids) else []
+        else:
+            chunks = [self.ids[c1][p1:]] + self.ids[c1 + 1:c2]
+            if c2 < len(self.ids):
+                chunks.append(self.ids[c2][:p2])
+        if reverse:
+            return chain.from_iterable(map(reversed, reversed(chunks)))
+        return chain.from_iterable(chunks)
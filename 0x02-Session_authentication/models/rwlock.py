@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Reader-writer lock used by the in-memory model store."""
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+
+class RWLock:
+    """Many concurrent readers or one writer, writers take precedence.
+
+    A waiting writer holds back new readers so that a steady stream of
+    lookups cannot starve saves.
+    """
+
+    def __init__(self):
+        """Initialize an unlocked lock."""
+        self._cond = Condition(Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock shared."""
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively."""
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Versioned binary snapshot format of model objects.
+
+A snapshot is a fixed header followed by a marshal payload:
+
+    header: magic (8 bytes) | format version (u16) | marshal version (u16)
+    payload: (class name, column names, rows)
+
+Columns are the `__slots__` of the model class, rows hold the raw slot
+values (timestamps stay epoch integers), so loading neither parses
+strings nor runs `__init__`.
+"""
+import marshal
+import struct
+from typing import BinaryIO, Callable, Dict, Iterable, Tuple
+
+MAGIC = b'MODELSNP'
+VERSION = 1
+MARSHAL_VERSION = 4
+HEADER = struct.Struct('>8sHH')
+
+
+class SnapshotError(ValueError):
+    """Raised when a file is not a readable snapshot."""
+
+
+def slot_names(model_cls: type) -> Tuple[str, ...]:
+    """Return the persisted slots of a class and its bases, base classes
+    first (slots listed in `__transient__` are left out)."""
+    transient = getattr(model_cls, '__transient__', ())
+    names = []
+    for klass in reversed(model_cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return tuple(name for name in names if name not in transient)
+
+
+def row_builder(model_cls: type, columns: Tuple[str, ...]) -> Callable:
+    """Return a function turning a row of `columns` values into an object.
+
+    Columns removed from the model are skipped, new slots default to None.
+    """
+    slots = slot_names(model_cls) + tuple(model_cls.__transient__)
+    setters = [getattr(model_cls, name).__set__ if name in slots else None
+               for name in columns]
+    missing = [getattr(model_cls, name).__set__
+               for name in slots if name not in columns]
+    new = model_cls.__new__
+
+    def build(row: tuple):
+        obj = new(model_cls)
+        for setter, value in zip(setters, row):
+            if setter is not None:
+                setter(obj, value)
+        for setter in missing:
+            setter(obj, None)
+        return obj
+    return build
+
+
+def to_row(obj, columns: Tuple[str, ...]) -> tuple:
+    """Return the values of `columns` of an object."""
+    return tuple([getattr(obj, name, None) for name in columns])
+
+
+def write(model_cls: type, objs: Iterable, f: BinaryIO):
+    """Write the objects of `model_cls` to the binary file `f`."""
+    columns = slot_names(model_cls)
+    rows = [to_row(obj, columns) for obj in objs]
+    f.write(HEADER.pack(MAGIC, VERSION, MARSHAL_VERSION))
+    # marshal.dump/load on a file object go through small buffered reads
+    # and writes, the in-memory variants are several times faster
+    f.write(marshal.dumps((model_cls.__name__, columns, rows),
+                          MARSHAL_VERSION))
+
+
+def read(model_cls: type, f: BinaryIO) -> Dict[str, object]:
+    """Read a snapshot of `model_cls` from `f` and return id -> object."""
+    header = f.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise SnapshotError("truncated snapshot header")
+    magic, version, marshal_version = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or \
+            marshal_version != MARSHAL_VERSION:
+        raise SnapshotError(f"unsupported snapshot {magic!r} v{version}")
+    s_class, columns, rows = marshal.loads(f.read())
+    if s_class != model_cls.__name__:
+        raise SnapshotError(f"snapshot of {s_class}, not "
+                            f"{model_cls.__name__}")
+
+    build = row_builder(model_cls, columns)
+    id_pos = columns.index('id')
+    return {row[id_pos]: build(row) for row in rows}
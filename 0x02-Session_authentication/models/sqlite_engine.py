@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""SQLite storage engine: one table per model class in a WAL database."""
+from os import fsync, getenv, replace
+from itertools import islice
+import json
+import sqlite3
+from threading import Lock, local
+from typing import Dict, List, Optional, Tuple
+
+from models import query
+
+
+class SQLiteEngine:
+    """Stores objects as JSON rows, with a real column per indexed attribute.
+
+    Each table has an `id` primary key, the serialized object in `data`
+    and one indexed column for every attribute listed in the model's
+    `__indexes__` or `__sorted__`, so search() on those attributes is an
+    index lookup and query() a range scan of the index.
+    Every thread gets its own connection; WAL mode lets readers proceed
+    while another connection (or process) writes.
+    """
+
+    def __init__(self, db_path: str = '.db_models.sqlite3',
+                 durability: str = 'os'):
+        """Initialize the engine (connections are opened lazily).
+
+        Args:
+            db_path (str): SQLite database file.
+            durability (str): "fsync" uses synchronous=FULL, anything
+                else synchronous=NORMAL (safe with WAL, not fsynced per
+                commit).
+        """
+        self.db_path = db_path
+        self.durability = durability
+        self._local = local()
+        self._lock = Lock()
+        # class name -> prepared SQL statements of its table
+        self._sql: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def from_env(cls) -> 'SQLiteEngine':
+        """Build the engine from MODELS_SQLITE_PATH/MODELS_DURABILITY."""
+        return cls(getenv('MODELS_SQLITE_PATH', '.db_models.sqlite3'),
+                   getenv('MODELS_DURABILITY', 'os'))
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return the connection of the calling thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None,
+                                   check_same_thread=False, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous={}'.format(
+                'FULL' if self.durability == 'fsync' else 'NORMAL'))
+            self._local.conn = conn
+        return conn
+
+    def register(self, model_cls: type):
+        """Create the table, indexed columns and statements of a class."""
+        s_class = model_cls.__name__
+        if s_class in self._sql:
+            return
+        with self._lock:
+            if s_class in self._sql:
+                return
+            conn = self._conn()
+            table = f'"{s_class}"'
+            cols = self.columns(model_cls)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                         '(id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            existing = {row[1] for row in
+                        conn.execute(f'PRAGMA table_info({table})')}
+            added = [col for col in cols if col not in existing]
+            for col in cols:
+                if col in added:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN "{col}"')
+                conn.execute(f'CREATE INDEX IF NOT EXISTS '
+                             f'"ix_{s_class}_{col}" ON {table} ("{col}")')
+            names = ', '.join(['id', 'data'] + [f'"{c}"' for c in cols])
+            marks = ', '.join('?' * (len(cols) + 2))
+            updates = ', '.join(['data = excluded.data'] +
+                                [f'"{c}" = excluded."{c}"' for c in cols])
+            self._sql[s_class] = {
+                'table': table,
+                'upsert': f'INSERT INTO {table} ({names}) VALUES ({marks}) '
+                          f'ON CONFLICT(id) DO UPDATE SET {updates}',
+                'delete': f'DELETE FROM {table} WHERE id = ?',
+                'get': f'SELECT data FROM {table} WHERE id = ?',
+                'count': f'SELECT COUNT(*) FROM {table}',
+                'all': f'SELECT data FROM {table} ORDER BY rowid',
+                'first': f'SELECT data FROM {table} ORDER BY id LIMIT ?',
+                'page': f'SELECT data FROM {table} WHERE id > ? '
+                        'ORDER BY id LIMIT ?',
+            }
+        if added:
+            self._backfill(model_cls, added)
+
+    @staticmethod
+    def columns(model_cls: type) -> Tuple[str, ...]:
+        """Return the indexed columns of a class."""
+        return tuple(dict.fromkeys(model_cls.__indexes__ +
+                                   model_cls.__sorted__))
+
+    def _backfill(self, model_cls: type, cols: List[str]):
+        """Fill new indexed columns from the stored objects."""
+        table = self._sql[model_cls.__name__]['table']
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            objs = [model_cls(**json.loads(row[0])) for row in
+                    conn.execute(f'SELECT data FROM {table}')]
+            sets = ', '.join(f'"{col}" = ?' for col in cols)
+            conn.executemany(
+                f'UPDATE {table} SET {sets} WHERE id = ?',
+                [[getattr(obj, col, None) for col in cols] + [obj.id]
+                 for obj in objs])
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _statements(self, model_cls: type) -> Dict[str, str]:
+        """Return the statements of a class, creating its table if needed."""
+        sql = self._sql.get(model_cls.__name__)
+        if sql is None:
+            self.register(model_cls)
+            sql = self._sql[model_cls.__name__]
+        return sql
+
+    def load(self, model_cls: type):
+        """Nothing to load: rows are read on demand."""
+        self.register(model_cls)
+
+    def save_to_file(self, model_cls: type):
+        """Nothing to write: every change is committed immediately."""
+        self.register(model_cls)
+
+    def save(self, obj):
+        """Insert or update the row of an object."""
+        model_cls = obj.__class__
+        params = [obj.id, json.dumps(obj.to_json(True))]
+        params += [getattr(obj, c, None) for c in self.columns(model_cls)]
+        self._conn().execute(self._statements(model_cls)['upsert'], params)
+
+    def remove(self, obj):
+        """Delete the row of an object."""
+        self._conn().execute(self._statements(obj.__class__)['delete'],
+                             (obj.id,))
+
+    def _transaction(self, statement: str, params: List):
+        """Run a statement for every parameter set in one transaction."""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(statement, params)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def save_many(self, model_cls: type, objs: List):
+        """Insert or update the rows of several objects in one transaction."""
+        cols = self.columns(model_cls)
+        self._transaction(self._statements(model_cls)['upsert'], [
+            [obj.id, json.dumps(obj.to_json(True))] +
+            [getattr(obj, c, None) for c in cols] for obj in objs])
+
+    def remove_many(self, model_cls: type, ids: List[str]):
+        """Delete the rows of several objects in one transaction."""
+        self._transaction(self._statements(model_cls)['delete'],
+                          [(obj_id,) for obj_id in ids])
+
+    def snapshot(self, model_cls: type, file_path: str):
+        """Write a point-in-time copy of the class as a JSON data file.
+
+        The rows are read in one read transaction: with WAL it sees a
+        single state of the table and does not block writers.
+        """
+        sql = self._statements(model_cls)
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            rows = conn.execute(f'SELECT id, data FROM {sql["table"]} '
+                                'ORDER BY rowid').fetchall()
+        finally:
+            conn.execute('COMMIT')
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('{' + ', '.join(f'{json.dumps(obj_id)}: {data}'
+                                    for obj_id, data in rows) + '}')
+            if self.durability == 'fsync':
+                f.flush()
+                fsync(f.fileno())
+        replace(tmp_path, file_path)
+
+    def export_json(self, model_cls: type, file_path: str = None):
+        """Write all objects of the class as JSON (to .db_<cls>.json by
+        default); snapshots are JSON already."""
+        self.snapshot(model_cls, file_path or self.snapshot_name(model_cls))
+
+    @staticmethod
+    def snapshot_name(model_cls: type) -> str:
+        """Return the file name of a snapshot of the class."""
+        return f".db_{model_cls.__name__}.json"
+
+    def count(self, model_cls: type) -> int:
+        """Count the rows of the class."""
+        sql = self._statements(model_cls)['count']
+        return self._conn().execute(sql).fetchone()[0]
+
+    def get(self, model_cls: type, obj_id: str):
+        """Return one object by ID."""
+        sql = self._statements(model_cls)['get']
+        row = self._conn().execute(sql, (obj_id,)).fetchone()
+        return model_cls(**json.loads(row[0])) if row else None
+
+    def page(self, model_cls: type, after: Optional[str],
+             limit: int) -> List:
+        """Return up to `limit` objects in id order, after the id `after`.
+
+        The range is read from the primary key index.
+        """
+        sql = self._statements(model_cls)
+        if after is None:
+            rows = self._conn().execute(sql['first'], (limit,))
+        else:
+            rows = self._conn().execute(sql['page'], (after, limit))
+        return [model_cls(**json.loads(row[0])) for row in rows]
+
+    def search(self, model_cls: type, attributes: dict) -> List:
+        """Return the objects whose attributes match.
+
+        Indexed attributes are filtered by SQLite, the others in Python.
+        """
+        sql = self._statements(model_cls)
+        indexed = [k for k in attributes if k in model_cls.__indexes__]
+        if indexed:
+            where = ' AND '.join(f'"{k}" IS ?' for k in indexed)
+            rows = self._conn().execute(
+                f'SELECT data FROM {sql["table"]} WHERE {where} '
+                'ORDER BY rowid', [attributes[k] for k in indexed])
+        else:
+            rows = self._conn().execute(sql['all'])
+        objs = (model_cls(**json.loads(row[0])) for row in rows)
+        return [obj for obj in objs
+                if all(getattr(obj, k) == v for k, v in attributes.items())]
+
+    def query(self, model_cls: type, prefix: Dict[str, str],
+              ranges: Dict[str, Tuple], order_by: str = 'id',
+              reverse: bool = False, limit: Optional[int] = None) -> List:
+        """Return the objects matching prefix and range predicates.
+
+        Predicates and ordering on indexed columns run in SQLite; when
+        every one of them does, so does the limit.
+        """
+        sql = self._statements(model_cls)
+        cols = self.columns(model_cls)
+        where, params = [], []
+        for attr, start in prefix.items():
+            if attr in cols:
+                where.append(f'"{attr}" >= ?')
+                params.append(start)
+                end = query.successor(start)
+                if end is not None:
+                    where.append(f'"{attr}" < ?')
+                    params.append(end)
+        for attr, (low, high) in ranges.items():
+            if attr in cols:
+                where.append(f'"{attr}" IS NOT NULL')
+                for op, bound in (('>=', low), ('<', high)):
+                    if bound is not None:
+                        where.append(f'"{attr}" {op} ?')
+                        params.append(bound)
+        in_sql = order_by == 'id' or order_by in cols
+        all_sql = in_sql and all(attr in cols for attr in
+                                 list(prefix) + list(ranges))
+        statement = f'SELECT data FROM {sql["table"]}'
+        if where:
+            statement += ' WHERE ' + ' AND '.join(where)
+        if in_sql:
+            desc = ' DESC' if reverse else ''
+            statement += ' ORDER BY ' + (
+                f'id{desc}' if order_by == 'id' else
+                f'"{order_by}" IS NULL, "{order_by}"{desc}, id{desc}')
+        if all_sql and limit is not None:
+            statement += ' LIMIT ?'
+            params.append(limit)
+        rows = self._conn().execute(statement, params)
+        match = query.matcher(prefix, ranges)
+        objs = filter(match, (model_cls(**json.loads(row[0]))
+                              for row in rows))
+        if in_sql:
+            return list(islice(objs, limit))
+        return query.ordered(objs, order_by, reverse, limit)
+
+    def flush(self) -> int:
+        """Nothing is buffered."""
+        return 0
+
+    def close(self):
+        """Close the connection of the calling thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
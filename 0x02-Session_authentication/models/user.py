@@ -7,6 +7,11 @@ from models.base import Base
 class User(Base):
     """User class"""
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    __fields__ = Base.__fields__ + __slots__
+    __indexes__ = ('email',)
+    __sorted__ = Base.__sorted__ + ('email',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a User instance"""
         super().__init__(*args, **kwargs)
@@ -8,6 +8,10 @@ class UserSession(Base):
     """User session class.
     """
 
+    __slots__ = ('user_id', 'session_id')
+    __fields__ = Base.__fields__ + __slots__
+    __indexes__ = ('session_id',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initializes a User session instance.
         """
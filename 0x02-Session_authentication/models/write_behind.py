@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Write-behind flusher coalescing model saves into batched file writes."""
+import logging
+from os import getenv
+from threading import Condition, Lock, Thread
+from time import monotonic, perf_counter
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindFlusher:
+    """Background thread persisting dirty model classes in batches.
+
+    `save()`/`remove()` mark a class dirty instead of rewriting its file.
+    The flusher waits until either `interval` seconds have passed since the
+    first pending change or `max_ops` changes are pending, then calls
+    `save_to_file()` once for every dirty class. A class whose save fails
+    is logged and stays dirty, to be saved again one interval later.
+    """
+
+    def __init__(self, interval: float = 0.05, max_ops: int = 1000):
+        """Initialize a flusher (the thread starts on the first change)."""
+        self.interval = interval
+        self.max_ops = max_ops
+        self._cond = Condition()
+        self._flush_lock = Lock()
+        self._dirty: Dict[str, type] = {}
+        self._pending_ops = 0
+        self._first_dirty_at = None
+        self._closed = False
+        self._thread: Optional[Thread] = None
+        self.flushes = 0
+        self.last_batch_size = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['WriteBehindFlusher']:
+        """Build a flusher from MODELS_WRITE_BEHIND* env vars, or None."""
+        if getenv('MODELS_WRITE_BEHIND', '0').lower() not in ('1', 'true'):
+            return None
+        interval_ms = float(getenv('MODELS_FLUSH_INTERVAL_MS', 50))
+        max_ops = int(getenv('MODELS_FLUSH_MAX_OPS', 1000))
+        return cls(interval_ms / 1000, max_ops)
+
+    def mark_dirty(self, model_cls: type):
+        """Record one pending change for `model_cls`."""
+        with self._cond:
+            if self._closed:
+                model_cls.save_to_file()
+                return
+            first = not self._dirty
+            if first:
+                self._first_dirty_at = monotonic()
+            self._dirty[model_cls.__name__] = model_cls
+            self._pending_ops += 1
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True,
+                                      name='models-write-behind')
+                self._thread.start()
+            # Wake the idle thread to time the batch, or to write a full one
+            if first or self._pending_ops >= self.max_ops:
+                self._cond.notify()
+
+    def _run(self):
+        """Flusher thread loop."""
+        try:
+            while True:
+                with self._cond:
+                    while not self._dirty and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    while self._pending_ops < self.max_ops and \
+                            not self._closed:
+                        remaining = self._first_dirty_at + self.interval - \
+                            monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                self.flush()
+        finally:
+            # The next change starts a new thread if this one died
+            with self._cond:
+                self._thread = None
+
+    def flush(self) -> int:
+        """Persist every dirty class now; return the number of ops flushed."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._dirty = self._dirty, {}
+                ops, self._pending_ops = self._pending_ops, 0
+            if not batch:
+                return 0
+            start = perf_counter()
+            failed: Dict[str, type] = {}
+            for name, model_cls in batch.items():
+                try:
+                    model_cls.save_to_file()
+                except Exception:
+                    logger.exception('write-behind flush of %s failed', name)
+                    failed[name] = model_cls
+            latency = perf_counter() - start
+            if failed:
+                with self._cond:
+                    self.errors += len(failed)
+                    # Retried one interval from now, not in a busy loop
+                    if not self._dirty:
+                        self._first_dirty_at = monotonic()
+                    for name, model_cls in failed.items():
+                        self._dirty.setdefault(name, model_cls)
+                    self._pending_ops += len(failed)
+                ops -= len(failed)
+            self.flushes += 1
+            self.last_batch_size = ops
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            return ops
+
+    def close(self):
+        """Stop the flusher thread and persist what is still pending."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def stats(self) -> dict:
+        """Return batch size and latency figures of the flusher."""
+        with self._cond:
+            pending = self._pending_ops
+        return {
+            'pending_ops': pending,
+            'flushes': self.flushes,
+            'last_batch_size': self.last_batch_size,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency,
+            'errors': self.errors,
+        }
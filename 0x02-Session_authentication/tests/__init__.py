@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Tests of the concurrency, invalidation and failure paths of the API
+"""
+import time
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    """Poll a condition until it holds or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def make_user(email: str = 'bob@hbtn.io', password: str = 'pwd'):
+    """Save a user with an email and a password; return it."""
+    from models.user import User
+
+    user = User(email=email)
+    user.password = password
+    user.save()
+    return user
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Fixtures shared by the tests
+"""
+import bcrypt
+import pytest
+
+from api.v1 import app as api
+from api.v1 import views
+from api.v1.auth import registry
+from api.v1.auth.config import AuthConfig
+from models import base
+from models.json_engine import JSONEngine
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Return a function making a storage engine the store of the models,
+    with the data files in a fresh directory; the engines are closed
+    afterwards."""
+    monkeypatch.chdir(tmp_path)
+    engines = []
+
+    def install(engine):
+        monkeypatch.setattr(base, 'STORAGE', engine)
+        engines.append(engine)
+        return engine
+
+    yield install
+    for engine in engines:
+        engine.close()
+
+
+@pytest.fixture
+def client(storage, monkeypatch):
+    """Return a function giving a test client of the API, authenticating
+    with the settings of some env vars, over an empty JSON model store.
+
+    Passwords are hashed with the fewest bcrypt rounds.
+    """
+    storage(JSONEngine())
+    gensalt = bcrypt.gensalt
+    monkeypatch.setattr(bcrypt, 'gensalt', lambda: gensalt(4))
+
+    def make(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        config = AuthConfig.from_env()
+        monkeypatch.setattr(api, 'config', config)
+        monkeypatch.setattr(api, 'auth', registry.create(config))
+        monkeypatch.setattr(views, '_users_loaded', False)
+        return api.app.test_client()
+    return make
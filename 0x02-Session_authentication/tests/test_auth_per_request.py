@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Tests of the authentication computed once per request
+"""
+from api.v1 import app as api
+from tests import make_user
+
+
+def logged_in(client, **env):
+    """Return a test client of a session app, logged in; and the list
+    of the user lookups made by its requests."""
+    test = client(AUTH_TYPE='session_auth', SESSION_NAME='sid', **env)
+    make_user()
+    assert test.post('/api/v1/auth_session/login',
+                     data={'email': 'bob@hbtn.io',
+                           'password': 'pwd'}).status_code == 200
+    lookups = []
+    current_user = api.auth.current_user
+
+    def counted(request=None):
+        lookups.append(request)
+        return current_user(request)
+    api.auth.current_user = counted
+    return test, lookups
+
+
+def test_user_looked_up_once_per_request(client):
+    """The app and the view share one lookup of the user per request."""
+    test, lookups = logged_in(client)
+    for expected in (1, 2):
+        response = test.get('/api/v1/users/me')
+        assert response.status_code == 200
+        assert len(lookups) == expected
+    assert 'Server-Timing' not in response.headers
+
+
+def test_server_timing_header(client):
+    """With AUTH_SERVER_TIMING the time of each phase is reported."""
+    test, _ = logged_in(client, AUTH_SERVER_TIMING='1')
+    response = test.get('/api/v1/users/me')
+    phases = dict(entry.strip().split(';dur=') for entry in
+                  response.headers['Server-Timing'].split(','))
+    assert set(phases) == {'auth_header', 'auth_cookie', 'auth_user'}
+    assert all(float(duration) >= 0 for duration in phases.values())
+    # Nothing to report for paths needing no authentication
+    assert 'Server-Timing' not in test.get('/api/v1/status').headers
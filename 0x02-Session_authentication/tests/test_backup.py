@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+"""Tests of the backup of the model classes
+"""
+from models.backup import model_classes
+
+
+def test_every_model_class_is_backed_up():
+    """Model classes are found without being imported beforehand."""
+    names = {model_cls.__name__ for model_cls in model_classes()}
+    assert {'User', 'UserSession', 'ApiToken'} <= names
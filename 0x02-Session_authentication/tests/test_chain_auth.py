@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Tests of the chained authentication
+"""
+import base64
+
+from api.v1 import app as api
+from tests import make_user
+
+
+def basic(email: str = 'bob@hbtn.io', password: str = 'pwd') -> dict:
+    """Return the Basic Authorization header of credentials."""
+    return {'Authorization': 'Basic ' + base64.b64encode(
+        '{}:{}'.format(email, password).encode()).decode()}
+
+
+def login(client, email: str = 'bob@hbtn.io', password: str = 'pwd'):
+    """Log in through the session view."""
+    return client.post('/api/v1/auth_session/login',
+                       data={'email': email, 'password': password})
+
+
+def chain(client, backends: str):
+    """Return a test client of an app chaining some backends."""
+    return client(AUTH_TYPE='chain_auth', AUTH_CHAIN=backends,
+                  SESSION_NAME='sid')
+
+
+def test_backends_are_tried_cheapest_first(client):
+    """The backends run by cost, equal costs in the order given."""
+    chain(client, 'basic_auth,session_db_auth,session_auth,token_auth')
+    assert [type(b).__name__ for b in api.auth.backends] == \
+        ['SessionAuth', 'TokenAuth', 'SessionDBAuth', 'BasicAuth']
+
+
+def test_backends_without_credentials_are_skipped(client):
+    """A backend is only tried when the request has its credential, and
+    the first one finding a user ends the chain."""
+    test = chain(client, 'basic_auth,session_auth')
+    make_user()
+    assert test.get('/api/v1/users/me', headers=basic()).status_code == 200
+    stats = api.auth.stats()
+    assert stats['SessionAuth']['skips'] == 1
+    assert stats['BasicAuth']['hits'] == 1
+    assert login(test).status_code == 200
+    # The session is found: the wrong password is never checked
+    response = test.get('/api/v1/users/me', headers=basic(password='bad'))
+    assert response.status_code == 200
+    stats = api.auth.stats()
+    assert stats['SessionAuth']['hits'] == 1
+    assert stats['BasicAuth']['hits'] == 1
+    assert stats['BasicAuth']['misses'] == 0
+
+
+def test_no_credentials_and_wrong_ones(client):
+    """No credential at all is 401, credentials nobody accepts 403."""
+    test = chain(client, 'basic_auth,session_auth')
+    make_user()
+    assert test.get('/api/v1/users/me').status_code == 401
+    response = test.get('/api/v1/users/me', headers=basic(password='bad'))
+    assert response.status_code == 403
+    stats = api.auth.stats()
+    # The request without credentials was refused before the chain
+    assert stats['BasicAuth']['misses'] == 1
+    assert stats['SessionAuth']['skips'] == 1
+
+
+def test_login_and_logout_use_the_first_session_backend(client):
+    """Sessions are created and destroyed by the first backend able to,
+    in the order of the chain."""
+    test = chain(client, 'basic_auth,session_exp_auth,session_auth')
+    session_backend = api.auth.backends[0]
+    assert type(session_backend).__name__ == 'SessionExpAuth'
+    user = make_user()
+    assert login(test).status_code == 200
+    session_id = test.get_cookie('sid').value
+    assert session_backend.user_id_for_session_id(session_id) == user.id
+    assert api.auth.backends[1].user_id_for_session_id(session_id) is None
+    assert test.get('/api/v1/users/me').json['id'] == user.id
+    assert test.delete('/api/v1/auth_session/logout').status_code == 200
+    assert session_backend.user_id_for_session_id(session_id) is None
+    assert test.get('/api/v1/users/me').status_code == 403
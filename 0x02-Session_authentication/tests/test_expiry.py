@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Tests of the timer wheel and the expiry sweeper
+"""
+import sqlite3
+import time
+
+from api.v1.auth.expiry import ExpirySweeper, TimerWheel
+from api.v1.auth.session_store import MemorySessionStore
+from tests import wait_for
+
+
+def wheel_at(start: float, resolution: float = 1.0,
+             slots: int = 8) -> TimerWheel:
+    """Return an empty wheel whose last swept tick precedes `start`."""
+    wheel = TimerWheel(resolution, slots)
+    wheel._cursor = wheel._tick(start) - 1
+    return wheel
+
+
+def test_wheel_returns_keys_once_expired():
+    """A key is returned after its expiry, once, and not before."""
+    wheel = wheel_at(100.0)
+    wheel.schedule('a', 101.5)
+    wheel.schedule('b', 103.2)
+    assert wheel.advance(101.9) == []
+    assert wheel.advance(102.0) == ['a']
+    assert wheel.advance(102.5) == []
+    assert wheel.advance(104.0) == ['b']
+    assert len(wheel) == 0
+
+
+def test_wheel_reschedule_and_cancel():
+    """Scheduling again moves a key, cancelling drops it."""
+    wheel = wheel_at(100.0)
+    wheel.schedule('a', 101.5)
+    wheel.schedule('a', 105.5)
+    wheel.schedule('b', 101.5)
+    assert wheel.cancel('b') and not wheel.cancel('b')
+    assert wheel.advance(103.0) == []
+    assert wheel.advance(106.0) == ['a']
+
+
+def test_wheel_keeps_keys_of_later_turns():
+    """A key beyond one turn of the wheel waits for its own turn."""
+    wheel = wheel_at(100.0, slots=4)
+    wheel.schedule('late', 109.5)
+    wheel.schedule('soon', 101.5)
+    assert wheel.advance(106.0) == ['soon']
+    assert wheel.advance(110.0) == ['late']
+
+
+def test_wheel_limit_and_backlog():
+    """advance() stops at its limit and backlog() counts the rest."""
+    wheel = wheel_at(100.0)
+    for i in range(10):
+        wheel.schedule('k{}'.format(i), 100.5)
+    assert len(wheel.advance(102.0, limit=4)) == 4
+    assert wheel.backlog(102.0) == 6
+    assert len(wheel.advance(102.0)) == 6
+    assert wheel.backlog(102.0) == 0
+
+
+def test_sweeper_survives_failing_sweeps():
+    """A failing sweep is counted and the thread keeps sweeping."""
+    calls = []
+
+    def sweep(limit):
+        calls.append(limit)
+        if len(calls) <= 2:
+            raise sqlite3.OperationalError('database is locked')
+        return 1, 0
+
+    sweeper = ExpirySweeper(sweep, interval=0.01)
+    sweeper.start()
+    assert wait_for(lambda: sweeper.stats()['swept'] >= 2)
+    assert sweeper.stats()['errors'] == 2
+    assert sweeper._thread is not None
+    sweeper.close()
+
+
+def test_store_sweeps_sessions_nobody_looks_up():
+    """Expired sessions leave the store without a lookup."""
+    store = MemorySessionStore(ttl=0.05, sweep_interval=0.02)
+    for i in range(100):
+        store['s{}'.format(i)] = i
+    store.set('forever', 1, ttl=0)
+    assert wait_for(lambda: len(store) == 1)
+    stats = store.stats()
+    assert stats['swept'] == 100 and stats['backlog'] == 0
+    assert stats['expirations'] == 100
+    assert store.get('forever') == 1
+    store.close()
+
+
+def test_store_keeps_wheel_in_step():
+    """Deleted, evicted and refreshed sessions are not swept."""
+    store = MemorySessionStore(max_entries=2, ttl=0.1, sweep_interval=0.01)
+    store['a'], store['b'] = 1, 2
+    del store['a']
+    # Evicts b
+    store['c'], store['d'] = 3, 4
+    assert len(store._wheel) == 2
+    time.sleep(0.05)
+    store['d'] = 5
+    assert wait_for(lambda: store.stats()['swept'] == 1)
+    assert store.get('c') is None and store.get('d') == 5
+    assert len(store._wheel) == 1
+    store.close()
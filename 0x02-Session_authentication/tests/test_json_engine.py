@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Tests of the coherence of JSON-engine workers sharing a journal
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from models.json_engine import JSONEngine
+from models.user_session import UserSession
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch) -> list:
+    """Return two multiprocess engines over the same files, as worker
+    processes open them (each has its own objects and journal state)."""
+    monkeypatch.chdir(tmp_path)
+    engines = [JSONEngine(multiprocess=True) for _ in range(2)]
+    for engine in engines:
+        engine.load(UserSession)
+    yield engines
+    for engine in engines:
+        engine.close()
+
+
+def session(session_id: str, user_id: str = 'u1') -> UserSession:
+    """Return a user session."""
+    return UserSession(id=session_id, session_id=session_id, user_id=user_id)
+
+
+def test_save_seen_by_other_worker(workers):
+    """An object saved by a worker is found by another, indexes
+    included."""
+    a, b = workers
+    a.save(session('s1'))
+    assert b.get(UserSession, 's1').user_id == 'u1'
+    assert [obj.id for obj in b.search(UserSession, {'session_id': 's1'})] \
+        == ['s1']
+
+
+def test_update_and_remove_seen_by_other_worker(workers):
+    """Replaced and removed objects are replaced and removed in the other
+    workers."""
+    a, b = workers
+    a.save(session('s1'))
+    a.save(session('s2'))
+    assert b.count(UserSession) == 2
+    b.save(session('s1', 'u2'))
+    b.remove(b.get(UserSession, 's2'))
+    assert a.get(UserSession, 's1').user_id == 'u2'
+    assert a.get(UserSession, 's2') is None
+    assert a.search(UserSession, {'session_id': 's2'}) == []
+
+
+def test_compaction_reloads_other_workers(workers):
+    """A worker whose journal was folded into a snapshot by another
+    reloads the snapshot, then reads the journal tail."""
+    a, b = workers
+    a.save(session('s1'))
+    assert b.count(UserSession) == 1
+    a.save_to_file(UserSession)
+    a.save(session('s2'))
+    assert os.path.getsize('.db_UserSession.journal') > 0
+    assert {obj.id for obj in b.search(UserSession, {})} == {'s1', 's2'}
+
+
+def test_journal_outgrowing_its_bound_is_compacted(tmp_path, monkeypatch):
+    """The journal is emptied once it outgrows `journal_max_bytes`, and
+    nothing is lost."""
+    monkeypatch.chdir(tmp_path)
+    a = JSONEngine(multiprocess=True, journal_max_bytes=1)
+    b = JSONEngine(multiprocess=True)
+    a.load(UserSession)
+    b.load(UserSession)
+    for i in range(3):
+        a.save(session('s{}'.format(i)))
+    assert os.path.getsize('.db_UserSession.journal') == 0
+    assert b.count(UserSession) == 3
+    a.close()
+    b.close()
+
+
+def test_save_of_other_process_seen(workers):
+    """An object saved by another process is found."""
+    a, _ = workers
+    code = ('from models.user_session import UserSession\n'
+            'UserSession(id="s1", session_id="s1", user_id="u9").save()\n')
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   env=dict(os.environ, PYTHONPATH=ROOT,
+                            MODELS_MULTIPROCESS='1'))
+    assert a.get(UserSession, 's1').user_id == 'u9'
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Tests of the lazy storage engine
+"""
+from models import base
+from models.json_engine import JSONEngine
+from models.lazy_engine import LazyEngine
+from models.user import User
+from models.write_behind import WriteBehindFlusher
+
+
+def users(count: int = 10) -> list:
+    """Return users with distinct emails and creation days."""
+    return [User(id='u{:02d}'.format(i),
+                 email='{}{}@example.com'.format('ab'[i % 2], i),
+                 first_name='F{}'.format(i % 3),
+                 created_at='2024-01-{:02d}T00:00:00'.format(i + 1))
+            for i in range(count)]
+
+
+def reopen(storage, **kwargs) -> LazyEngine:
+    """Close the lazy engine in use and map its files in a new one."""
+    base.STORAGE.close()
+    engine = storage(LazyEngine(**kwargs))
+    User.load_from_file()
+    return engine
+
+
+def test_round_trips_across_reopen(storage):
+    """Saved objects are found by id and by search once the files are
+    mapped again, and so are removals."""
+    storage(LazyEngine())
+    User.load_from_file()
+    for user in users(4):
+        user.save()
+    reopen(storage)
+    assert User.count() == 4
+    assert User.get('u01').email == 'b1@example.com'
+    assert [u.id for u in User.search({'email': 'a2@example.com'})] == \
+        ['u02']
+    assert sorted(u.id for u in User.search({'first_name': 'F0'})) == \
+        ['u00', 'u03']
+    User.get('u01').remove()
+    user = User.get('u02')
+    user.first_name = 'Changed'
+    user.save()
+    reopen(storage)
+    assert User.get('u01') is None
+    assert User.search({'email': 'b1@example.com'}) == []
+    assert User.get('u02').first_name == 'Changed'
+    assert User.count() == 3
+
+
+def test_evicted_objects_are_read_again(storage):
+    """Past the cache size the least recently used objects are evicted,
+    then hydrated again from the mapped file."""
+    storage(LazyEngine())
+    User.load_from_file()
+    User.save_many(users(5))
+    engine = reopen(storage, cache_size=2)
+    first = User.get('u00')
+    for i in range(1, 5):
+        assert User.get('u0{}'.format(i)).email.endswith(
+            '{}@example.com'.format(i))
+    cache = engine.stores['User'].cache
+    assert list(cache) == ['u03', 'u04']
+    again = User.get('u00')
+    assert again is not first and again.email == first.email
+    assert list(cache) == ['u04', 'u00']
+
+
+def test_compaction_merges_pending_changes(storage):
+    """Pending saves and removals are served from memory, then merged
+    into the data file by a rewrite."""
+    storage(LazyEngine())
+    User.load_from_file()
+    User.save_many(users(4))
+    flusher = WriteBehindFlusher(interval=3600, max_ops=1 << 30)
+    engine = reopen(storage, flusher=flusher)
+    store = engine.stores['User']
+    User.get('u00').remove()
+    new = User(id='u99', email='z@example.com')
+    new.save()
+    assert set(store.overlay) == {'u99'} and set(store.deleted) == {'u00'}
+    assert store.file.count == 4
+    assert User.count() == 4
+    assert User.get('u00') is None and User.get('u99') is new
+    User.save_to_file()
+    assert store.overlay == {} and store.deleted == {}
+    assert store.file.count == 4
+    assert store.file.find('id', 'u00') == []
+    assert sorted(u.id for u in User.search()) == \
+        ['u01', 'u02', 'u03', 'u99']
+
+
+def test_query_and_page_match_the_json_engine(storage):
+    """Queries and pages give the objects of the JSON engine, in the same
+    order, whether the objects are in the file or pending."""
+    cases = [
+        {'prefix': {'email': 'a'}},
+        {'prefix': {'email': 'b'}, 'order_by': 'email', 'reverse': True},
+        {'ranges': {'created_at': ('2024-01-03T00:00:00',
+                                   '2024-01-08T00:00:00')},
+         'order_by': 'created_at', 'limit': 3},
+        {'prefix': {'email': 'a'},
+         'ranges': {'created_at': ('2024-01-04T00:00:00', None)},
+         'order_by': 'first_name'},
+        {'ranges': {'created_at': (None, '2024-01-05T00:00:00')},
+         'reverse': True},
+    ]
+
+    def results():
+        found = [[u.id for u in User.query(**case)] for case in cases]
+        found.append([u.id for u in User.page(4)])
+        found.append([u.id for u in User.page(4, 'u03')])
+        found.append([u.id for u in User.iter_all(batch=3)])
+        return found
+
+    def change():
+        User.get('u05').remove()
+        User(id='u50', email='a50@example.com',
+             created_at='2024-01-06T12:00:00').save()
+
+    storage(JSONEngine())
+    User.load_from_file()
+    User.save_many(users())
+    change()
+    expected = results()
+    assert all(expected[:4]) and expected[-1]
+
+    storage(LazyEngine())
+    User.load_from_file()
+    User.save_many(users())
+    reopen(storage, flusher=WriteBehindFlusher(interval=3600,
+                                               max_ops=1 << 30))
+    change()
+    assert results() == expected
+    User.save_to_file()
+    assert results() == expected
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Tests of the session store partitioned across store nodes
+"""
+import pytest
+
+from api.v1.auth.partitioned_session_store import (HashRing,
+                                                   PartitionedSessionStore)
+from api.v1.auth.session_node import SessionNode
+
+SESSIONS = 200
+
+
+@pytest.fixture
+def nodes() -> list:
+    """Start four store nodes in this process; return them."""
+    started = [SessionNode().start() for _ in range(4)]
+    yield started
+    for node in started:
+        node.stop()
+
+
+def stored(nodes: list, session_id: str) -> list:
+    """Return the values of a session kept by the nodes."""
+    return [node.store[session_id] for node in nodes
+            if session_id in node.store]
+
+
+class ChangingClient:
+    """Client of a node running some writes right after each dump, as
+    requests served during a rebalance would."""
+
+    def __init__(self, client, writes):
+        """Wrap a node client."""
+        self.client = client
+        self.writes = writes
+
+    def call(self, request: dict) -> dict:
+        """Send a request and return its response."""
+        response = self.client.call(request)
+        if request['op'] == 'dump':
+            self.writes()
+        return response
+
+    def __getattr__(self, name):
+        """Pass the rest to the client."""
+        return getattr(self.client, name)
+
+
+def test_ring_gives_distinct_nodes():
+    """A key gets as many distinct nodes as asked, at most all of them."""
+    ring = HashRing(['a:1', 'b:1', 'c:1'])
+    assert sorted(ring.nodes_for('key', 3)) == ['a:1', 'b:1', 'c:1']
+    assert len(ring.nodes_for('key', 5)) == 3
+    assert ring.nodes_for('key', 1) == ring.nodes_for('key', 2)[:1]
+
+
+def test_sessions_kept_when_nodes_join_and_leave(nodes):
+    """Every session is found on its replicas after a node joins and
+    after one leaves."""
+    addresses = [node.address for node in nodes]
+    store = PartitionedSessionStore(addresses[:3], 2, ttl=3600)
+    for i in range(SESSIONS):
+        store.set('s{}'.format(i), i)
+    store.add_node(addresses[3])
+    assert store.stats()['moved'] > 0
+    store.remove_node(addresses[0])
+    assert len(nodes[0].store) == 0
+    for i in range(SESSIONS):
+        session_id = 's{}'.format(i)
+        assert store.get(session_id) == i
+        assert stored(nodes, session_id) == [i, i]
+
+
+def test_read_falls_back_when_a_node_is_down(nodes):
+    """A session is read from its other replica when a node is down."""
+    addresses = [node.address for node in nodes]
+    PartitionedSessionStore(addresses, 2, ttl=3600).set('s', 'u1')
+    store = PartitionedSessionStore(addresses, 2, ttl=3600)
+    down = nodes.pop(addresses.index(store.ring.nodes_for('s', 2)[0]))
+    down.stop()
+    assert store.get('s') == 'u1'
+    assert store.stats()['read_fallbacks'] == 1
+
+
+@pytest.mark.parametrize('change', ['add_node', 'remove_node'])
+def test_writes_during_rebalance_not_undone(nodes, change):
+    """Sessions deleted or replaced while a rebalance copies them stay
+    deleted or replaced."""
+    addresses = [node.address for node in nodes]
+    store = PartitionedSessionStore(addresses[:3], 2, ttl=3600)
+    for i in range(SESSIONS):
+        store.set('s{}'.format(i), i)
+
+    def writes():
+        # Logouts and updates served once the first dump is taken
+        if store._touched:
+            return
+        for i in range(SESSIONS):
+            if i % 2:
+                store.set('s{}'.format(i), -i)
+            else:
+                store.delete('s{}'.format(i))
+
+    clients = store._clients
+    for address in addresses:
+        clients[address] = ChangingClient(store._client(address), writes)
+    if change == 'add_node':
+        store.add_node(addresses[3])
+    else:
+        store.remove_node(addresses[0])
+    for i in range(SESSIONS):
+        session_id = 's{}'.format(i)
+        if i % 2:
+            assert store.get(session_id) == -i
+            assert set(stored(nodes, session_id)) == {-i}
+        else:
+            assert store.get(session_id) is None
+            assert stored(nodes, session_id) == []
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Tests of the compiled excluded paths of Auth.require_auth
+"""
+import pytest
+
+from api.v1.auth.auth import Auth
+from api.v1.auth.config import AuthConfig
+from api.v1.auth.paths import ExcludedPaths
+
+
+def legacy_require_auth(path: str, excluded_paths: list) -> bool:
+    """Auth.require_auth as it was before the paths were compiled: a
+    loop over the excluded paths."""
+    if not path:
+        return True
+    if not excluded_paths:
+        return True
+    path = path.rstrip("/")
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith("*") and \
+                path.startswith(excluded_path[:-1]):
+            return False
+        elif path == excluded_path.rstrip("/"):
+            return False
+    return True
+
+
+EXCLUDED = [
+    None,
+    [],
+    ['/api/v1/status/'],
+    ['/api/v1/status/', '/api/v1/unauthorized/', '/api/v1/forbidden/'],
+    ['/api/v1/stat*'],
+    ['/api/v1/users/*'],
+    ['/api/v1/users*', '/api/v1/status/'],
+    ['/api/v1/a.b*', '/api/v1/(x)/'],
+    ['/'],
+    ['*'],
+    ['/api/v1/status'],
+]
+
+PATHS = [
+    None, '', '/', '//', '/api/v1/status', '/api/v1/status/',
+    '/api/v1/status//', '/api/v1/statuses', '/api/v1/stats', '/api/v1/stat',
+    '/api/v1/users', '/api/v1/users/', '/api/v1/users/me', '/api/v1/usersx',
+    '/api/v1/a.b', '/api/v1/aXb', '/api/v1/a.bc/d', '/api/v1/(x)',
+    '/api/v1/x', '/api/v1/unauthorized', '/api/v1/forbidden/', '/other',
+]
+
+
+@pytest.mark.parametrize('excluded', EXCLUDED)
+@pytest.mark.parametrize('path', PATHS)
+def test_same_results_as_the_loop(path, excluded):
+    """Lists and compiled paths give the answers of the former loop."""
+    auth = Auth(AuthConfig())
+    expected = legacy_require_auth(path, excluded)
+    assert auth.require_auth(path, excluded) is expected
+    if excluded is not None:
+        assert auth.require_auth(path, ExcludedPaths(excluded)) is expected
+
+
+def test_compiled_paths_keep_the_list():
+    """The compiled paths iterate and count as the list they came from."""
+    paths = ['/api/v1/status/', '/api/v1/users/*']
+    compiled = ExcludedPaths(paths)
+    assert list(compiled) == paths and len(compiled) == 2
+    assert not ExcludedPaths()
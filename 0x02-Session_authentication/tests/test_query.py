@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Tests of the sorted indexes and of prefix/range queries
+"""
+import random
+
+import pytest
+
+from models.json_engine import JSONEngine
+from models.query import SortedIndex, successor
+from models.user import User
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Make the chunks of sorted indexes hold at most 4 entries."""
+    monkeypatch.setattr(SortedIndex, 'CHUNK', 2)
+
+
+def check(index: SortedIndex, entries: dict):
+    """Check an index against the id -> value pairs it should hold."""
+    expected = sorted((value, obj_id) for obj_id, value in entries.items()
+                      if value is not None)
+    assert list(index.iter_ids()) == [obj_id for _, obj_id in expected]
+    assert list(index.iter_ids(reverse=True)) == \
+        [obj_id for _, obj_id in reversed(expected)]
+    assert all(0 < len(ids) <= 2 * index.CHUNK for ids in index.ids)
+    assert index.maxes == [(keys[-1], ids[-1])
+                           for keys, ids in zip(index.keys, index.ids)]
+    assert set(index.nulls) == {obj_id for obj_id, value in entries.items()
+                                if value is None}
+    assert len(index) == len(entries)
+
+
+def test_successor():
+    """The successor of a prefix bounds the strings starting with it."""
+    assert successor('ab') == 'ac'
+    assert successor('a' + chr(0x10FFFF)) == 'b'
+    assert successor(chr(0x10FFFF)) is None
+    assert successor('') is None
+
+
+def test_chunks_split_as_entries_are_added(small_chunks):
+    """Entries added in any order stay sorted, in bounded chunks."""
+    rng = random.Random(1)
+    index, entries = SortedIndex(), {}
+    for i in range(60):
+        obj_id = 'id{:02d}'.format(i)
+        entries[obj_id] = rng.choice([None, rng.randrange(10)])
+        index.add(entries[obj_id], obj_id)
+        check(index, entries)
+    assert len(index.ids) > 5
+
+
+def test_bulk_build_is_chunked(small_chunks):
+    """An index built at once has the chunks and order of one built
+    entry by entry."""
+    entries = {'id{}'.format(i): i % 5 for i in range(11)}
+    entries['none'] = None
+    index = SortedIndex(entries)
+    assert [len(ids) for ids in index.ids] == [2, 2, 2, 2, 2, 1]
+    check(index, entries)
+
+
+def test_removal_across_chunk_boundaries(small_chunks):
+    """Removing the last entry of chunks, whole chunks and unknown
+    entries keeps the index consistent."""
+    entries = {'id{:02d}'.format(i): i // 3 for i in range(20)}
+    index = SortedIndex(entries)
+    last = [ids[-1] for ids in index.ids]
+    for obj_id in last[:3] + index.ids[4][:]:
+        index.remove(entries.pop(obj_id), obj_id)
+        check(index, entries)
+    index.remove(1, 'unknown')
+    index.remove(99, 'id00')
+    index.remove(None, 'unknown')
+    check(index, entries)
+    rng = random.Random(2)
+    for obj_id in rng.sample(sorted(entries), len(entries)):
+        index.remove(entries.pop(obj_id), obj_id)
+        check(index, entries)
+    assert index.maxes == [] and list(index.iter_ids()) == []
+
+
+@pytest.mark.parametrize('low, high', [
+    (None, None), (2, 5), (2, None), (None, 3), (3, 3), (5, 2), (-1, 100),
+    (10, None),
+])
+def test_spans(small_chunks, low, high):
+    """A span holds the entries of [low, high), in (value, id) order."""
+    entries = {'id{:02d}'.format(i): i % 7 for i in range(30)}
+    index = SortedIndex(entries)
+    expected = [obj_id for value, obj_id in
+                sorted((v, k) for k, v in entries.items())
+                if (low is None or value >= low) and
+                (high is None or value < high)]
+    span = index.span(low, high)
+    assert list(index.iter_ids(span)) == expected
+    assert list(index.iter_ids(span, reverse=True)) == expected[::-1]
+    assert index.size(span) == len(expected)
+
+
+def test_prefix_span(small_chunks):
+    """A prefix span holds the values starting with the prefix."""
+    values = ['a', 'ab', 'abc', 'abd', 'ac', 'b', 'ba', 'b' + chr(0x10FFFF)]
+    index = SortedIndex({'id{}'.format(i): v for i, v in enumerate(values)})
+    for prefix in ['a', 'ab', 'b', 'abc', 'z', '']:
+        found = [values[int(obj_id[2:])] for obj_id in
+                 index.iter_ids(index.prefix_span(prefix))]
+        assert found == sorted(v for v in values if v.startswith(prefix))
+
+
+def test_user_query(storage):
+    """Users are found by email prefix and creation range, in the order
+    and number asked."""
+    storage(JSONEngine())
+    User.load_from_file()
+    User.save_many(
+        User(id='u{}'.format(i), email=email, first_name=first_name,
+             created_at='2024-01-{:02d}T00:00:00'.format(i + 1))
+        for i, (email, first_name) in enumerate([
+            ('bob@a.io', 'Bob'), ('ann@a.io', None), ('bea@b.io', 'Bea'),
+            ('bill@a.io', None), ('al@b.io', 'Al'), ('ben@a.io', 'Ben')]))
+
+    def ids(**kwargs) -> list:
+        return [u.id for u in User.query(**kwargs)]
+
+    assert ids(prefix={'email': 'b'}) == ['u0', 'u2', 'u3', 'u5']
+    assert ids(prefix={'email': 'b'}, order_by='email') == \
+        ['u2', 'u5', 'u3', 'u0']
+    assert ids(prefix={'email': 'b'},
+               ranges={'created_at': ('2024-01-03T00:00:00',
+                                      '2024-01-06T00:00:00')},
+               order_by='created_at', reverse=True) == ['u3', 'u2']
+    assert ids(ranges={'created_at': ('2024-01-02T00:00:00', None)},
+               order_by='first_name') == ['u4', 'u2', 'u5', 'u1', 'u3']
+    assert ids(ranges={'created_at': (None, 1704326400)},
+               order_by='email', limit=2) == ['u1', 'u2']
+    assert ids(prefix={'email': 'bi', 'first_name': 'B'}) == []
+    assert ids(prefix={'email': 'z'}) == []
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Tests of the reader-writer lock of the model store
+"""
+from threading import Event, Thread
+
+from models.rwlock import RWLock
+from tests import wait_for
+
+
+def hold(lock: RWLock, mode: str, entered: list, release: Event) -> Thread:
+    """Start a thread holding the lock in a mode until `release` is set,
+    recording in `entered` when it got it."""
+    def run():
+        with getattr(lock, mode)():
+            entered.append(mode)
+            release.wait(5)
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_readers_share_the_lock():
+    """A reader gets the lock while another holds it."""
+    lock, entered, release = RWLock(), [], Event()
+    threads = [hold(lock, 'read', entered, release) for _ in range(2)]
+    assert wait_for(lambda: len(entered) == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_writer_waits_for_readers():
+    """A writer gets the lock only once the readers left."""
+    lock, entered, release = RWLock(), [], Event()
+    reader = hold(lock, 'read', entered, release)
+    assert wait_for(lambda: entered == ['read'])
+    writer = hold(lock, 'write', entered, Event())
+    assert wait_for(lambda: lock._waiting_writers == 1)
+    assert entered == ['read']
+    release.set()
+    reader.join()
+    writer.join(5)
+    assert entered == ['read', 'write']
+
+
+def test_waiting_writer_holds_back_new_readers():
+    """A reader coming after a waiting writer gets the lock after it."""
+    lock, entered = RWLock(), []
+    release_reader, release_writer = Event(), Event()
+    first = hold(lock, 'read', entered, release_reader)
+    assert wait_for(lambda: entered == ['read'])
+    writer = hold(lock, 'write', entered, release_writer)
+    assert wait_for(lambda: lock._waiting_writers == 1)
+    second = hold(lock, 'read', entered, Event())
+    release_reader.set()
+    first.join()
+    assert wait_for(lambda: entered == ['read', 'write'])
+    release_writer.set()
+    writer.join()
+    second.join(5)
+    assert entered == ['read', 'write', 'read']
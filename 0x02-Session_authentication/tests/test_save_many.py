@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Tests of the all-or-nothing batch saves and removals
+"""
+import pytest
+
+from models.json_engine import JSONEngine
+from models.user import User
+
+
+@pytest.fixture
+def saved(storage) -> list:
+    """Return users saved in a JSON engine writing every change through."""
+    storage(JSONEngine())
+    User.load_from_file()
+    users = [User(id='u{}'.format(i), email='u{}@example.com'.format(i),
+                  updated_at='2024-01-01T00:00:00') for i in range(3)]
+    User.save_many(users)
+    return users
+
+
+def fail_writes(monkeypatch):
+    """Make every write of a data file fail."""
+    def write(*args):
+        raise OSError('disk full')
+    monkeypatch.setattr(JSONEngine, '_write', write)
+
+
+def check_unchanged(users: list):
+    """Check that the objects, the indexes and the order are those of the
+    saved users."""
+    assert User.count() == 3
+    for user in users:
+        assert User.get(user.id) is user
+        assert User.search({'email': user.email}) == [user]
+    assert [u.id for u in User.query(prefix={'email': 'u'},
+                                     order_by='email')] == \
+        ['u0', 'u1', 'u2']
+    assert [u.id for u in User.page(10)] == ['u0', 'u1', 'u2']
+
+
+def test_failed_save_many_is_undone(saved, monkeypatch):
+    """A batch whose file write fails leaves the objects, the indexes and
+    the update times as they were."""
+    replacement = User(id='u1', email='new@example.com',
+                       updated_at='2024-02-01T00:00:00')
+    added = User(id='u9', email='u9@example.com',
+                 updated_at='2024-02-01T00:00:00')
+    stamps = [replacement._updated_at, added._updated_at]
+    fail_writes(monkeypatch)
+    with pytest.raises(OSError):
+        User.save_many([replacement, added])
+    check_unchanged(saved)
+    assert User.get('u9') is None
+    assert User.search({'email': 'new@example.com'}) == []
+    assert User.query(prefix={'email': 'new'}) == []
+    assert [replacement._updated_at, added._updated_at] == stamps
+
+
+def test_failed_remove_many_is_undone(saved, monkeypatch):
+    """A removal whose file write fails leaves every object in place."""
+    fail_writes(monkeypatch)
+    with pytest.raises(OSError):
+        User.remove_many(['u0', 'u2', 'unknown'])
+    check_unchanged(saved)
+
+
+def test_save_many_rejects_other_classes(saved):
+    """A batch holding an object of another class is refused whole."""
+    with pytest.raises(TypeError):
+        User.save_many([User(id='u9'), object()])
+    assert User.get('u9') is None
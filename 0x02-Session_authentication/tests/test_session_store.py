@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Tests of the in-process session store
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from api.v1.auth.config import AuthConfig
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_store import MemorySessionStore, SessionStore
+
+
+def test_incomplete_store_cannot_be_created():
+    """A store missing a method fails when created, not when used."""
+    class Incomplete(SessionStore):
+        def get(self, session_id, default=None):
+            return default
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_dict_operations():
+    """The store is used like a dict."""
+    store = MemorySessionStore()
+    store['a'] = 'user1'
+    assert store['a'] == 'user1' and 'a' in store and len(store) == 1
+    del store['a']
+    assert 'a' not in store
+    with pytest.raises(KeyError):
+        del store['a']
+    with pytest.raises(KeyError):
+        store['a']
+
+
+def test_lru_eviction():
+    """Storing beyond the bound evicts the least recently used session."""
+    store = MemorySessionStore(max_entries=2, sweep_interval=0)
+    store['a'], store['b'] = 1, 2
+    assert store.get('a') == 1
+    store['c'] = 3
+    assert 'b' not in store and store.get('a') == 1
+    assert store.stats()['evictions'] == 1
+
+
+def test_ttl_expiry_on_lookup():
+    """An expired session is gone without a sweeper."""
+    store = MemorySessionStore(ttl=0.05, sweep_interval=0)
+    store['a'] = 1
+    store.set('b', 2, ttl=0)
+    time.sleep(0.1)
+    assert store.get('a') is None and store.get('b') == 2
+    assert store.stats()['expirations'] == 1
+
+
+class VanishingStore(MemorySessionStore):
+    """Memory store whose sessions expire after some reads, as if the
+    sweeper ran between them."""
+
+    def __init__(self, reads: int):
+        super().__init__(sweep_interval=0)
+        self.reads = reads
+
+    def get(self, session_id, default=None):
+        value = super().get(session_id, default)
+        self.reads -= 1
+        if self.reads == 0:
+            self.delete(session_id)
+        return value
+
+
+def test_logout_of_a_session_expiring_meanwhile():
+    """A session gone between its lookup and its deletion is still
+    logged out, without KeyError."""
+    auth = SessionAuth(AuthConfig(session_name='sid'))
+    auth.user_id_by_session_id = VanishingStore(reads=2)
+    session_id = auth.create_session('abcde')
+    request = SimpleNamespace(cookies={'sid': session_id})
+    assert auth.destroy_session(request) is True
+    assert auth.user_id_for_session_id(session_id) is None
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Tests of the signed session cookies
+"""
+from flask import Flask, request
+
+from api.v1.auth import signed_session_auth
+from api.v1.auth.config import AuthConfig
+from api.v1.auth.signed_session_auth import SignedSessionAuth
+
+
+def auth(duration: int = 60) -> SignedSessionAuth:
+    """Return a backend signing with a fixed key."""
+    return SignedSessionAuth(AuthConfig(
+        auth_type='signed_session_auth', session_name='sid',
+        session_duration=duration, session_keys=[('k1', 'secret')]))
+
+
+def logout(backend: SignedSessionAuth, cookie: str) -> bool:
+    """Destroy the session of a cookie through a request."""
+    with Flask(__name__).test_request_context(
+            headers={'Cookie': 'sid=' + cookie}):
+        return backend.destroy_session(request)
+
+
+def test_no_session_store():
+    """The stateless backend builds no session store."""
+    assert auth().user_id_by_session_id is None
+
+
+def test_round_trip_and_tampering():
+    """A cookie is accepted until its payload or signature changes."""
+    backend = auth()
+    cookie = backend.create_session('user1')
+    assert backend.user_id_for_session_id(cookie) == 'user1'
+    kid, payload, signature = cookie.split('.')
+    assert backend.user_id_for_session_id(
+        '.'.join((kid, payload, signature[:-1] + 'A'))) is None
+    assert backend.user_id_for_session_id(
+        '.'.join((kid, payload[:-2], signature))) is None
+    assert backend.user_id_for_session_id('other.' + payload + '.' +
+                                          signature) is None
+
+
+def test_non_ascii_cookie_is_rejected():
+    """A non-ASCII signature is no session, not a TypeError."""
+    backend = auth()
+    assert backend.user_id_for_session_id('k1.eyJ9.é') is None
+    cookie = backend.create_session('user1')
+    assert backend.user_id_for_session_id(cookie + 'é') is None
+    with Flask(__name__).test_request_context(
+            headers={'Cookie': 'sid=k1.eyJ9.é'.encode().decode(
+                'latin-1')}):
+        cookie = backend.session_cookie(request)
+        assert cookie is not None and not cookie.isascii()
+        assert backend.user_id_for_session_id(cookie) is None
+
+
+def test_logout_revokes():
+    """A destroyed session is rejected, a second logout fails."""
+    backend = auth()
+    cookie = backend.create_session('user1')
+    assert logout(backend, cookie)
+    assert backend.user_id_for_session_id(cookie) is None
+    assert not logout(backend, cookie)
+
+
+def test_revocations_are_pruned_when_expired(monkeypatch):
+    """Revocations leave the set once their session expired."""
+    now = [1000000.0]
+    monkeypatch.setattr(signed_session_auth, 'time', lambda: now[0])
+    backend = auth(duration=10)
+    cookies = [backend.create_session('user{}'.format(i)) for i in range(5)]
+    for cookie in cookies:
+        assert logout(backend, cookie)
+    assert len(backend.revoked) == 5
+    # The first sessions expire, the next logout drops them
+    now[0] += 20
+    later = backend.create_session('user5')
+    assert logout(backend, later)
+    assert list(backend.revoked.values()) == [now[0] + 10]
+    assert len(backend._revoked_expiry) == 1
+
+
+def test_concurrent_logouts_revoke_once(monkeypatch):
+    """Two logouts of a cookie that both passed claims() revoke it once,
+    and its revocation is later pruned without error."""
+    now = [1000000.0]
+    monkeypatch.setattr(signed_session_auth, 'time', lambda: now[0])
+    backend = auth(duration=10)
+    cookie = backend.create_session('user1')
+    claims = backend.claims(cookie)
+    monkeypatch.setattr(backend, 'claims', lambda session_id: claims)
+    assert logout(backend, cookie)
+    assert not logout(backend, cookie)
+    assert len(backend._revoked_expiry) == 1
+    monkeypatch.undo()
+    monkeypatch.setattr(signed_session_auth, 'time', lambda: now[0])
+    now[0] += 20
+    assert logout(backend, backend.create_session('user2'))
+    assert len(backend.revoked) == 1
+
+
+def test_sessions_expire_without_duration(monkeypatch):
+    """With no SESSION_DURATION sessions expire after DEFAULT_DURATION,
+    so their revocations are pruned too."""
+    now = [1000000.0]
+    monkeypatch.setattr(signed_session_auth, 'time', lambda: now[0])
+    backend = auth(duration=0)
+    cookie = backend.create_session('user1')
+    assert backend.claims(cookie)['exp'] == \
+        now[0] + signed_session_auth.DEFAULT_DURATION
+    assert logout(backend, cookie)
+    now[0] += signed_session_auth.DEFAULT_DURATION
+    assert backend.user_id_for_session_id(cookie) is None
+    later = backend.create_session('user2')
+    assert logout(backend, later)
+    assert list(backend.revoked.values()) == [
+        now[0] + signed_session_auth.DEFAULT_DURATION]
+
+
+def test_cookie_without_expiry_is_rejected():
+    """A signed cookie without expiry, which could not be revoked for
+    good, is no session."""
+    backend = auth()
+    payload = signed_session_auth._b64encode(b'{"sub":"user1","jti":"j"}')
+    cookie = '.'.join(('k1', payload, backend._sign('k1', payload)))
+    assert backend.user_id_for_session_id(cookie) is None
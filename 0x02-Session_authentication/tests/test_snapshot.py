@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Tests of the binary snapshot format and of the JSON import/export
+"""
+import gc
+import io
+import json
+
+import pytest
+
+from models import snapshot
+from models.json_engine import JSONEngine
+from models.lazy_engine import LazyEngine
+from models.sqlite_engine import SQLiteEngine
+from models.user import User
+from models.user_session import UserSession
+
+
+def users(count: int = 3) -> list:
+    """Return users with distinct emails."""
+    return [User(id='u{}'.format(i), email='u{}@example.com'.format(i),
+                 first_name='F{}'.format(i),
+                 created_at='2024-01-0{}T00:00:00'.format(i + 1))
+            for i in range(count)]
+
+
+def test_round_trip():
+    """Objects read back have the slots they were written with, cached
+    JSON forms left out."""
+    objs = users()
+    objs[0].to_json()
+    f = io.BytesIO()
+    snapshot.write(User, objs, f)
+    f.seek(0)
+    read = snapshot.read(User, f)
+    assert sorted(read) == ['u0', 'u1', 'u2']
+    for obj in objs:
+        copy = read[obj.id]
+        assert copy.to_json(True) == obj.to_json(True)
+        assert copy._created_at == obj._created_at
+        assert copy._json_dict is None
+
+
+@pytest.mark.parametrize('header', [
+    snapshot.HEADER.pack(snapshot.MAGIC, snapshot.VERSION + 1,
+                         snapshot.MARSHAL_VERSION),
+    snapshot.HEADER.pack(snapshot.MAGIC, 0, snapshot.MARSHAL_VERSION),
+    snapshot.HEADER.pack(snapshot.MAGIC, snapshot.VERSION,
+                         snapshot.MARSHAL_VERSION - 1),
+    snapshot.HEADER.pack(b'NOTASNAP', snapshot.VERSION,
+                         snapshot.MARSHAL_VERSION),
+    snapshot.MAGIC[:4],
+])
+def test_unknown_headers_are_rejected(header):
+    """Other versions, other files and truncated headers are refused."""
+    f = io.BytesIO()
+    snapshot.write(User, users(), f)
+    data = f.getvalue()[snapshot.HEADER.size:]
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.read(User, io.BytesIO(header + data))
+
+
+def test_snapshot_of_another_class_is_rejected():
+    """A snapshot is only read back as its own class."""
+    f = io.BytesIO()
+    snapshot.write(User, users(), f)
+    f.seek(0)
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.read(UserSession, f)
+
+
+def test_json_store_migrates_to_binary(storage):
+    """A binary engine without a snapshot imports the JSON data file,
+    then writes and reloads the binary snapshot."""
+    storage(JSONEngine())
+    User.load_from_file()
+    User.save_many(users())
+    storage(JSONEngine(snapshot_format='binary'))
+    User.load_from_file()
+    assert sorted(u.id for u in User.search()) == ['u0', 'u1', 'u2']
+    assert [u.id for u in User.search({'email': 'u1@example.com'})] == \
+        ['u1']
+    User.save_to_file()
+    with open('.db_User.bin', 'rb') as f:
+        assert f.read(len(snapshot.MAGIC)) == snapshot.MAGIC
+    with open('.db_User.json', 'w') as f:
+        f.write('{}')
+    storage(JSONEngine(snapshot_format='binary'))
+    User.load_from_file()
+    assert User.get('u2').first_name == 'F2'
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_load_restores_the_collector(storage, monkeypatch, enabled):
+    """The collector is only off while decoding, and left as found."""
+    storage(JSONEngine(snapshot_format='binary'))
+    User.load_from_file()
+    User.save_many(users())
+    User.save_to_file()
+    states = []
+    build = JSONEngine._build_indexes
+    monkeypatch.setattr(JSONEngine, '_build_indexes', staticmethod(
+        lambda *args: states.append(gc.isenabled()) or build(*args)))
+    try:
+        if not enabled:
+            gc.disable()
+        User.load_from_file()
+        assert gc.isenabled() is enabled
+    finally:
+        gc.enable()
+    assert states == [enabled] and User.count() == 3
+
+
+@pytest.mark.parametrize('engine', [
+    lambda: JSONEngine(snapshot_format='binary'),
+    LazyEngine,
+    lambda: SQLiteEngine('models.db'),
+])
+def test_export_json(storage, engine):
+    """Every engine exports a JSON data file a JSON engine loads."""
+    storage(engine())
+    User.load_from_file()
+    User.save_many(users())
+    User.export_json()
+    with open('.db_User.json') as f:
+        assert sorted(json.load(f)) == ['u0', 'u1', 'u2']
+    User.export_json('users.json')
+    storage(JSONEngine())
+    User.load_from_file()
+    assert User.get('u1').email == 'u1@example.com'
+    with open('users.json') as f:
+        assert json.load(f)['u2']['first_name'] == 'F2'
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Tests of the SQLite storage engine
+"""
+import json
+
+import pytest
+
+from models import base
+from models.sqlite_engine import SQLiteEngine
+from models.user import User
+
+
+@pytest.fixture
+def sqlite_storage(storage, tmp_path, monkeypatch):
+    """Return a function opening the engine selected by MODELS_STORAGE,
+    SQLite over a fresh database."""
+    monkeypatch.setenv('MODELS_STORAGE', 'sqlite')
+    monkeypatch.setenv('MODELS_SQLITE_PATH', str(tmp_path / 'models.db'))
+
+    def open_engine() -> SQLiteEngine:
+        engine = storage(base._engine_from_env())
+        User.load_from_file()
+        return engine
+    return open_engine
+
+
+def test_crud_search_query_page_and_snapshot(sqlite_storage, tmp_path):
+    """Objects are stored, found, paged and snapshot, and survive a
+    reopen of the engine."""
+    assert isinstance(sqlite_storage(), SQLiteEngine)
+    for i in range(6):
+        User(id='u{}'.format(i),
+             email='{}{}@example.com'.format('ab'[i % 2], i),
+             first_name='F{}'.format(i % 2),
+             created_at='2024-01-0{}T00:00:00'.format(i + 1)).save()
+    user = User.get('u2')
+    user.last_name = 'Doe'
+    user.save()
+    User.get('u5').remove()
+
+    def check():
+        assert User.count() == 5
+        assert User.get('u2').last_name == 'Doe'
+        assert User.get('u5') is None
+        assert [u.id for u in User.search({'email': 'a4@example.com'})] == \
+            ['u4']
+        assert [u.id for u in User.search({'first_name': 'F1'})] == \
+            ['u1', 'u3']
+        assert [u.id for u in User.query(
+            prefix={'email': 'a'},
+            ranges={'created_at': ('2024-01-02T00:00:00', None)},
+            order_by='created_at', reverse=True)] == ['u4', 'u2']
+        assert [u.id for u in User.query(order_by='email', limit=2)] == \
+            ['u0', 'u2']
+        assert [u.id for u in User.page(2)] == ['u0', 'u1']
+        assert [u.id for u in User.page(2, 'u3')] == ['u4']
+
+    check()
+    User.snapshot(str(tmp_path / 'users.json'))
+    with open(tmp_path / 'users.json') as f:
+        saved = json.load(f)
+    assert sorted(saved) == ['u0', 'u1', 'u2', 'u3', 'u4']
+    assert saved['u2']['last_name'] == 'Doe'
+    base.STORAGE.close()
+    sqlite_storage()
+    check()
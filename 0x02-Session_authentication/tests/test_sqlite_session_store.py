@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Tests of the session store shared by the processes of a host
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from api.v1.auth import sqlite_session_store
+from api.v1.auth.sqlite_session_store import SQLiteSessionStore
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    """Return the path of a fresh session database."""
+    return str(tmp_path / 'sessions.db')
+
+
+def workers(db_path: str, count: int = 2) -> list:
+    """Return stores of the same database, as worker processes open it
+    (each has its own connections and cache)."""
+    return [SQLiteSessionStore(db_path, sweep_interval=0)
+            for _ in range(count)]
+
+
+def test_session_seen_by_other_worker(db_path):
+    """A session created by a worker is found, then cached, by another."""
+    a, b = workers(db_path)
+    b['s'] = {'user_id': 'u1'}
+    assert a.get('s') == {'user_id': 'u1'}
+    assert a.get('s') == {'user_id': 'u1'}
+    assert a.stats()['loads'] == 1 and a.stats()['hits'] == 1
+
+
+def test_logout_invalidates_other_caches(db_path):
+    """A session deleted by a worker leaves the cache of the others."""
+    a, b = workers(db_path)
+    b['s'] = 'u1'
+    assert a.get('s') == 'u1'
+    assert b.delete('s')
+    assert a.get('s') is None
+    assert a.stats()['invalidations'] == 1
+
+
+def test_overwrite_invalidates_other_caches(db_path):
+    """A session replaced by a worker is read again by the others."""
+    a, b = workers(db_path)
+    b['s'] = 'u1'
+    assert a.get('s') == 'u1'
+    b['s'] = 'u2'
+    assert a.get('s') == 'u2'
+
+
+def test_logout_after_log_trimmed(db_path, monkeypatch):
+    """A worker that missed trimmed changes drops its whole cache."""
+    a, b = workers(db_path)
+    b['s'], b['t'] = 'u1', 'u2'
+    assert a.get('s') == 'u1' and a.get('t') == 'u2'
+    assert b.delete('s')
+    # Trim every change before `a` reads the log
+    monkeypatch.setattr(sqlite_session_store, 'CHANGE_LOG_KEEP', -1.0)
+    b.sweep()
+    assert b._conn().execute(
+        'SELECT COUNT(*) FROM session_changes').fetchone()[0] == 0
+    assert a.get('s') is None
+    assert a.stats()['cache_resets'] == 1
+    # The sessions still there are read again
+    assert a.get('t') == 'u2'
+
+
+def test_expired_sessions_are_swept(db_path):
+    """Expired rows are deleted and never served."""
+    store = SQLiteSessionStore(db_path, ttl=0.01, sweep_interval=0)
+    store['s'] = 'u1'
+    time.sleep(0.05)
+    assert store.get('s') is None
+    assert store.sweep() == (1, 0)
+    assert len(store) == 0
+
+
+def test_session_shared_between_processes(db_path):
+    """A session created in another process is found here."""
+    code = ('import sys; from api.v1.auth.sqlite_session_store import '
+            'SQLiteSessionStore; SQLiteSessionStore(sys.argv[1], '
+            'sweep_interval=0)["s"] = {"user_id": "u1"}')
+    store = SQLiteSessionStore(db_path, sweep_interval=0)
+    subprocess.run([sys.executable, '-c', code, db_path], check=True,
+                   env=dict(os.environ, PYTHONPATH=os.getcwd()))
+    assert store.get('s') == {'user_id': 'u1'}
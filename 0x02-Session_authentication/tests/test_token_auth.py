@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Tests of the API token authentication
+"""
+import json
+
+from models import api_token
+from models.api_token import ApiToken
+from tests import make_user
+
+
+def issue(client, email: str = 'bob@hbtn.io', password: str = 'pwd'):
+    """Ask a token through the token view."""
+    return client.post('/api/v1/auth_token/login',
+                       data={'email': email, 'password': password})
+
+
+def bearer(token: str) -> dict:
+    """Return the Bearer Authorization header of a token."""
+    return {'Authorization': 'Bearer ' + token}
+
+
+def test_issued_token_authenticates(client):
+    """A token is issued for valid credentials, stored as its digest
+    only, and authenticates the user."""
+    test = client(AUTH_TYPE='token_auth')
+    user = make_user()
+    response = issue(test)
+    assert response.status_code == 201
+    token = response.json['token']
+    assert response.json['user']['id'] == user.id
+    stored = ApiToken.search({'user_id': user.id})
+    assert [t.digest for t in stored] == [ApiToken.digest_of(token)]
+    assert stored[0].expires_at is None
+    with open('.db_ApiToken.json') as f:
+        assert token not in f.read()
+    response = test.get('/api/v1/users/me', headers=bearer(token))
+    assert response.status_code == 200 and response.json['id'] == user.id
+    assert test.get('/api/v1/users/me',
+                    headers=bearer(token + 'x')).status_code == 403
+
+
+def test_bad_credentials_get_no_token(client):
+    """Missing or wrong credentials are refused."""
+    test = client(AUTH_TYPE='token_auth')
+    make_user()
+    assert issue(test, password='bad').status_code == 401
+    assert issue(test, email='nobody@hbtn.io').status_code == 404
+    assert issue(test, password='').status_code == 400
+    ApiToken.load_from_file()
+    assert ApiToken.count() == 0
+
+
+def test_expired_token_is_refused_and_deleted(client, monkeypatch):
+    """A token past TOKEN_DURATION is refused, then purged from the
+    store and its file."""
+    test = client(AUTH_TYPE='token_auth', TOKEN_DURATION=60)
+    make_user()
+    token = issue(test).json['token']
+    assert test.get('/api/v1/users/me',
+                    headers=bearer(token)).status_code == 200
+    expires_at = ApiToken.all()[0].expires_at
+    monkeypatch.setattr(api_token, 'time', lambda: expires_at)
+    assert test.get('/api/v1/users/me',
+                    headers=bearer(token)).status_code == 403
+    assert ApiToken.count() == 0
+    with open('.db_ApiToken.json') as f:
+        assert json.load(f) == {}
+
+
+def test_logout_revokes_the_token(client):
+    """A token revoked through /auth_token/logout is refused, other
+    tokens of the user are not."""
+    test = client(AUTH_TYPE='token_auth')
+    make_user()
+    token, other = issue(test).json['token'], issue(test).json['token']
+    response = test.delete('/api/v1/auth_token/logout',
+                           headers=bearer(token))
+    assert response.status_code == 200
+    assert test.get('/api/v1/users/me',
+                    headers=bearer(token)).status_code == 403
+    assert test.delete('/api/v1/auth_token/logout',
+                       headers=bearer(token)).status_code == 403
+    assert test.get('/api/v1/users/me',
+                    headers=bearer(other)).status_code == 200
+    assert ApiToken.count() == 1
+
+
+def test_no_tokens_without_token_backend(client):
+    """An app not authenticating by token has no token views."""
+    test = client(AUTH_TYPE='session_auth', SESSION_NAME='sid')
+    make_user()
+    assert issue(test).status_code == 404
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Tests of the paging of GET /api/v1/users
+"""
+import base64
+import re
+
+from api.v1.views import users as users_view
+from tests import make_user
+
+
+def listing(client, count: int = 5):
+    """Return a test client authenticating with Basic credentials, and
+    the ids of `count` users in id order."""
+    test = client(AUTH_TYPE='basic_auth')
+    ids = sorted(make_user('user{}@hbtn.io'.format(i)).id
+                 for i in range(count))
+    test.environ_base['HTTP_AUTHORIZATION'] = 'Basic ' + \
+        base64.b64encode(b'user0@hbtn.io:pwd').decode()
+    return test, ids
+
+
+def next_url(response):
+    """Return the URL of the Link header to the next page, or None."""
+    link = response.headers.get('Link')
+    return None if link is None else \
+        re.fullmatch(r'<(.*)>; rel="next"', link).group(1)
+
+
+def test_pages_follow_the_link_header(client):
+    """Pages of `limit` users in id order, linked until one is short."""
+    test, ids = listing(client)
+    url, pages = '/api/v1/users?limit=2', []
+    while url is not None:
+        response = test.get(url)
+        assert response.status_code == 200
+        pages.append([user['id'] for user in response.json])
+        url = next_url(response)
+    assert pages == [ids[0:2], ids[2:4], ids[4:]]
+
+
+def test_full_last_page_links_to_an_empty_one(client):
+    """A last page that is full still links to the next, empty, one."""
+    test, ids = listing(client, 4)
+    response = test.get('/api/v1/users?limit=2&after=' + ids[1])
+    assert [user['id'] for user in response.json] == ids[2:]
+    response = test.get(next_url(response))
+    assert response.json == [] and 'Link' not in response.headers
+
+
+def test_bad_limits(client):
+    """A limit must be an integer from 1 to MAX_PAGE."""
+    test, _ = listing(client, 1)
+    for limit in ('0', '-1', 'x', str(users_view.MAX_PAGE + 1)):
+        assert test.get('/api/v1/users?limit=' + limit).status_code == 400
+    assert test.get('/api/v1/users?limit={}'.format(
+        users_view.MAX_PAGE)).status_code == 200
+
+
+def test_unpaged_stream(client, monkeypatch):
+    """Without limit all users from `after` on are streamed, over as many
+    pages of the store as needed."""
+    monkeypatch.setattr(users_view, 'MAX_PAGE', 2)
+    test, ids = listing(client)
+    response = test.get('/api/v1/users')
+    assert response.status_code == 200 and response.is_streamed
+    assert [user['id'] for user in response.json] == ids
+    assert 'Link' not in response.headers
+    response = test.get('/api/v1/users?after=' + ids[2])
+    assert [user['id'] for user in response.json] == ids[3:]
+    assert test.get('/api/v1/users?after=' + ids[-1]).json == []
+
+
+def test_after_is_refused_with_filters(client):
+    """Filtered users are not in id order: `after` cannot page them."""
+    test, ids = listing(client)
+    for query in ('email_prefix=user', 'created_after=0'):
+        response = test.get('/api/v1/users?after={}&{}'.format(ids[0], query))
+        assert response.status_code == 400
+        assert len(test.get('/api/v1/users?' + query).json) == 5
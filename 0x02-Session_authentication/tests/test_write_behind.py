@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Tests of the write-behind flusher
+"""
+import pytest
+
+from models.write_behind import WriteBehindFlusher
+from tests import wait_for
+
+
+def model(name: str = 'Model', failures: int = 0,
+          error: type = OSError) -> type:
+    """Return a model class whose first `failures` saves raise `error`."""
+    class Model:
+        saves = 0
+        calls = 0
+
+        @classmethod
+        def save_to_file(cls):
+            cls.calls += 1
+            if cls.calls <= failures:
+                raise error('disk full')
+            cls.saves += 1
+    Model.__name__ = name
+    return Model
+
+
+def test_batches_changes():
+    """Many changes of a class are written once."""
+    flusher = WriteBehindFlusher(interval=0.02, max_ops=1000)
+    Model = model()
+    for _ in range(100):
+        flusher.mark_dirty(Model)
+    assert wait_for(lambda: Model.saves == 1)
+    assert flusher.stats()['pending_ops'] == 0
+    flusher.close()
+    assert Model.saves == 1
+
+
+def test_later_batches_are_flushed():
+    """The idle flusher wakes up for the next batch."""
+    flusher = WriteBehindFlusher(interval=0.02, max_ops=1000)
+    Model = model()
+    for batch in range(1, 4):
+        flusher.mark_dirty(Model)
+        assert wait_for(lambda: Model.saves == batch)
+    flusher.close()
+
+
+def test_failed_save_is_retried():
+    """A failing save keeps its class dirty and the flusher running."""
+    flusher = WriteBehindFlusher(interval=0.02, max_ops=1000)
+    Model, Other = model(failures=2), model('Other')
+    flusher.mark_dirty(Model)
+    flusher.mark_dirty(Other)
+    assert wait_for(lambda: Model.saves == 1)
+    stats = flusher.stats()
+    assert stats['errors'] == 2
+    assert stats['pending_ops'] == 0
+    assert Other.saves == 1
+    # Later changes are still written
+    flusher.mark_dirty(Model)
+    assert wait_for(lambda: Model.saves == 2)
+    flusher.close()
+
+
+@pytest.mark.filterwarnings(
+    'ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_thread_restarts_after_dying():
+    """A change after the flusher thread died starts a new one."""
+    flusher = WriteBehindFlusher(interval=0.01, max_ops=1000)
+    Model = model(failures=1, error=SystemExit)
+    flusher.mark_dirty(Model)
+    thread = flusher._thread
+    thread.join(5)
+    assert not thread.is_alive() and flusher._thread is None
+    flusher.mark_dirty(Model)
+    assert wait_for(lambda: Model.saves == 1)
+    flusher.close()
+
+
+def test_close_flushes_pending():
+    """close() writes what is still pending."""
+    flusher = WriteBehindFlusher(interval=60, max_ops=1000)
+    Model = model()
+    flusher.mark_dirty(Model)
+    flusher.close()
+    assert Model.saves == 1